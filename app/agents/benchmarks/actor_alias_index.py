@@ -0,0 +1,84 @@
+"""
+Actor alias lookup, reload and insert cost at 100k aliases.
+
+  just bench actor_alias_index
+"""
+
+import itertools
+import json
+import os
+import tempfile
+import timeit
+
+from ..mover import jav_actor
+
+ACTORS = 25_000
+ALIASES_PER_ACTOR = 4
+
+
+def _alias(i: int, j: int) -> str:
+  # half romanized, half japanese names
+  return f"actor{i:05d} alias{j}" if j % 2 else f"女優{i:05d}の別名{j}"
+
+
+def _write_actor_file(file: str):
+  dir_to_alias = {
+    f"actor{i:05d}": [_alias(i, j) for j in range(ALIASES_PER_ACTOR)] for i in range(ACTORS)
+  }
+  with open(file, "w", encoding="utf-8") as f:
+    json.dump(dir_to_alias, f, ensure_ascii=False, indent=2)
+
+
+def main(number: int = 20):
+  with tempfile.TemporaryDirectory() as tmp:
+    file = os.path.join(tmp, "actor.json")
+    _write_actor_file(file)
+    os.environ["JAV_ACTOR_FILE"] = file
+    names = [_alias(i, i % ALIASES_PER_ACTOR) for i in range(0, ACTORS, 97)]
+
+    print(f"{ACTORS * ALIASES_PER_ACTOR} aliases, {os.path.getsize(file) / 1e6:.1f}MB")
+
+    per_run = min(timeit.repeat(jav_actor.read_actor_alias, number=number, repeat=3)) / number
+    print(f"read_actor_alias: {per_run * 1000:.2f}ms")
+
+    jav_actor.actor_alias_index()
+    per_run = min(timeit.repeat(jav_actor.actor_alias_index, number=number * 1000)) / (
+      number * 1000
+    )
+    print(f"actor_alias_index (unchanged file): {per_run * 1e6:.2f}us")
+
+    def reload():
+      os.utime(file)
+      jav_actor.actor_alias_index()
+
+    per_run = min(timeit.repeat(reload, number=number, repeat=3)) / number
+    print(f"actor_alias_index (reload after change): {per_run * 1000:.2f}ms")
+
+    aa = jav_actor.actor_alias_index()
+    per_run = min(timeit.repeat(lambda: [aa.find_dir(n) for n in names], number=number * 100))
+    per_run /= number * 100
+    print(f"find_dir: {per_run / len(names) * 1e9:.0f}ns per lookup")
+
+    variants = [n.upper().replace("別", "别") for n in names]
+    per_run = timeit.timeit(jav_actor.read_actor_alias().normalized_to_dir, number=1)
+    print(f"normalized index (built when the index loads): {per_run * 1000:.2f}ms")
+    per_run = min(timeit.repeat(lambda: [aa.find_dir(n) for n in variants], number=number * 10))
+    per_run /= number * 10
+    print(f"find_dir (spelling variant): {per_run / len(variants) * 1e9:.0f}ns per lookup")
+
+    os.environ["JAV_ACTOR_COMPACT_ENTRIES"] = str(number + 1)
+    added = itertools.count()
+
+    def add():
+      i = next(added)
+      jav_actor.add_actor_alias(f"new{i}", [f"new alias {i}"])
+
+    per_run = timeit.timeit(add, number=number) / number
+    print(f"add_actor_alias (journal append): {per_run * 1000:.2f}ms")
+
+    per_run = timeit.timeit(jav_actor.compact_actor_alias, number=1)
+    print(f"compact_actor_alias: {per_run * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,48 @@
+"""
+Per-request cost of getting the agents of one plan: built on every call vs the registry.
+
+  just bench agent_construction
+"""
+
+import os
+import timeit
+
+os.environ.setdefault("MODEL", "test")
+
+from ..categorizer import is_movie, is_porn, is_tv_series  # noqa: E402
+from ..models import Language, TargetDir  # noqa: E402
+from ..mover import movie_mover, subtitle_mover, tv_series_mover  # noqa: E402
+from ..registry import clear_registry, prebuild_agents  # noqa: E402
+
+
+def _fresh():
+  is_movie._build_agent()
+  is_tv_series._build_agent()
+  is_porn._build_agent()
+  movie_mover._build_agent(TargetDir.movie, Language.English)
+  tv_series_mover._build_agent(TargetDir.tv_series, Language.Japanese)
+  subtitle_mover._build_agent()
+
+
+def _registered():
+  is_movie.agent()
+  is_tv_series.agent()
+  is_porn.agent()
+  movie_mover.agent(TargetDir.movie, Language.English)
+  tv_series_mover.agent(TargetDir.tv_series, Language.Japanese)
+  subtitle_mover.agent()
+
+
+def main(number: int = 200):
+  clear_registry()
+  start = timeit.default_timer()
+  count = prebuild_agents()
+  print(f"prebuild {count} agents: {(timeit.default_timer() - start) * 1000:.1f}ms")
+
+  for name, fn in [("fresh", _fresh), ("registry", _registered)]:
+    per_call = min(timeit.repeat(fn, number=number, repeat=3)) / number
+    print(f"{name:>10}: {per_call * 1e6:.1f}us per plan")
+
+
+if __name__ == "__main__":
+  main()
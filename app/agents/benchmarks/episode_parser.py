@@ -0,0 +1,57 @@
+"""
+Episode parser speed and coverage over release names, and a 300 episode pack.
+
+  just bench episode_parser
+"""
+
+import timeit
+
+from ..mover.episode_parser import parse_episode
+
+CORPUS = [
+  "Breaking.Bad.S05E16.Felina.1080p.BluRay.x265.10bit.AAC.5.1-RARBG.mkv",
+  "The.Office.US.S02E01-E02.The.Dundies.720p.WEB-DL.DD5.1.H264.mkv",
+  "Game.of.Thrones.S08E06.The.Iron.Throne.2160p.AMZN.WEB-DL.DDP5.1.HDR.HEVC.mkv",
+  "The.Mandalorian.S03E08.1080p.DSNP.WEB-DL.DDP5.1.Atmos.H.264-FLUX.mkv",
+  "Friends.S01E01E02.The.One.Where.Monica.Gets.a.Roommate.1080p.mkv",
+  "doctor.who.2005.3x07.42.hdtv.xvid.avi",
+  "Seinfeld.9x23.The.Finale.DVDRip.avi",
+  "Shogun.2024.S01E10.A.Dream.of.a.Dream.1080p.DSNP.WEB-DL.mkv",
+  "My.Date.with.a.Vampire.Season.02.2000/My.Date.with.a.Vampire.Season.02.2000.EP1.mkv",
+  "My.Date.with.a.Vampire.Season.02.2000/My.Date.with.a.Vampire.Season.02.2000.EP42.mkv",
+  "Reply.1988.E20.160117.1080p.WEB-DL.x264.AAC.mkv",
+  "Crash.Landing.on.You.E16.END.1080p.NF.WEB-DL.mkv",
+  "庆余年 第二季/庆余年第二季第05集.mp4",
+  "琅琊榜/琅琊榜 第十二集 1080P.mp4",
+  "甄嬛传.第76集.高清.mp4",
+  "[SubsPlease] Sousou no Frieren - 12 (1080p) [ABCD1234].mkv",
+  "[Erai-raws] Jujutsu Kaisen - 47 [1080p][Multiple Subtitle][ENG][POR-BR].mkv",
+  "[Judas] One Piece - 1089 [1080p][HEVC x265 10bit][Multi-Subs].mkv",
+  "[Group] Mushoku Tensei - 01v2 [720p].mkv",
+  "[Nekomoe kissaten][Kusuriya no Hitorigoto][03][1080p][CHS].mp4",
+  "[LoliHouse] Spy x Family - 25 [WebRip 1080p HEVC-10bit AAC SRTx2].mkv",
+  "[VCB-Studio] Shingeki no Kyojin [01][Ma10p_1080p][x265_flac].mkv",
+  "Attack on Titan Season 3/Attack on Titan - 05.mkv",
+  "Season 2/05.mkv",
+  "Show.S02.1080p.WEB-DL/Show.E07.mkv",
+  "Stranger.Things.S04.Sample.mkv",
+  "[Group] Title - NCOP [1080p].mkv",
+  "Bluey.2018.Trailer.mp4",
+]
+
+PACK = [f"One.Piece.S01E{i:03d}.1080p.WEB-DL.AAC2.0.H.264.mkv" for i in range(1, 301)]
+
+
+def main(number: int = 200):
+  parsed = [parse_episode(name) for name in CORPUS]
+  for name, episode in zip(CORPUS, parsed):
+    print(f"{episode.tag() if episode else '-':>14}  {name}")
+  print(f"parsed {sum(1 for e in parsed if e)}/{len(CORPUS)} release names")
+
+  for name, files in [("corpus", CORPUS), ("300 episode pack", PACK)]:
+    per_run = min(timeit.repeat(lambda: [parse_episode(f) for f in files], number=number)) / number
+    print(f"{name}: {per_run * 1000:.2f}ms ({per_run / len(files) * 1e6:.1f}us per file)")
+
+
+if __name__ == "__main__":
+  main()
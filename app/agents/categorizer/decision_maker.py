@@ -1,6 +1,7 @@
 from pydantic_ai import Agent
 
 from ..ai import model
+from ..registry import registered_agent
 from .models import CategorizerContext, DecisionMakerResponse
 
 _INSTRUCTION = """\
@@ -56,7 +57,7 @@ Specifics (each bullet contains specifics about the task):
 """
 
 
-def agent() -> Agent:
+def _build_agent() -> Agent:
   return Agent(
     name="decision_maker",
     model=model(),
@@ -65,6 +66,10 @@ def agent() -> Agent:
   )
 
 
+def agent() -> Agent:
+  return registered_agent("decision_maker", _build_agent)
+
+
 if __name__ == "__main__":
   from ..ai import setupLogfire
 
@@ -21,8 +21,8 @@ async def test_is_audio_book_yes():
     metadata={},
   )
 
-  test_agent = agent(metadataMcp())
-  res = await test_agent.run(req.model_dump_json())
+  test_agent = agent()
+  res = await test_agent.run(req.model_dump_json(), toolsets=[metadataMcp()])
 
   assert res.output.is_audio_book == SimpleAgentResponseResult.yes
   assert "chapter" in res.output.reason.lower() or "audiobook" in res.output.reason.lower()
@@ -43,8 +43,8 @@ async def test_is_audio_book_music_no():
     metadata={},
   )
 
-  test_agent = agent(metadataMcp())
-  res = await test_agent.run(req.model_dump_json())
+  test_agent = agent()
+  res = await test_agent.run(req.model_dump_json(), toolsets=[metadataMcp()])
 
   assert res.output.is_audio_book == SimpleAgentResponseResult.no
   assert "music" in res.output.reason.lower() or "album" in res.output.reason.lower()
@@ -65,8 +65,8 @@ async def test_is_audio_book_book_no():
     metadata={},
   )
 
-  test_agent = agent(metadataMcp())
-  res = await test_agent.run(req.model_dump_json())
+  test_agent = agent()
+  res = await test_agent.run(req.model_dump_json(), toolsets=[metadataMcp()])
 
   assert res.output.is_audio_book == SimpleAgentResponseResult.no
   assert (
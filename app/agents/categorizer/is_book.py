@@ -1,8 +1,8 @@
 from pydantic_ai import Agent, ToolOutput
-from pydantic_ai.mcp import MCPServer
 
 from ..ai import allowedTools, model
 from ..models import PlanRequest
+from ..registry import registered_agent
 from .models import IsBookResponse
 
 _INSTRUCTION = """\
@@ -49,17 +49,20 @@ Classification Rules for is_book field:
 """
 
 
-def agent(mcp: MCPServer) -> Agent:
+def _build_agent() -> Agent:
   return Agent(
     name="is_book_detector",
     model=model(),
     instructions=_INSTRUCTION,
     output_type=ToolOutput(IsBookResponse),
-    toolsets=[mcp],
     prepare_tools=allowedTools(["web_search"]),
   )
 
 
+def agent() -> Agent:
+  return registered_agent("is_book_detector", _build_agent)
+
+
 if __name__ == "__main__":
   from ..ai import metadataMcp, setupLogfire
 
@@ -77,7 +80,7 @@ if __name__ == "__main__":
       },
     )
 
-    a = agent(metadataMcp())
-    res = a.run_sync(req.model_dump_json())
+    a = agent()
+    res = a.run_sync(req.model_dump_json(), toolsets=[metadataMcp()])
     print(f"output: {res.output}")
     print(f"usage: {res.usage()}")
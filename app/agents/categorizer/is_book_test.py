@@ -16,8 +16,8 @@ async def test_is_book_yes():
     files=["Stephen King - The Shining.pdf", "Stephen King - The Shining.epub"], metadata={}
   )
 
-  test_agent = agent(metadataMcp())
-  res = await test_agent.run(req.model_dump_json())
+  test_agent = agent()
+  res = await test_agent.run(req.model_dump_json(), toolsets=[metadataMcp()])
 
   assert res.output.is_book == SimpleAgentResponseResult.yes
   assert "book" in res.output.reason.lower()
@@ -38,8 +38,8 @@ async def test_is_book_audio_book_no():
     metadata={},
   )
 
-  test_agent = agent(metadataMcp())
-  res = await test_agent.run(req.model_dump_json())
+  test_agent = agent()
+  res = await test_agent.run(req.model_dump_json(), toolsets=[metadataMcp()])
 
   assert res.output.is_book == SimpleAgentResponseResult.no
   assert "audio" in res.output.reason.lower() or "mp3" in res.output.reason.lower()
@@ -7,7 +7,9 @@ from pydantic_ai.mcp import MCPServer
 from pydantic_ai.usage import RunUsage
 
 from ..ai import allowedTools, model
+from ..mcp_cache import cached_tools
 from ..models import PlanRequest, iso639_to_lang_enum
+from ..registry import registered_agent
 from .models import IsMovieResponse
 
 _INSTRUCTION = """\
@@ -97,16 +99,23 @@ Classification Rules for is_movie field:
 """
 
 
-async def is_movie(req: PlanRequest, mcp: MCPServer) -> Tuple[IsMovieResponse, RunUsage]:
-  a = Agent(
+def _build_agent() -> Agent:
+  return Agent(
     name="is_movie_detector",
     model=model(),
     instructions=_INSTRUCTION,
     output_type=ToolOutput(IsMovieResponse),
-    toolsets=[mcp],
     prepare_tools=allowedTools(["search_movies"]),
   )
-  res = await a.run(req.model_dump_json())
+
+
+def agent() -> Agent:
+  return registered_agent("is_movie_detector", _build_agent)
+
+
+async def is_movie(req: PlanRequest, mcp: MCPServer) -> Tuple[IsMovieResponse, RunUsage]:
+  a = agent()
+  res = await a.run(req.model_dump_json(), toolsets=[cached_tools(mcp)])
   output = res.output
   usage = res.usage()
 
@@ -1,8 +1,8 @@
 from pydantic_ai import Agent, ToolOutput
-from pydantic_ai.mcp import MCPServer
 
 from ..ai import allowedTools, model
 from ..models import PlanRequest
+from ..registry import registered_agent
 from .models import IsMusicResponse
 
 _INSTRUCTION = """\
@@ -58,17 +58,20 @@ Classification Rules for is_music field:
 """
 
 
-def agent(mcp: MCPServer) -> Agent:
+def _build_agent() -> Agent:
   return Agent(
     name="is_music_detector",
     model=model(),
     instructions=_INSTRUCTION,
     output_type=ToolOutput(IsMusicResponse),
-    toolsets=[mcp],
     prepare_tools=allowedTools(["web_search"]),
   )
 
 
+def agent() -> Agent:
+  return registered_agent("is_music_detector", _build_agent)
+
+
 if __name__ == "__main__":
   from ..ai import metadataMcp, setupLogfire
 
@@ -84,7 +87,7 @@ if __name__ == "__main__":
       metadata={"artist": "The Beatles", "album": "Abbey Road", "genre": "Rock"},
     )
 
-    a = agent(metadataMcp())
-    res = a.run_sync(req.model_dump_json())
+    a = agent()
+    res = a.run_sync(req.model_dump_json(), toolsets=[metadataMcp()])
     print(f"output: {res.output}")
     print(f"usage: {res.usage()}")
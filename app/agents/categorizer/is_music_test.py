@@ -21,8 +21,8 @@ async def test_is_music_yes():
     metadata={},
   )
 
-  test_agent = agent(metadataMcp())
-  res = await test_agent.run(req.model_dump_json())
+  test_agent = agent()
+  res = await test_agent.run(req.model_dump_json(), toolsets=[metadataMcp()])
 
   assert res.output.is_music == SimpleAgentResponseResult.yes
   assert "music" in res.output.reason.lower()
@@ -43,8 +43,8 @@ async def test_is_music_audio_book_no():
     metadata={},
   )
 
-  test_agent = agent(metadataMcp())
-  res = await test_agent.run(req.model_dump_json())
+  test_agent = agent()
+  res = await test_agent.run(req.model_dump_json(), toolsets=[metadataMcp()])
 
   assert res.output.is_music == SimpleAgentResponseResult.no
   assert "audiobook" in res.output.reason.lower() or "chapter" in res.output.reason.lower()
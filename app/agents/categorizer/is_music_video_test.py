@@ -16,8 +16,8 @@ async def test_is_music_video_yes():
     files=["Taylor Swift - Shake It Off.mp4", "Taylor Swift - Bad Blood.mp4"], metadata={}
   )
 
-  test_agent = agent(metadataMcp())
-  res = await test_agent.run(req.model_dump_json())
+  test_agent = agent()
+  res = await test_agent.run(req.model_dump_json(), toolsets=[metadataMcp()])
 
   assert res.output.is_music_video == SimpleAgentResponseResult.yes
   assert "music video" in res.output.reason.lower()
@@ -38,8 +38,8 @@ async def test_is_music_video_music_no():
     metadata={},
   )
 
-  test_agent = agent(metadataMcp())
-  res = await test_agent.run(req.model_dump_json())
+  test_agent = agent()
+  res = await test_agent.run(req.model_dump_json(), toolsets=[metadataMcp()])
 
   assert res.output.is_music_video == SimpleAgentResponseResult.no
   assert "music" in res.output.reason.lower() and (
@@ -16,8 +16,8 @@ async def test_is_photobook_yes():
     files=["Photobook/001.jpg", "Photobook/002.jpg", "Photobook/003.jpg"], metadata={}
   )
 
-  test_agent = agent(metadataMcp())
-  res = await test_agent.run(req.model_dump_json())
+  test_agent = agent()
+  res = await test_agent.run(req.model_dump_json(), toolsets=[metadataMcp()])
 
   assert res.output.is_photobook == SimpleAgentResponseResult.yes
   assert "photobook" in res.output.reason.lower() or "photo" in res.output.reason.lower()
@@ -1,4 +1,5 @@
 import asyncio
+import logging
 import os
 from typing import Tuple
 
@@ -6,9 +7,15 @@ from pydantic_ai import Agent, ToolOutput
 from pydantic_ai.mcp import MCPServer
 from pydantic_ai.usage import RunUsage
 
-from ..ai import allowedTools, model
+from ..ai import allowedTools, model, setupLogfireForStdLog
+from ..mcp_cache import cached_tools
 from ..models import VIDEO_EXT, PlanRequest, SimpleAgentResponseResult
-from .models import GroupIsPornResponse, IsPornResponse
+from ..registry import registered_agent
+from ..utils.batch import run_file_agent
+from .models import BatchIsPornResponse, GroupIsPornResponse, IsPornResponse
+
+setupLogfireForStdLog()
+_LOGGER = logging.getLogger(__name__)
 
 _INSTRUCTION = """\
 Task: You are an AI agent specialized in determining if a group of files represents porn content that does not use the bango system, including movie-style porn and OnlyFans content, based solely on filenames, directory paths, and available metadata. Return an IsPornResponse object with "is_porn" (yes/no/maybe), "is_vr", "from_onlyfans", "name", "actors", "language", and "reason".
@@ -92,36 +99,68 @@ Classification Rules for is_porn field:
 """
 
 
-def agent(mcp: MCPServer) -> Agent:
+_BATCH_INSTRUCTION = (
+  _INSTRUCTION
+  + """
+Batch mode:
+- "files" contains several files. Analyze every file on its own, "metadata" applies to all of them.
+- Return a BatchIsPornResponse object: "porns" maps every input file path, exactly as given, to its IsPornResponse.
+"""
+)
+
+
+def _build_agent() -> Agent:
   return Agent(
     name="is_porn_detector",
     model=model(),
     instructions=_INSTRUCTION,
     output_type=ToolOutput(IsPornResponse),
-    toolsets=[mcp],
     prepare_tools=allowedTools(["search_porn", "web_search"]),
   )
 
 
+def agent() -> Agent:
+  return registered_agent("is_porn_detector", _build_agent)
+
+
+def _build_batch_agent() -> Agent:
+  return Agent(
+    name="is_porn_detector_batch",
+    model=model(),
+    instructions=_BATCH_INSTRUCTION,
+    output_type=ToolOutput(BatchIsPornResponse),
+    prepare_tools=allowedTools(["search_porn", "web_search"]),
+  )
+
+
+def batch_agent() -> Agent:
+  return registered_agent("is_porn_detector_batch", _build_batch_agent)
+
+
 async def is_porn(req: PlanRequest, mcp: MCPServer) -> Tuple[GroupIsPornResponse, RunUsage]:
   res = GroupIsPornResponse(is_porn=SimpleAgentResponseResult.no, porns={})
-  a = agent(mcp)
+  a = agent()
   found_yes = False
   found_maybe = False
-  usage = RunUsage()
-
-  for file in req.files:
-    _, ext = os.path.splitext(file.lower())
-    if ext in VIDEO_EXT:
-      new_req = PlanRequest(files=[file], metadata=req.metadata)
-      per_file_res = await a.run(new_req.model_dump_json())
-      res.porns[file] = per_file_res.output
-      usage.incr(per_file_res.usage())
-
-      if per_file_res.output.is_porn == SimpleAgentResponseResult.yes:
-        found_yes = True
-      if per_file_res.output.is_porn == SimpleAgentResponseResult.maybe:
-        found_maybe = True
+
+  video_files = [file for file in req.files if os.path.splitext(file.lower())[1] in VIDEO_EXT]
+  outputs, usage = await run_file_agent(
+    video_files, req.metadata, a, batch_agent(), toolsets=[cached_tools(mcp)]
+  )
+
+  for file, output in outputs:
+    if output is None:
+      # unknown rather than no, so the group is not ruled out because of a slow file.
+      _LOGGER.warning(f"porn detection timed out for {file}, the mover skips it")
+      found_maybe = True
+      continue
+
+    res.porns[file] = output
+
+    if output.is_porn == SimpleAgentResponseResult.yes:
+      found_yes = True
+    if output.is_porn == SimpleAgentResponseResult.maybe:
+      found_maybe = True
 
   if found_yes:
     res.is_porn = SimpleAgentResponseResult.yes
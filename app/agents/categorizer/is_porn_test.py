@@ -1,9 +1,17 @@
+import asyncio
+import json
+
 import pytest
+from pydantic_ai import Agent, ToolOutput
+from pydantic_ai.messages import ModelMessage, ModelResponse, ToolCallPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from pydantic_ai.toolsets import FunctionToolset
 
 from ..ai import metadataMcp, model, setupLogfire
-from ..models import PlanRequest
+from ..models import Language, PlanRequest
+from . import is_porn as is_porn_module
 from .is_porn import is_porn
-from .models import GroupIsPornResponse, SimpleAgentResponseResult
+from .models import GroupIsPornResponse, IsPornResponse, SimpleAgentResponseResult
 
 
 @pytest.mark.asyncio
@@ -68,3 +76,59 @@ async def test_is_porn_jav_no():
     "jav" in res.porns["IPZZ-123.mp4"].reason.lower()
     or "bango" in res.porns["IPZZ-123.mp4"].reason.lower()
   )
+
+
+def _fake_agent(verdicts: dict[str, SimpleAgentResponseResult], slow: set[str]):
+  """Agent answering from the file name in the prompt, sleeping for files in slow."""
+
+  async def answer(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+    file = json.loads(messages[-1].parts[-1].content)["files"][0]
+    if file in slow:
+      await asyncio.sleep(5)
+    output = IsPornResponse(
+      id=None,
+      is_porn=verdicts[file],
+      is_vr=SimpleAgentResponseResult.no,
+      from_onlyfans=SimpleAgentResponseResult.no,
+      name=None,
+      actors=[],
+      language=Language.English,
+      reason="fake",
+    )
+    return ModelResponse(
+      parts=[ToolCallPart(info.output_tools[0].name, output.model_dump(mode="json"))]
+    )
+
+  return Agent(FunctionModel(answer), output_type=ToolOutput(IsPornResponse))
+
+
+@pytest.mark.asyncio
+async def test_is_porn_concurrent_merge(monkeypatch):
+  """Test that per-file results merge in file order, sum usage and skip timed out files."""
+  verdicts = {
+    "b.mp4": SimpleAgentResponseResult.no,
+    "a.mp4": SimpleAgentResponseResult.yes,
+    "slow.mp4": SimpleAgentResponseResult.yes,
+  }
+  monkeypatch.setattr(is_porn_module, "agent", lambda: _fake_agent(verdicts, {"slow.mp4"}))
+  monkeypatch.setenv("PER_FILE_AGENT_TIMEOUT", "0.2")
+
+  req = PlanRequest(files=["b.mp4", "cover.jpg", "slow.mp4", "a.mp4"], metadata={})
+  res, usage = await is_porn(req, FunctionToolset())
+
+  assert list(res.porns) == ["b.mp4", "a.mp4"]
+  assert res.is_porn == SimpleAgentResponseResult.yes
+  assert usage.requests == 2
+
+
+@pytest.mark.asyncio
+async def test_is_porn_timeout_is_maybe(monkeypatch):
+  """Test that a group with only timed out files is maybe, not no."""
+  verdicts = {"a.mp4": SimpleAgentResponseResult.no, "slow.mp4": SimpleAgentResponseResult.yes}
+  monkeypatch.setattr(is_porn_module, "agent", lambda: _fake_agent(verdicts, {"slow.mp4"}))
+  monkeypatch.setenv("PER_FILE_AGENT_TIMEOUT", "0.2")
+
+  res, _ = await is_porn(PlanRequest(files=["a.mp4", "slow.mp4"], metadata={}), FunctionToolset())
+
+  assert res.is_porn == SimpleAgentResponseResult.maybe
+  assert list(res.porns) == ["a.mp4"]
@@ -7,7 +7,9 @@ from pydantic_ai.mcp import MCPServer
 from pydantic_ai.usage import RunUsage
 
 from ..ai import allowedTools, model
+from ..mcp_cache import cached_tools
 from ..models import PlanRequest, iso639_to_lang_enum
+from ..registry import registered_agent
 from .models import IsTVSeriesResponse
 
 _INSTRUCTION = """\
@@ -91,16 +93,23 @@ Classification Rules for is_tv_series field:
 """
 
 
-async def is_tv_series(req: PlanRequest, mcp: MCPServer) -> Tuple[IsTVSeriesResponse, RunUsage]:
-  a = Agent(
+def _build_agent() -> Agent:
+  return Agent(
     name="is_tv_series_detector",
     model=model(),
     instructions=_INSTRUCTION,
     output_type=ToolOutput(IsTVSeriesResponse),
-    toolsets=[mcp],
     prepare_tools=allowedTools(["search_tv_shows"]),
   )
-  res = await a.run(req.model_dump_json())
+
+
+def agent() -> Agent:
+  return registered_agent("is_tv_series_detector", _build_agent)
+
+
+async def is_tv_series(req: PlanRequest, mcp: MCPServer) -> Tuple[IsTVSeriesResponse, RunUsage]:
+  a = agent()
+  res = await a.run(req.model_dump_json(), toolsets=[cached_tools(mcp)])
   output = res.output
   usage = res.usage()
 
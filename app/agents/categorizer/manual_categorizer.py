@@ -3,6 +3,7 @@ import re
 
 from pydantic_ai.mcp import MCPServer
 
+from ..mcp_cache import cached_direct_call_tool
 from ..models import Category, PlanRequest
 from .models import FilenameBasedPreCatergoizerResult
 
@@ -70,12 +71,16 @@ async def categorize_by_metadata_hints(req: PlanRequest, mcp: MCPServer) -> list
     return []
 
   if "dmm_id" in req.metadata:
-    res = await mcp.direct_call_tool("search_japanese_porn", {"jav_id": req.metadata["dmm_id"]})
+    res = await cached_direct_call_tool(
+      mcp, "search_japanese_porn", {"jav_id": req.metadata["dmm_id"]}
+    )
     req.metadata["search_japanese_porn_result"] = res
     return [Category.bango_porn]
 
   if "imdb_id" in req.metadata:
-    res = await mcp.direct_call_tool("find_by_imdb_id", {"imdb_id": req.metadata["imdb_id"]})
+    res = await cached_direct_call_tool(
+      mcp, "find_by_imdb_id", {"imdb_id": req.metadata["imdb_id"]}
+    )
 
     # Extract and store only the relevant result
     if "tv_results" in res and len(res["tv_results"]) > 0:
@@ -477,3 +477,28 @@ class TestCategorizeByMetadataHints:
     result = asyncio.run(categorize_by_metadata_hints(req, mcp))
 
     assert result == [Category.porn]
+
+  def test_metadata_hint_lookups_are_cached(self, monkeypatch):
+    """Test that categorizing the same imdb_id again skips the MCP call."""
+    import asyncio
+
+    from ..mcp_cache import close_mcp_call_cache
+
+    monkeypatch.delenv("MCP_CACHE_FILE", raising=False)
+    close_mcp_call_cache()
+
+    class MockMCP:
+      calls = 0
+
+      async def direct_call_tool(self, tool_name, params):
+        self.calls += 1
+        return {"movie_results": [{"title": "The Dark Knight", "original_language": "en"}]}
+
+    mcp = MockMCP()
+    for _ in range(2):
+      req = PlanRequest(files=["video.mp4"], metadata={"imdb_id": "tt0468569"})
+      assert asyncio.run(categorize_by_metadata_hints(req, mcp)) == [Category.movie]
+      assert req.metadata["original_language"] == "en"
+
+    assert mcp.calls == 1
+    close_mcp_call_cache()
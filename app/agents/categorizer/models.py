@@ -34,6 +34,12 @@ class GroupIsBangoPornResponse(BaseModel):
   porns: Dict[str, IsBangoPornResponse] = Field(description="file to details information")
 
 
+class BatchIsBangoPornResponse(BaseModel):
+  porns: Dict[str, IsBangoPornResponse] = Field(
+    description="exact input file path to details information, one entry per input file"
+  )
+
+
 class IsBookResponse(BaseModel):
   is_book: SimpleAgentResponseResult
   language: Language
@@ -85,6 +91,12 @@ class GroupIsPornResponse(BaseModel):
   porns: Dict[str, IsPornResponse] = Field(description="file to details information")
 
 
+class BatchIsPornResponse(BaseModel):
+  porns: Dict[str, IsPornResponse] = Field(
+    description="exact input file path to details information, one entry per input file"
+  )
+
+
 class IsTVSeriesResponse(BaseModel):
   is_tv_series: SimpleAgentResponseResult
   is_anim: SimpleAgentResponseResult
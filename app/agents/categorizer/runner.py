@@ -1,9 +1,15 @@
+import asyncio
+import os
 from typing import Tuple
 
+from pydantic_ai import capture_run_messages
 from pydantic_ai.mcp import MCPServer
 from pydantic_ai.usage import RunUsage
 
+from ..events import emit_plan_event
+from ..mcp_cache import cached_tools
 from ..models import Category, PlanRequest, SimpleAgentResponseResult
+from ..utils.concurrency import usage_of
 from .decision_maker import agent as decision_maker_agent
 from .is_audio_book import agent as is_audio_book_agent
 from .is_bango_porn import is_bango_porn
@@ -17,9 +23,27 @@ from .is_tv_series import is_tv_series
 from .manual_categorizer import categorize_by_file_name, categorize_by_metadata_hints
 from .models import CategorizerContext, PlanRequestWithCategory
 
+# checkers running their agents per file in tasks of their own, see run_file_agent. A capture in
+# the checker's task would be inherited by those tasks and mix up their messages.
+_PER_FILE_CHECKERS = {Category.porn, Category.bango_porn}
+
 
 async def per_category_checker(
   req: PlanRequest, req_json: str, category: Category, mcp: MCPServer, context: CategorizerContext
+) -> Category | None:
+  res = await _check_category(req, req_json, category, mcp, context)
+  verdict = getattr(context, f"is_{category.name}", None)
+  emit_plan_event(
+    "category_check",
+    category=category.name,
+    matched=res is not None,
+    verdict=verdict.model_dump(mode="json") if verdict else None,
+  )
+  return res
+
+
+async def _check_category(
+  req: PlanRequest, req_json: str, category: Category, mcp: MCPServer, context: CategorizerContext
 ) -> Category | None:
   match category:
     case Category.movie:
@@ -37,8 +61,8 @@ async def per_category_checker(
         return Category.tv_series
 
     case Category.photobook:
-      a = is_photobook_agent(mcp)
-      res = await a.run(req_json)
+      a = is_photobook_agent()
+      res = await a.run(req_json, toolsets=[cached_tools(mcp)])
       context.is_photobook = res.output
       context.usage.incr(res.usage())
       if res.output.is_photobook == SimpleAgentResponseResult.yes:
@@ -59,32 +83,32 @@ async def per_category_checker(
         return Category.bango_porn
 
     case Category.audio_book:
-      a = is_audio_book_agent(mcp)
-      res = await a.run(req_json)
+      a = is_audio_book_agent()
+      res = await a.run(req_json, toolsets=[cached_tools(mcp)])
       context.is_audio_book = res.output
       context.usage.incr(res.usage())
       if res.output.is_audio_book == SimpleAgentResponseResult.yes:
         return Category.audio_book
 
     case Category.book:
-      a = is_book_agent(mcp)
-      res = await a.run(req_json)
+      a = is_book_agent()
+      res = await a.run(req_json, toolsets=[cached_tools(mcp)])
       context.is_book = res.output
       context.usage.incr(res.usage())
       if res.output.is_book == SimpleAgentResponseResult.yes:
         return Category.book
 
     case Category.music:
-      a = is_music_agent(mcp)
-      res = await a.run(req_json)
+      a = is_music_agent()
+      res = await a.run(req_json, toolsets=[cached_tools(mcp)])
       context.is_music = res.output
       context.usage.incr(res.usage())
       if res.output.is_music == SimpleAgentResponseResult.yes:
         return Category.music
 
     case Category.music_video:
-      a = is_music_video_agent(mcp)
-      res = await a.run(req_json)
+      a = is_music_video_agent()
+      res = await a.run(req_json, toolsets=[cached_tools(mcp)])
       context.is_music_video = res.output
       context.usage.incr(res.usage())
       if res.output.is_music_video == SimpleAgentResponseResult.yes:
@@ -93,34 +117,104 @@ async def per_category_checker(
   return None
 
 
+async def _first_matched_category(
+  req: PlanRequest,
+  req_json: str,
+  categories: list[Category],
+  mcp: MCPServer,
+  context: CategorizerContext,
+  concurrency: int,
+) -> Category | None:
+  """
+  Run checkers for categories (in priority order) with at most concurrency agents in flight.
+
+  A category wins once its checker says yes and every higher priority checker said no, the
+  remaining checkers are cancelled at that point. The usage of a cancelled checker's agent run
+  is still added to context.usage.
+  """
+  semaphore = asyncio.Semaphore(concurrency)
+
+  async def check(cat: Category) -> Category | None:
+    async with semaphore:
+      if cat in _PER_FILE_CHECKERS:
+        return await per_category_checker(req, req_json, cat, mcp, context)
+      with capture_run_messages() as messages:
+        try:
+          return await per_category_checker(req, req_json, cat, mcp, context)
+        except asyncio.CancelledError:
+          # the checker adds its usage once it returns, a cancelled one never does.
+          context.usage.incr(usage_of(messages))
+          raise
+
+  # tasks are created in priority order, so higher priority checkers get the semaphore first.
+  tasks = [asyncio.create_task(check(cat)) for cat in categories]
+  try:
+    for task in tasks:
+      res = await task
+      if res:
+        return res
+    return None
+  finally:
+    for task in tasks:
+      task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
 async def run_categorizer(
-  req: PlanRequest, mcp: MCPServer
+  req: PlanRequest, mcp: MCPServer, concurrency: int | None = None
 ) -> Tuple[PlanRequestWithCategory, RunUsage]:
+  """
+  Categorize the request.
+
+  Args:
+      req: PlanRequest to categorize
+      mcp: metadata MCP server shared by all categorizer agents
+      concurrency: number of category checkers running at the same time, defaults to
+          CATEGORIZER_CONCURRENCY env var. 1 checks categories one by one.
+  """
+  if concurrency is None:
+    concurrency = int(os.getenv("CATEGORIZER_CONCURRENCY", "1"))
+
   # Initialize categorizer context at the beginning
   categorizer_context = CategorizerContext(request=req)
 
   # this step may change metadata
   categories_from_metadata = await categorize_by_metadata_hints(req, mcp)
+  emit_plan_event("metadata_hints", categories=[cat.name for cat in categories_from_metadata])
   req_json = req.model_dump_json()
-
-  for cat in categories_from_metadata:
-    res = await per_category_checker(req, req_json, cat, mcp, categorizer_context)
-    if res:
-      return categorizer_context.to_plan_request_with_category(res), categorizer_context.usage
-
   possible_categories = categorize_by_file_name(req)
 
-  for cat in possible_categories.highly_possible_categories:
-    res = await per_category_checker(req, req_json, cat, mcp, categorizer_context)
-    if res:
-      return categorizer_context.to_plan_request_with_category(res), categorizer_context.usage
-
-  for cat in possible_categories.possible_categories:
-    if cat in possible_categories.highly_possible_categories:
-      continue
-    res = await per_category_checker(req, req_json, cat, mcp, categorizer_context)
+  if concurrency > 1:
+    # metadata hints, then highly possible, then possible. each category is only checked once.
+    candidates = list(
+      dict.fromkeys(
+        categories_from_metadata
+        + possible_categories.highly_possible_categories
+        + possible_categories.possible_categories
+      )
+    )
+    res = await _first_matched_category(
+      req, req_json, candidates, mcp, categorizer_context, concurrency
+    )
     if res:
       return categorizer_context.to_plan_request_with_category(res), categorizer_context.usage
+  else:
+    for cat in categories_from_metadata:
+      res = await per_category_checker(req, req_json, cat, mcp, categorizer_context)
+      if res:
+        return categorizer_context.to_plan_request_with_category(res), categorizer_context.usage
+
+    for cat in possible_categories.highly_possible_categories:
+      res = await per_category_checker(req, req_json, cat, mcp, categorizer_context)
+      if res:
+        return categorizer_context.to_plan_request_with_category(res), categorizer_context.usage
+
+    for cat in possible_categories.possible_categories:
+      if cat in possible_categories.highly_possible_categories:
+        continue
+      res = await per_category_checker(req, req_json, cat, mcp, categorizer_context)
+      if res:
+        return categorizer_context.to_plan_request_with_category(res), categorizer_context.usage
 
   # run until here is likely unknown
   a = decision_maker_agent()
@@ -0,0 +1,232 @@
+import asyncio
+
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelMessage, ModelResponse, ToolCallPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from pydantic_ai.toolsets import FunctionToolset
+
+from ..models import Category, PlanRequest
+from . import runner
+from .models import FilenameBasedPreCatergoizerResult
+
+
+class FakeCheckers:
+  """Replace per_category_checker with fixed verdicts and latencies."""
+
+  def __init__(self, monkeypatch, verdicts: dict[Category, tuple[float, bool]]):
+    self.verdicts = verdicts
+    self.started: list[Category] = []
+    self.finished: list[Category] = []
+    self.cancelled: list[Category] = []
+    self.in_flight = 0
+    self.max_in_flight = 0
+    monkeypatch.setattr(runner, "per_category_checker", self.check)
+
+  async def check(self, req, req_json, category, mcp, context):
+    self.started.append(category)
+    self.in_flight += 1
+    self.max_in_flight = max(self.max_in_flight, self.in_flight)
+    delay, yes = self.verdicts[category]
+    try:
+      await asyncio.sleep(delay)
+    except asyncio.CancelledError:
+      self.cancelled.append(category)
+      raise
+    finally:
+      self.in_flight -= 1
+    self.finished.append(category)
+    return category if yes else None
+
+
+@pytest.fixture
+def categories(monkeypatch):
+  async def no_hints(req, mcp):
+    return [Category.movie]
+
+  def by_file_name(req):
+    return FilenameBasedPreCatergoizerResult(
+      highly_possible_categories=[Category.tv_series],
+      possible_categories=[
+        Category.movie,
+        Category.tv_series,
+        Category.porn,
+        Category.bango_porn,
+        Category.music_video,
+      ],
+    )
+
+  monkeypatch.setattr(runner, "categorize_by_metadata_hints", no_hints)
+  monkeypatch.setattr(runner, "categorize_by_file_name", by_file_name)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_categorizer_takes_max_latency(monkeypatch, categories):
+  """Test that concurrent mode waits about the slowest checker, not the sum."""
+  checkers = FakeCheckers(
+    monkeypatch,
+    {
+      Category.movie: (0.2, False),
+      Category.tv_series: (0.2, False),
+      Category.porn: (0.2, False),
+      Category.bango_porn: (0.2, False),
+      Category.music_video: (0.2, True),
+    },
+  )
+
+  loop = asyncio.get_running_loop()
+  start = loop.time()
+  res, _ = await runner.run_categorizer(PlanRequest(files=["a.mp4"]), None, concurrency=5)
+  elapsed = loop.time() - start
+
+  assert res.category == Category.music_video
+  assert elapsed < 0.5
+  # each category is only checked once even if it comes from several sources.
+  assert len(checkers.started) == 5
+  assert set(checkers.started) == {
+    Category.movie,
+    Category.tv_series,
+    Category.porn,
+    Category.bango_porn,
+    Category.music_video,
+  }
+
+
+@pytest.mark.asyncio
+async def test_concurrent_categorizer_honors_priority(monkeypatch, categories):
+  """Test that a faster lower priority yes does not win over a higher priority yes."""
+  FakeCheckers(
+    monkeypatch,
+    {
+      Category.movie: (0.1, True),
+      Category.tv_series: (0.01, True),
+      Category.porn: (0.01, True),
+      Category.bango_porn: (0.01, False),
+      Category.music_video: (0.01, False),
+    },
+  )
+
+  res, _ = await runner.run_categorizer(PlanRequest(files=["a.mp4"]), None, concurrency=5)
+
+  # movie comes from metadata hints, it has the highest priority.
+  assert res.category == Category.movie
+
+
+@pytest.mark.asyncio
+async def test_concurrent_categorizer_cancels_remaining(monkeypatch, categories):
+  """Test that the rest of checkers are cancelled once the winner is known."""
+  checkers = FakeCheckers(
+    monkeypatch,
+    {
+      Category.movie: (0.01, True),
+      Category.tv_series: (5, False),
+      Category.porn: (5, False),
+      Category.bango_porn: (5, False),
+      Category.music_video: (5, False),
+    },
+  )
+
+  res, _ = await runner.run_categorizer(PlanRequest(files=["a.mp4"]), None, concurrency=5)
+
+  assert res.category == Category.movie
+  assert set(checkers.cancelled) == {
+    Category.tv_series,
+    Category.porn,
+    Category.bango_porn,
+    Category.music_video,
+  }
+
+
+@pytest.mark.asyncio
+async def test_concurrent_categorizer_counts_usage_of_cancelled(monkeypatch, categories):
+  """Test that the model requests of a checker cancelled by a match are still counted."""
+
+  async def hang() -> str:
+    await asyncio.sleep(10)
+    return "never"
+
+  def answer(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+    return ModelResponse(parts=[ToolCallPart("hang", {})])
+
+  agent = Agent(FunctionModel(answer), toolsets=[FunctionToolset([hang])])
+
+  async def check(req, req_json, category, mcp, context):
+    if category == Category.music_video:
+      await agent.run(req_json)
+    await asyncio.sleep(0.05)
+    return category if category == Category.tv_series else None
+
+  monkeypatch.setattr(runner, "per_category_checker", check)
+
+  res, usage = await runner.run_categorizer(PlanRequest(files=["a.mp4"]), None, concurrency=5)
+
+  # music_video is cancelled once tv_series matches, after one model request.
+  assert res.category == Category.tv_series
+  assert usage.requests == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_categorizer_bounded_fan_out(monkeypatch, categories):
+  """Test that no more than concurrency checkers run at the same time."""
+  checkers = FakeCheckers(
+    monkeypatch,
+    {
+      Category.movie: (0.02, False),
+      Category.tv_series: (0.02, False),
+      Category.porn: (0.02, False),
+      Category.bango_porn: (0.02, False),
+      Category.music_video: (0.02, True),
+    },
+  )
+
+  res, _ = await runner.run_categorizer(PlanRequest(files=["a.mp4"]), None, concurrency=2)
+
+  assert res.category == Category.music_video
+  assert checkers.max_in_flight == 2
+
+
+@pytest.mark.asyncio
+async def test_sequential_categorizer_stops_at_first_yes(monkeypatch, categories):
+  """Test that the default mode checks one category at a time and stops at the first yes."""
+  checkers = FakeCheckers(
+    monkeypatch,
+    {
+      Category.movie: (0, False),
+      Category.tv_series: (0, True),
+      Category.porn: (0, True),
+      Category.bango_porn: (0, True),
+      Category.music_video: (0, True),
+    },
+  )
+
+  res, _ = await runner.run_categorizer(PlanRequest(files=["a.mp4"]), None, concurrency=1)
+
+  assert res.category == Category.tv_series
+  assert checkers.started == [Category.movie, Category.tv_series]
+  assert checkers.max_in_flight == 1
+
+
+@pytest.mark.asyncio
+async def test_categorizer_streams_verdicts(monkeypatch, categories):
+  """Test that metadata hints and every checker verdict are streamed as plan events."""
+  from ..events import stream_plan_events
+  from ..models import PlanResponse
+
+  async def check(req, req_json, category, mcp, context):
+    return category if category == Category.tv_series else None
+
+  monkeypatch.setattr(runner, "_check_category", check)
+
+  async def plan():
+    await runner.run_categorizer(PlanRequest(files=["a.mp4"]), None, concurrency=1)
+    return PlanResponse()
+
+  events = [event async for event in stream_plan_events(plan)]
+
+  assert [(event.stage, event.data.get("category")) for event in events[:3]] == [
+    ("metadata_hints", None),
+    ("category_check", "movie"),
+    ("category_check", "tv_series"),
+  ]
+  assert events[0].data["categories"] == ["movie"]
+  assert [event.data["matched"] for event in events[1:3]] == [False, True]
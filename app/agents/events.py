@@ -0,0 +1,93 @@
+import asyncio
+import contextvars
+import logging
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Literal
+
+from pydantic import BaseModel
+
+from .ai import setupLogfireForStdLog
+from .models import PlanAction, PlanResponse
+
+setupLogfireForStdLog()
+_LOGGER = logging.getLogger(__name__)
+
+PlanStage = Literal[
+  # categories suggested by the request metadata
+  "metadata_hints",
+  # verdict of one per_category_checker
+  "category_check",
+  # the category the categorizer chose
+  "category",
+  # the actor dir a bango porn file goes to
+  "actor_dir",
+  # plan actions a mover produced, before the whole plan is done
+  "actions",
+  # the finished plan, always the last event unless planning failed
+  "plan",
+  "error",
+]
+
+
+class PlanEvent(BaseModel):
+  stage: PlanStage
+  data: dict[str, Any] = {}
+
+
+# where the planning stages of the current request report to, None when nobody listens.
+_sink: ContextVar[Callable[[PlanEvent], None] | None] = ContextVar("plan_event_sink", default=None)
+
+
+def emit_plan_event(stage: PlanStage, **data: Any):
+  """Report a planning stage to the stream of the current request, if it is streamed."""
+  sink = _sink.get()
+  if sink:
+    sink(PlanEvent(stage=stage, data=data))
+
+
+def without_plan_events() -> contextvars.Context:
+  """
+  Copy of the current context reporting to no stream, for tasks that outlive or serve more than
+  the current request.
+  """
+  context = contextvars.copy_context()
+  context.run(_sink.set, None)
+  return context
+
+
+def emit_plan_actions(actions: list[PlanAction]):
+  """Report plan actions a mover produced, nothing when there are none."""
+  if actions:
+    emit_plan_event("actions", actions=actions)
+
+
+async def stream_plan_events(
+  plan: Callable[[], Awaitable[PlanResponse]],
+) -> AsyncIterator[PlanEvent]:
+  """
+  Run plan and yield the events of its stages as they happen.
+
+  Tasks started by plan inherit the sink, so concurrent checkers report too. The last event is
+  "plan" with the PlanResponse, or "error" if planning raised.
+  """
+  queue: asyncio.Queue[PlanEvent | None] = asyncio.Queue()
+
+  async def produce():
+    _sink.set(queue.put_nowait)
+    try:
+      res = await plan()
+      queue.put_nowait(PlanEvent(stage="plan", data=res.model_dump()))
+    except Exception as e:
+      _LOGGER.exception("streamed plan failed")
+      queue.put_nowait(PlanEvent(stage="error", data={"reason": str(e)}))
+    finally:
+      queue.put_nowait(None)
+
+  task = asyncio.create_task(produce())
+  try:
+    while (event := await queue.get()) is not None:
+      yield event
+  finally:
+    # the client went away, stop planning.
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from .events import emit_plan_actions, emit_plan_event, stream_plan_events
+from .models import PlanAction, PlanResponse
+
+
+@pytest.mark.asyncio
+async def test_stream_plan_events():
+  """Test that stages are streamed as they happen, including from tasks, and the plan is last."""
+  action = PlanAction(file="a.mkv", action="move", target="movie/a.mkv")
+
+  async def plan() -> PlanResponse:
+    emit_plan_event("metadata_hints", categories=[])
+    await asyncio.gather(
+      *[asyncio.create_task(_check(category)) for category in ["movie", "tv_series"]]
+    )
+    emit_plan_actions([])
+    emit_plan_actions([action])
+    return PlanResponse(plan=[action])
+
+  async def _check(category: str):
+    emit_plan_event("category_check", category=category, matched=category == "movie")
+
+  events = [event async for event in stream_plan_events(plan)]
+
+  assert [event.stage for event in events] == [
+    "metadata_hints",
+    "category_check",
+    "category_check",
+    "actions",
+    "plan",
+  ]
+  assert events[-1].data["plan"] == [action.model_dump()]
+
+
+@pytest.mark.asyncio
+async def test_stream_plan_events_error():
+  """Test that a failed plan ends the stream with an error event."""
+
+  async def plan() -> PlanResponse:
+    emit_plan_event("category", category="movie")
+    raise RuntimeError("model unavailable")
+
+  events = [event async for event in stream_plan_events(plan)]
+
+  assert [event.stage for event in events] == ["category", "error"]
+  assert events[-1].data["reason"] == "model unavailable"
+
+
+def test_emit_without_stream():
+  """Test that emitting outside a streamed plan does nothing."""
+  emit_plan_event("category", category="movie")
@@ -0,0 +1,172 @@
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any
+
+from pydantic_ai import RunContext
+from pydantic_ai.mcp import MCPServer
+from pydantic_ai.toolsets import AbstractToolset, ToolsetTool, WrapperToolset
+
+from .utils.cache import TTLCache
+
+# seconds agent tool results are kept in mcp_call_cache, other tools are only memoized per run.
+_TOOL_TTLS = {
+  "search_movies": 7 * 24 * 3600,
+  "search_tv_shows": 7 * 24 * 3600,
+  "search_porn": 7 * 24 * 3600,
+  "search_japanese_porn": 7 * 24 * 3600,
+  "web_search": 24 * 3600,
+}
+
+# agent runs a CachingToolset keeps memoized results of
+_MEMO_RUNS = 64
+
+_cache: TTLCache | None = None
+
+
+def mcp_call_cache() -> TTLCache:
+  """Results of metadata MCP tool calls, stats counts the hits and misses."""
+  global _cache
+  if _cache is None:
+    _cache = TTLCache(
+      "mcp_calls",
+      ttl=float(os.getenv("MCP_CACHE_TTL", str(7 * 24 * 3600))),
+      max_entries=int(os.getenv("MCP_CACHE_SIZE", "1024")),
+      path=os.getenv("MCP_CACHE_FILE") or None,
+      max_rows=int(os.getenv("MCP_CACHE_MAX_ROWS", "10000")),
+    )
+  return _cache
+
+
+def close_mcp_call_cache():
+  global _cache
+  if _cache:
+    _cache.close()
+    _cache = None
+
+
+def _is_json(value: Any) -> bool:
+  """Whether value is stored in MCP_CACHE_FILE as it is, nested values included."""
+  if value is None or isinstance(value, (str, int, float, bool)):
+    return True
+  if isinstance(value, list):
+    return all(_is_json(v) for v in value)
+  if isinstance(value, dict):
+    return all(isinstance(k, str) and _is_json(v) for k, v in value.items())
+  return False
+
+
+async def _cache_get(key: str) -> Any | None:
+  # a miss of the memory tier reads MCP_CACHE_FILE, keep it off the event loop.
+  return await asyncio.to_thread(mcp_call_cache().get, key)
+
+
+async def _cache_set(key: str, value: Any, ttl: float | None = None):
+  await asyncio.to_thread(mcp_call_cache().set, key, value, ttl)
+
+
+def mcp_call_key(tool_name: str, args: dict[str, Any]) -> str:
+  content = json.dumps(
+    {"tool": tool_name, "args": args}, sort_keys=True, ensure_ascii=False, default=str
+  )
+  return hashlib.sha256(content.encode()).hexdigest()
+
+
+async def cached_direct_call_tool(mcp: MCPServer, tool_name: str, args: dict[str, Any]) -> Any:
+  """
+  mcp.direct_call_tool, answered from mcp_call_cache without a MCP round-trip when it hits.
+
+  Callers get their own copy of the result, they may store parts of it in the request metadata.
+  Results that are not JSON are not cached.
+  """
+  key = mcp_call_key(tool_name, args)
+  cached = await _cache_get(key)
+  if cached is not None:
+    return copy.deepcopy(cached)
+
+  res = await mcp.direct_call_tool(tool_name, args)
+  if res is not None and _is_json(res):
+    await _cache_set(key, copy.deepcopy(res))
+  return res
+
+
+def tool_ttls() -> dict[str, float]:
+  """
+  _TOOL_TTLS updated by MCP_TOOL_CACHE_TTLS, e.g. "web_search=3600,search_movies=0". 0 turns the
+  cache off for a tool.
+  """
+  ttls: dict[str, float] = dict(_TOOL_TTLS)
+  for policy in os.getenv("MCP_TOOL_CACHE_TTLS", "").split(","):
+    if "=" in policy:
+      name, ttl = policy.split("=", 1)
+      ttls[name.strip()] = float(ttl)
+  return ttls
+
+
+def normalize_tool_args(value: Any) -> Any:
+  """
+  Arguments as the key of a tool call: strings are NFKC normalized, case folded and whitespace
+  collapsed, None values are dropped.
+  """
+  if isinstance(value, str):
+    return " ".join(unicodedata.normalize("NFKC", value).split()).casefold()
+  if isinstance(value, dict):
+    return {k: normalize_tool_args(v) for k, v in value.items() if v is not None}
+  if isinstance(value, list):
+    return [normalize_tool_args(v) for v in value]
+  return value
+
+
+@dataclass
+class CachingToolset(WrapperToolset):
+  """
+  Answers repeated agent tool calls locally.
+
+  A call with the same tool and normalized arguments is memoized for the rest of the agent run,
+  whatever the tool. Tools with a TTL policy are also kept in mcp_call_cache, shared with
+  cached_direct_call_tool and persisted in MCP_CACHE_FILE. Tool errors and results that are not
+  JSON are never cached.
+  """
+
+  ttls: dict[str, float] = field(default_factory=tool_ttls)
+  _runs: OrderedDict[str, dict[str, Any]] = field(default_factory=OrderedDict, repr=False)
+
+  async def call_tool(
+    self, name: str, tool_args: dict[str, Any], ctx: RunContext, tool: ToolsetTool
+  ) -> Any:
+    key = mcp_call_key(name, normalize_tool_args(tool_args))
+    memo = self._memo(ctx.run_id)
+    if key in memo:
+      return copy.deepcopy(memo[key])
+
+    ttl = self.ttls.get(name, 0)
+    cached = await _cache_get(key) if ttl > 0 else None
+    if cached is not None:
+      res = copy.deepcopy(cached)
+    else:
+      res = await self.wrapped.call_tool(name, tool_args, ctx, tool)
+      if res is None or not _is_json(res):
+        return res
+      if ttl > 0:
+        await _cache_set(key, copy.deepcopy(res), ttl)
+
+    memo[key] = copy.deepcopy(res)
+    return res
+
+  def _memo(self, run_id: str | None) -> dict[str, Any]:
+    run_id = run_id or ""
+    if run_id not in self._runs:
+      self._runs[run_id] = {}
+      while len(self._runs) > _MEMO_RUNS:
+        self._runs.popitem(last=False)
+    return self._runs[run_id]
+
+
+def cached_tools(mcp: AbstractToolset) -> CachingToolset:
+  """mcp for Agent.run(toolsets=...), with its tool calls cached."""
+  return CachingToolset(mcp)
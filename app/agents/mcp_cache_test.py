@@ -0,0 +1,174 @@
+from datetime import datetime
+
+import pytest
+from pydantic_ai import Agent, ModelMessage, ModelResponse, TextPart, ToolCallPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from pydantic_ai.toolsets import FunctionToolset
+
+from .mcp_cache import (
+  cached_direct_call_tool,
+  cached_tools,
+  close_mcp_call_cache,
+  mcp_call_cache,
+  normalize_tool_args,
+)
+
+
+class CountingMCP:
+  def __init__(self):
+    self.calls: list[tuple[str, dict]] = []
+
+  async def direct_call_tool(self, tool_name, args):
+    self.calls.append((tool_name, args))
+    return {"movie_results": [{"id": len(self.calls), "title": "The Dark Knight"}]}
+
+
+@pytest.fixture
+def cache_file(tmp_path, monkeypatch):
+  monkeypatch.setenv("MCP_CACHE_FILE", str(tmp_path / "mcp.db"))
+  close_mcp_call_cache()
+  yield
+  close_mcp_call_cache()
+
+
+@pytest.mark.asyncio
+async def test_cached_direct_call_tool(cache_file):
+  """Test that a repeated call is answered from the cache without calling the MCP server."""
+  mcp = CountingMCP()
+  args = {"imdb_id": "tt0468569"}
+
+  first = await cached_direct_call_tool(mcp, "find_by_imdb_id", args)
+  # callers may change the result, the cached one stays as it was.
+  first["movie_results"].clear()
+  second = await cached_direct_call_tool(mcp, "find_by_imdb_id", dict(args))
+
+  assert len(mcp.calls) == 1
+  assert second["movie_results"][0]["id"] == 1
+  assert mcp_call_cache().stats.memory_hits == 1
+  assert mcp_call_cache().stats.misses == 1
+
+  await cached_direct_call_tool(mcp, "find_by_imdb_id", {"imdb_id": "tt0944947"})
+  await cached_direct_call_tool(mcp, "search_japanese_porn", {"jav_id": "tt0468569"})
+  assert len(mcp.calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_cached_direct_call_tool_survives_restart(cache_file):
+  """Test that results are read from the SQLite tier after a restart."""
+  mcp = CountingMCP()
+  await cached_direct_call_tool(mcp, "search_japanese_porn", {"jav_id": "pred00374"})
+  close_mcp_call_cache()
+
+  res = await cached_direct_call_tool(mcp, "search_japanese_porn", {"jav_id": "pred00374"})
+
+  assert len(mcp.calls) == 1
+  assert res["movie_results"][0]["id"] == 1
+  assert mcp_call_cache().stats.disk_hits == 1
+
+
+class CountingTools:
+  """FunctionToolset with a cached and an uncached tool, counting calls"""
+
+  def __init__(self):
+    self.calls: list[str] = []
+
+    def search_movies(query: str) -> dict:
+      self.calls.append("search_movies")
+      return {"results": [{"title": query, "call": len(self.calls)}]}
+
+    def random_pick(query: str) -> int:
+      self.calls.append("random_pick")
+      return len(self.calls)
+
+    def search_tv_shows(query: str) -> dict:
+      self.calls.append("search_tv_shows")
+      return {"results": [{"title": query, "first_air_date": datetime(2008, 1, 20)}]}
+
+    self.toolset = FunctionToolset([search_movies, random_pick, search_tv_shows])
+
+
+def _searching_agent(calls: list[tuple[str, str]]) -> Agent:
+  """Agent calling each (tool, query) of calls in turn, then answering."""
+
+  def answer(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+    step = sum(isinstance(m, ModelResponse) for m in messages)
+    if step < len(calls):
+      tool, query = calls[step]
+      return ModelResponse(parts=[ToolCallPart(tool, {"query": query})])
+    return ModelResponse(parts=[TextPart("done")])
+
+  return Agent(FunctionModel(answer))
+
+
+def test_normalize_tool_args():
+  """Test that spelling differences of the same arguments normalize the same."""
+  assert normalize_tool_args({"query": "  The  Ｄａｒｋ Knight ", "year": None, "page": 1}) == {
+    "query": "the dark knight",
+    "page": 1,
+  }
+
+
+@pytest.mark.asyncio
+async def test_caching_toolset(cache_file):
+  """Test that repeated tool calls are answered locally, in and across agent runs."""
+  tools = CountingTools()
+  calls = [
+    ("search_movies", "The Dark Knight"),
+    ("search_movies", "the  dark knight"),
+    ("random_pick", "x"),
+    ("random_pick", "x"),
+  ]
+
+  await _searching_agent(calls).run("plan", toolsets=[cached_tools(tools.toolset)])
+  assert tools.calls == ["search_movies", "random_pick"]
+
+  # another run, search_movies has a TTL policy, random_pick is only memoized per run.
+  await _searching_agent(calls).run("plan", toolsets=[cached_tools(tools.toolset)])
+  assert tools.calls == ["search_movies", "random_pick", "random_pick"]
+
+  # and search_movies survives a restart.
+  close_mcp_call_cache()
+  await _searching_agent(calls[:1]).run("plan", toolsets=[cached_tools(tools.toolset)])
+  assert tools.calls.count("search_movies") == 1
+
+
+@pytest.mark.asyncio
+async def test_caching_toolset_ttl_policy(cache_file, monkeypatch):
+  """Test that MCP_TOOL_CACHE_TTLS turns the cache off for a tool."""
+  monkeypatch.setenv("MCP_TOOL_CACHE_TTLS", "search_movies=0")
+  tools = CountingTools()
+  calls = [("search_movies", "The Dark Knight")]
+
+  for _ in range(2):
+    await _searching_agent(calls).run("plan", toolsets=[cached_tools(tools.toolset)])
+
+  assert tools.calls == ["search_movies", "search_movies"]
+
+
+class DatedMCP:
+  async def direct_call_tool(self, tool_name, args):
+    return {"tv_results": [{"name": "Breaking Bad", "first_air_date": datetime(2008, 1, 20)}]}
+
+
+@pytest.mark.asyncio
+async def test_cached_direct_call_tool_skips_results_that_are_not_json(cache_file):
+  """Test that a result with a nested value JSON can not store is returned, but not cached."""
+  mcp = DatedMCP()
+
+  res = await cached_direct_call_tool(mcp, "find_by_imdb_id", {"imdb_id": "tt0903747"})
+
+  assert res["tv_results"][0]["first_air_date"] == datetime(2008, 1, 20)
+  assert await cached_direct_call_tool(mcp, "find_by_imdb_id", {"imdb_id": "tt0903747"}) == res
+  assert mcp_call_cache().stats.misses == 2
+
+
+@pytest.mark.asyncio
+async def test_caching_toolset_skips_results_that_are_not_json(cache_file):
+  """Test that a result with a nested value JSON can not store is passed on, but not cached."""
+  tools = CountingTools()
+  calls = [("search_tv_shows", "Breaking Bad"), ("search_tv_shows", "Breaking Bad")]
+
+  await _searching_agent(calls).run("plan", toolsets=[cached_tools(tools.toolset)])
+
+  assert tools.calls == ["search_tv_shows", "search_tv_shows"]
+  assert mcp_call_cache().stats.misses == 2
@@ -0,0 +1,231 @@
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable
+
+import anyio
+import httpx
+from mcp.shared.exceptions import McpError
+from pydantic_ai.mcp import MCPServer
+
+from .ai import metadataMcp, setupLogfireForStdLog
+
+setupLogfireForStdLog()
+_LOGGER = logging.getLogger(__name__)
+
+# errors which mean the underlying streamable-HTTP session is gone and must be rebuilt.
+_CONNECTION_ERRORS = (
+  OSError,
+  httpx.HTTPError,
+  McpError,
+  anyio.ClosedResourceError,
+  anyio.BrokenResourceError,
+  anyio.EndOfStream,
+)
+
+
+def _raised_by(server: MCPServer, e: BaseException) -> bool:
+  """Whether e is a connection error raised by a call on server, not by the code leasing it."""
+  if not isinstance(e, _CONNECTION_ERRORS):
+    return False
+  tb = e.__traceback__
+  while tb:
+    if tb.tb_frame.f_locals.get("self") is server:
+      return True
+    tb = tb.tb_next
+  return False
+
+
+class _PooledSession:
+  """
+  One MCP session, entered and exited by its own long-lived owner task.
+
+  The streamable-HTTP client runs in anyio cancel scopes, which must be exited by the task that
+  entered them. Leases, health checks and the lifespan only signal the owner task to close.
+  """
+
+  def __init__(self, factory: Callable[[], MCPServer]):
+    self.factory = factory
+    self.server: MCPServer | None = None
+    self.leases = 0
+    self.healthy = False
+    self._owner: asyncio.Task | None = None
+    self._stop = asyncio.Event()
+
+  async def open(self):
+    """Connect a new session, healthy tells whether it worked."""
+    self.server = self.factory()
+    self._stop = asyncio.Event()
+    connected = asyncio.get_running_loop().create_future()
+    self._owner = asyncio.create_task(self._own(self.server, self._stop, connected))
+    self.healthy = await connected
+
+  async def close(self):
+    self.healthy = False
+    if self._owner is None:
+      return
+    self._stop.set()
+    await asyncio.gather(self._owner, return_exceptions=True)
+    self._owner = None
+
+  async def _own(self, server: MCPServer, stop: asyncio.Event, connected: asyncio.Future):
+    try:
+      async with server:
+        connected.set_result(True)
+        await stop.wait()
+    except Exception as e:
+      if connected.done():
+        _LOGGER.warning(f"MCP session closed with an error: {e}")
+      else:
+        _LOGGER.error(f"Failed to connect MCP session: {e}")
+    finally:
+      if not connected.done():
+        connected.set_result(False)
+      if server is self.server:
+        self.healthy = False
+
+
+class MCPPool:
+  """
+  Keep a fixed number of MCP sessions entered (connected) and share them between plans.
+
+  A MCP session multiplexes requests, so a session is not checked out exclusively: each lease
+  goes to the healthy session with the fewest active leases. A background task pings idle
+  sessions and reconnects the ones that failed.
+  """
+
+  def __init__(
+    self,
+    factory: Callable[[], MCPServer],
+    size: int = 2,
+    health_check_interval: float = 30,
+    health_check_timeout: float = 10,
+  ):
+    self._factory = factory
+    self._size = max(1, size)
+    self._health_check_interval = health_check_interval
+    self._health_check_timeout = health_check_timeout
+    self._members: list[_PooledSession] = []
+    self._reconnect_lock = asyncio.Lock()
+    self._health_task: asyncio.Task | None = None
+
+  async def start(self):
+    for _ in range(self._size):
+      member = _PooledSession(self._factory)
+      self._members.append(member)
+      await member.open()
+
+    if self._health_check_interval > 0:
+      self._health_task = asyncio.create_task(self._health_loop())
+
+  async def close(self):
+    if self._health_task:
+      self._health_task.cancel()
+      try:
+        await self._health_task
+      except asyncio.CancelledError:
+        pass
+      self._health_task = None
+
+    for member in self._members:
+      await member.close()
+    self._members = []
+
+  @asynccontextmanager
+  async def session(self) -> AsyncIterator[MCPServer]:
+    member = await self._pick()
+    member.leases += 1
+    try:
+      yield member.server
+    except _CONNECTION_ERRORS as e:
+      # an OSError or HTTP error of the plan itself, e.g. a file operation, leaves the session be.
+      if _raised_by(member.server, e):
+        # let the health check (or the next lease) rebuild this session.
+        member.healthy = False
+      raise
+    finally:
+      member.leases -= 1
+
+  async def check_health(self):
+    """Ping idle sessions and reconnect broken ones, one pass."""
+    for member in self._members:
+      if member.leases > 0:
+        continue
+
+      if member.healthy:
+        try:
+          await asyncio.wait_for(member.server.list_tools(), self._health_check_timeout)
+          continue
+        except (asyncio.TimeoutError, *_CONNECTION_ERRORS) as e:
+          _LOGGER.warning(f"MCP session health check failed: {e}")
+          member.healthy = False
+
+      await self._reconnect(member)
+
+  async def _health_loop(self):
+    while True:
+      await asyncio.sleep(self._health_check_interval)
+      try:
+        await self.check_health()
+      except Exception as e:
+        _LOGGER.error(f"MCP pool health check error: {e}")
+
+  async def _pick(self) -> _PooledSession:
+    if not self._members:
+      raise RuntimeError("MCP pool is not started")
+
+    healthy = [m for m in self._members if m.healthy]
+    if healthy:
+      return min(healthy, key=lambda m: m.leases)
+
+    # nothing healthy, reconnect the least used session inline instead of failing the plan.
+    member = min(self._members, key=lambda m: m.leases)
+    await self._reconnect(member)
+    return member
+
+  async def _reconnect(self, member: _PooledSession):
+    async with self._reconnect_lock:
+      if member.healthy:
+        return
+      await member.close()
+      await member.open()
+
+
+_pool: MCPPool | None = None
+
+
+async def start_mcp_pool() -> MCPPool:
+  global _pool
+  _pool = MCPPool(
+    metadataMcp,
+    size=int(os.getenv("MCP_POOL_SIZE", "2")),
+    health_check_interval=float(os.getenv("MCP_POOL_HEALTH_CHECK_INTERVAL", "30")),
+  )
+  await _pool.start()
+  return _pool
+
+
+async def stop_mcp_pool():
+  global _pool
+  if _pool:
+    await _pool.close()
+    _pool = None
+
+
+@asynccontextmanager
+async def metadata_mcp_session() -> AsyncIterator[MCPServer]:
+  """
+  Lease a metadata MCP session from the pool.
+
+  Without a started pool (tests, `just run-agent`) a fresh session is opened and kept for the
+  whole block, so agent runs inside it still share one handshake.
+  """
+  if _pool is None:
+    mcp = metadataMcp()
+    async with mcp:
+      yield mcp
+    return
+
+  async with _pool.session() as mcp:
+    yield mcp
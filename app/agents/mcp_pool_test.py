@@ -0,0 +1,182 @@
+import asyncio
+
+import httpx
+import pytest
+
+from .mcp_pool import MCPPool
+
+
+class FakeMCP:
+  """Stand-in for MCPServerStreamableHTTP, counts connects and can be told to fail."""
+
+  connects = 0
+
+  def __init__(self):
+    self.running = 0
+    self.fail_list_tools = False
+    self.entered_in: asyncio.Task | None = None
+    self.exited_in: asyncio.Task | None = None
+
+  @property
+  def is_running(self) -> bool:
+    return self.running > 0
+
+  async def __aenter__(self):
+    FakeMCP.connects += 1
+    self.running += 1
+    self.entered_in = asyncio.current_task()
+    return self
+
+  async def __aexit__(self, *args):
+    self.running -= 1
+    self.exited_in = asyncio.current_task()
+
+  async def list_tools(self):
+    if self.fail_list_tools:
+      raise httpx.ConnectError("connection refused")
+    return []
+
+
+@pytest.fixture(autouse=True)
+def reset_connects():
+  FakeMCP.connects = 0
+
+
+@pytest.mark.asyncio
+async def test_pool_keeps_sessions_warm():
+  """Test that leases reuse the sessions opened at start instead of connecting again."""
+  pool = MCPPool(FakeMCP, size=2, health_check_interval=0)
+  await pool.start()
+  assert FakeMCP.connects == 2
+
+  for _ in range(5):
+    async with pool.session() as mcp:
+      assert mcp.is_running
+
+  assert FakeMCP.connects == 2
+  await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_spreads_concurrent_leases():
+  """Test that concurrent leases go to the least used session."""
+  pool = MCPPool(FakeMCP, size=2, health_check_interval=0)
+  await pool.start()
+
+  async with pool.session() as first:
+    async with pool.session() as second:
+      assert first is not second
+
+  await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_reconnects_after_failed_health_check():
+  """Test that a session failing its health check is replaced by a new connection."""
+  pool = MCPPool(FakeMCP, size=1, health_check_interval=0)
+  await pool.start()
+
+  async with pool.session() as mcp:
+    broken = mcp
+  broken.fail_list_tools = True
+
+  await pool.check_health()
+
+  assert FakeMCP.connects == 2
+  assert not broken.is_running
+  async with pool.session() as mcp:
+    assert mcp is not broken
+    assert mcp.is_running
+
+  await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_reconnects_after_connection_error_in_lease():
+  """Test that a connection error raised while leased marks the session for reconnect."""
+  pool = MCPPool(FakeMCP, size=1, health_check_interval=0)
+  await pool.start()
+
+  with pytest.raises(httpx.ConnectError):
+    async with pool.session() as mcp:
+      broken = mcp
+      mcp.fail_list_tools = True
+      await mcp.list_tools()
+
+  async with pool.session() as mcp:
+    assert mcp is not broken
+
+  assert FakeMCP.connects == 2
+  await pool.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("error", [FileNotFoundError("movie.mkv"), httpx.ConnectError("refused")])
+async def test_pool_keeps_session_after_error_of_the_plan(error):
+  """Test that an error not raised by the MCP session does not reconnect it."""
+  pool = MCPPool(FakeMCP, size=1, health_check_interval=0)
+  await pool.start()
+
+  with pytest.raises(type(error)):
+    async with pool.session() as mcp:
+      leased = mcp
+      raise error
+
+  async with pool.session() as mcp:
+    assert mcp is leased
+
+  assert FakeMCP.connects == 1
+  await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_close_disconnects_sessions():
+  """Test that closing the pool exits every session."""
+  pool = MCPPool(FakeMCP, size=3, health_check_interval=0)
+  await pool.start()
+
+  sessions = [m.server for m in pool._members]
+  await pool.close()
+
+  assert all(not s.is_running for s in sessions)
+
+
+@pytest.mark.asyncio
+async def test_pool_enters_and_exits_sessions_in_one_task():
+  """Test that a session is exited by the task that entered it, not the caller of reconnect."""
+  pool = MCPPool(FakeMCP, size=1, health_check_interval=0)
+  await pool.start()
+
+  broken = pool._members[0].server
+  broken.fail_list_tools = True
+  # health checks and leases run in other tasks than the one that started the pool.
+  await asyncio.create_task(pool.check_health())
+  replacement = pool._members[0].server
+  await asyncio.create_task(pool.close())
+
+  for server in [broken, replacement]:
+    assert server.exited_in is server.entered_in
+    assert server.entered_in is not asyncio.current_task()
+
+
+@pytest.mark.asyncio
+async def test_pool_marks_session_unhealthy_when_connect_fails():
+  """Test that a session failing to connect is reconnected by the next lease."""
+
+  class FlakyMCP(FakeMCP):
+    fail_next = True
+
+    async def __aenter__(self):
+      if FlakyMCP.fail_next:
+        FlakyMCP.fail_next = False
+        raise httpx.ConnectError("connection refused")
+      return await super().__aenter__()
+
+  pool = MCPPool(FlakyMCP, size=1, health_check_interval=0)
+  await pool.start()
+  assert not pool._members[0].healthy
+
+  async with pool.session() as mcp:
+    assert mcp.is_running
+
+  await pool.close()
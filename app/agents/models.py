@@ -61,11 +61,19 @@ class APIPlanRequest(BaseModel):
   dir: str
   files: List[str]
   metadata: dict[str, Any] | None = None
+  # skip the plan cache for this request, the new plan is not stored either.
+  bypass_cache: bool = False
+  # drop the cached plan for this request and plan again.
+  invalidate_cache: bool = False
 
 
 class APIExecuteRequest(BaseModel):
   dir: str
   plan: List[PlanAction]
+  # "link" keeps the files in place for seeding, EXECUTE_MODE when not given
+  mode: Literal["move", "link"] | None = None
+  # run in the background, returns the job to poll instead of waiting for the moves
+  job: bool = False
 
 
 class APIReplanRequest(BaseModel):
@@ -79,8 +87,16 @@ class PlanFailed(PlanAction):
   reason: str
 
 
+class ActionTiming(PlanAction):
+  # waiting for a worker and for the devices of file and target
+  queued_seconds: float
+  seconds: float
+  method: Literal["rename", "copy", "reflink", "hardlink"] = "rename"
+
+
 class ExecuteResponse(BaseModel):
   failed_move: List[PlanFailed]
+  timings: List[ActionTiming] = []
 
 
 class SimpleAgentResponseResult(Enum):
@@ -0,0 +1,40 @@
+import unicodedata
+
+# traditional chinese and japanese shinjitai characters common in actor names, and their
+# simplified chinese form.
+_TRADITIONAL = (
+  "結瀨瀬澤沢櫻桜愛麗絲優實橋濱邊邉辺島嶋廣広鈴紗綾夢戀蓮恵彌條東來華陽楓絵繪紀織葉詩飛鳥龍竜風"
+  "涼貴寶宮園張劉馬亞亜黒﨑齋斎齊斉眞徳團壽紅純綺緒維羅聖聰長門開間關関雲靜飯魚鮎鶴鷹黃會戸戶"
+  "渕淵澁渋樹檜歩淺滝瀧燈環瑤穂綿総總緑綠縁緣繭萊蘭蛍螢誠豊豐賀輝遙遼郷鄉錦鏡陸霧響頼賴顕類鳴"
+  "與憐藍讃莊荘醬"
+)
+_SIMPLIFIED = (
+  "结濑濑泽泽樱樱爱丽丝优实桥滨边边边岛岛广广铃纱绫梦恋莲惠弥条东来华阳枫绘绘纪织叶诗飞鸟龙龙风"
+  "凉贵宝宫园张刘马亚亚黑崎斋斋齐齐真德团寿红纯绮绪维罗圣聪长门开间关关云静饭鱼鲇鹤鹰黄会户户"
+  "渊渊涩涩树桧步浅泷泷灯环瑶穗绵总总绿绿缘缘茧莱兰萤萤诚丰丰贺辉遥辽乡乡锦镜陆雾响赖赖显类鸣"
+  "与怜蓝赞庄庄酱"
+)
+_KATAKANA = "".join(chr(c) for c in range(ord("ァ"), ord("ヶ") + 1))
+_HIRAGANA = "".join(chr(c) for c in range(ord("ぁ"), ord("ゖ") + 1))
+# spaces and the separators used between family and given names are dropped.
+_ASCII_SEPARATORS = " \t._-"
+_SEPARATORS = _ASCII_SEPARATORS + "・·"
+_FOLD = str.maketrans(_TRADITIONAL + _KATAKANA, _SIMPLIFIED + _HIRAGANA, _SEPARATORS)
+
+
+def normalize_actor_name(name: str) -> str:
+  """
+  Key under which spelling variants of an actor name are equal.
+
+  Folds full-width / half-width forms (NFKC), traditional chinese and japanese kanji to simplified
+  chinese, katakana to hiragana, case, and spaces or dots between names. For example
+  "波多野結衣", "波多野结衣" and "波多野 結衣" share one key, as do "Yui Hatano" and "YUI HATANO".
+  """
+  s = unicodedata.normalize("NFKC", name).casefold()
+  if not s.isascii():
+    return s.translate(_FOLD)
+
+  # str.translate is slow, romanized names only need the separators dropped.
+  for sep in _ASCII_SEPARATORS:
+    s = s.replace(sep, "")
+  return s
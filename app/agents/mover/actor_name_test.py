@@ -0,0 +1,26 @@
+import pytest
+
+from .actor_name import normalize_actor_name
+
+
+@pytest.mark.parametrize(
+  "a, b",
+  [
+    ("波多野結衣", "波多野结衣"),
+    ("波多野結衣", "波多野 結衣"),
+    ("七瀬アリス", "七瀨ありす"),
+    ("七瀬アリス", "七瀬・アリス"),
+    ("ｱﾘｽ", "アリス"),
+    ("Yui Hatano", "ＹＵＩ　ＨＡＴＡＮＯ"),
+    ("Yui Hatano", "yui.hatano"),
+  ],
+)
+def test_normalize_actor_name_variants(a, b):
+  """Test that spelling variants of a name share one key."""
+  assert normalize_actor_name(a) == normalize_actor_name(b)
+
+
+def test_normalize_actor_name_different_names():
+  """Test that different names keep different keys."""
+  assert normalize_actor_name("波多野結衣") != normalize_actor_name("波多野结")
+  assert normalize_actor_name("Yui Hatano") != normalize_actor_name("Yui Hatan")
@@ -1,3 +1,4 @@
+import re
 from os import path
 from typing import Tuple
 
@@ -7,8 +8,10 @@ from pydantic_ai.mcp import MCPServer
 
 from ..ai import model
 from ..categorizer.models import IsBangoPornResponse, PlanRequestWithCategory
+from ..events import emit_plan_actions, emit_plan_event
 from ..models import MoverResponse, PlanAction, SimpleAgentResponseResult, TargetDir
-from .jav_actor import find_a_dir_for_list_of_actor_name, read_actor_alias
+from ..registry import registered_agent
+from .jav_actor import find_a_dir_for_list_of_actor_name, load_actor_alias_index
 from .subtitle_mover import move as subtitle_move
 from .utils import filter_video_files_sub_files_and_others
 
@@ -59,7 +62,7 @@ class FilenameResponse(BaseModel):
   filenames: list[FilenameMapping]
 
 
-def mover() -> Agent:
+def _build_mover() -> Agent:
   return Agent(
     name="bango_porn_video_mover",
     model=model(),
@@ -68,6 +71,10 @@ def mover() -> Agent:
   )
 
 
+def mover() -> Agent:
+  return registered_agent("bango_porn_video_mover", _build_mover)
+
+
 class BangoPorn(BaseModel):
   file: str
   target_dir: str
@@ -78,11 +85,105 @@ class VideoMoverRequest(BaseModel):
   files: list[BangoPorn]
 
 
+_FC2_RE = re.compile(r"^FC2[-_ ]*(?:PPV)?[-_ ]*(\d+)$")
+_BANGO_RE = re.compile(r"^([A-Z0-9]*?[A-Z])[-_ ]*(\d+)$")
+_SEP = r"[-_ .]*"
+# what may follow the bango in a file name: nothing, -C (Chinese subtitles), a part letter or
+# a part number.
+_SUFFIX_RE = re.compile(
+  rf"^(?:{_SEP}(?P<letter>[A-F])|{_SEP}(?:PART|PT|CD)?{_SEP}(?P<num>\d{{1,2}}))?$"
+)
+
+
+def normalize_bango(bango: str) -> str:
+  """Uppercase bango with - between its parts, e.g. ssis698 → SSIS-698, fc2_123 → FC2-123."""
+  b = "-".join(re.split(r"[-_ ]+", bango.strip().upper()))
+  if m := _BANGO_RE.match(b):
+    return f"{m.group(1)}-{m.group(2)}"
+  return b
+
+
+def _bango_pattern(bango: str) -> re.Pattern:
+  """Pattern finding a normalized bango in an uppercased file name."""
+  if m := _FC2_RE.match(bango):
+    return re.compile(rf"(?<![A-Z0-9])FC2{_SEP}(?:PPV)?{_SEP}0*{m.group(1)}(?!\d)")
+  if m := _BANGO_RE.match(bango):
+    return re.compile(rf"(?<![A-Z]){re.escape(m.group(1))}{_SEP}0*{int(m.group(2))}(?!\d)")
+  return re.compile(_SEP.join(re.escape(t) for t in re.split(r"[-_ .]+", bango)))
+
+
+def rename_by_rules(files: list[BangoPorn]) -> dict[str, str]:
+  """
+  Rename video files by the rules of _INSTRUCTION, without asking the model.
+
+  Files are grouped by bango. A group is renamed only if every file name contains the bango
+  followed by nothing, a part letter or a part number, and the new names are unique:
+  - BANGO.ext, or BANGO-C.ext if C is the only letter of the group
+  - A/B/C... become BANGO.part.N.ext in letter order, part numbers are kept
+
+  Returns:
+      dict[str, str]: file to new filename, files of unresolved groups are left out
+  """
+  groups: dict[str, list[BangoPorn]] = {}
+  for bp in files:
+    if bp.detail.bango and bp.detail.bango.strip():
+      groups.setdefault(normalize_bango(bp.detail.bango), []).append(bp)
+
+  res: dict[str, str] = {}
+  for bango, group in groups.items():
+    pattern = _bango_pattern(bango)
+    parsed: list[tuple[BangoPorn, str, str | None, int | None]] = []
+    for bp in group:
+      stem, ext = path.splitext(path.basename(bp.file))
+      m = pattern.search(stem.upper())
+      suffix = m and _SUFFIX_RE.match(stem.upper()[m.end() :])
+      if not suffix:
+        break
+      num = suffix.group("num")
+      parsed.append((bp, ext, suffix.group("letter"), int(num) if num else None))
+    else:
+      names = _rename_group(bango, parsed)
+      if names and len({(n, bp.target_dir) for bp, n in names}) == len(names):
+        res.update({bp.file: n for bp, n in names})
+
+  return res
+
+
+def _rename_group(
+  bango: str, parsed: list[tuple[BangoPorn, str, str | None, int | None]]
+) -> list[tuple[BangoPorn, str]] | None:
+  letters = sorted({letter for _, _, letter, _ in parsed if letter})
+  has_num = any(num is not None for _, _, _, num in parsed)
+  has_plain = any(letter is None and num is None for _, _, letter, num in parsed)
+
+  if letters == ["C"] and not has_num:
+    # C alone is the Chinese subtitles hint, not the third part.
+    return [(bp, f"{bango}-C{ext}" if letter else f"{bango}{ext}") for bp, ext, letter, _ in parsed]
+  if not letters and not has_num:
+    return [(bp, f"{bango}{ext}") for bp, ext, _, _ in parsed]
+  if has_plain or (letters and has_num):
+    return None
+
+  names = []
+  for bp, ext, letter, num in parsed:
+    part = letters.index(letter) + 1 if letter else num
+    names.append((bp, f"{bango}.part.{part}{ext}"))
+  return names
+
+
+def _plan_of(files: list[BangoPorn], new_filenames: dict[str, str]) -> list[PlanAction]:
+  return [
+    PlanAction(file=bp.file, action="move", target=path.join(bp.target_dir, new_filenames[bp.file]))
+    for bp in files
+    if bp.file in new_filenames
+  ]
+
+
 async def move(
   dir: str, req: PlanRequestWithCategory, mcp: MCPServer
 ) -> Tuple[MoverResponse, RunUsage]:
   """Move bango porn files to appropriate target directories."""
-  aa = read_actor_alias()
+  aa = await load_actor_alias_index()
   total_usage = RunUsage()
 
   video_request = VideoMoverRequest(files=[])
@@ -98,39 +199,45 @@ async def move(
     else:
       actor_dir, usage = await find_a_dir_for_list_of_actor_name(aa, mcp, details.actors)
       total_usage.incr(usage)
+      emit_plan_event("actor_dir", file=file, actors=details.actors, dir=actor_dir)
       target_dir = path.join(target_dir, actor_dir)
 
     if details.is_vr == SimpleAgentResponseResult.yes:
-      target_dir = path.join(target_dir, details.bango)
+      target_dir = path.join(target_dir, normalize_bango(details.bango))
 
     bp = BangoPorn(file=file, target_dir=target_dir, detail=details)
     video_request.files.append(bp)
 
-  a = mover()
-  res = await a.run(video_request.model_dump_json())
-  total_usage.incr(res.usage())
+  new_filenames = rename_by_rules(video_request.files)
+  emit_plan_actions(_plan_of(video_request.files, new_filenames))
+
+  # only ask the model for files the rules can not rename.
+  unresolved = [bp for bp in video_request.files if bp.file not in new_filenames]
+  if unresolved:
+    a = mover()
+    res = await a.run(VideoMoverRequest(files=unresolved).model_dump_json())
+    total_usage.incr(res.usage())
+    if res.output and res.output.filenames:
+      unresolved_files = {bp.file for bp in unresolved}
+      for mapping in res.output.filenames:
+        if mapping.file in unresolved_files:
+          new_filenames[mapping.file] = mapping.new_filename
+    emit_plan_actions(_plan_of(unresolved, new_filenames))
 
   # Initialize plan with video movement results
-  plan = []
-  if res.output and res.output.filenames:
-    for mapping in res.output.filenames:
-      # Find the corresponding target directory from video_request
-      target_dir = None
-      for vp in video_request.files:
-        if vp.file == mapping.file:
-          target_dir = vp.target_dir
-          break
-
-      if target_dir:
-        target_path = path.join(target_dir, mapping.new_filename)
-        plan.append(PlanAction(file=mapping.file, action="move", target=target_path))
-
-  _, subfiles, others = filter_video_files_sub_files_and_others(req.request.files)
+  plan = _plan_of(video_request.files, new_filenames)
+
+  videos, subfiles, others = filter_video_files_sub_files_and_others(req.request.files)
+  # videos the categorizer has no answer for, e.g. timed out, or no name could be made for, are
+  # kept in place.
+  moved = {action.file for action in plan}
+  others = [file for file in videos if file not in moved] + others
 
   # Handle subtitle files
   if subfiles:
     subtitle_response, subtitle_usage = await subtitle_move(dir, subfiles, MoverResponse(plan=plan))
     plan.extend(subtitle_response.plan)
+    emit_plan_actions(subtitle_response.plan)
     total_usage.incr(subtitle_usage)
 
   # Handle other files (set to skip)
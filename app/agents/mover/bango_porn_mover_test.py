@@ -2,6 +2,9 @@ import json
 import os
 
 import pytest
+from pydantic_ai import Agent, ToolOutput
+from pydantic_ai.messages import ModelMessage, ModelResponse, ToolCallPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
 
 from ..ai import metadataMcp, model, setupLogfire
 from ..categorizer.models import (
@@ -17,7 +20,8 @@ from ..models import (
   PlanRequest,
   SimpleAgentResponseResult,
 )
-from .bango_porn_mover import move
+from . import bango_porn_mover
+from .bango_porn_mover import BangoPorn, FilenameResponse, move, normalize_bango, rename_by_rules
 
 
 @pytest.mark.skipif(model() is None, reason="No env var for ai model")
@@ -75,3 +79,170 @@ async def test_bango_porn_mover(tmp_path):
 
   assert res == want
   assert usage is not None
+
+
+def _detail(bango: str | None, actors: list[str] | None = None) -> IsBangoPornResponse:
+  return IsBangoPornResponse(
+    bango=bango,
+    is_bango_porn=SimpleAgentResponseResult.yes,
+    is_vr=SimpleAgentResponseResult.no,
+    from_madou=SimpleAgentResponseResult.no,
+    from_fc2=SimpleAgentResponseResult.no,
+    actors=actors or [],
+    language=Language.Japanese,
+    reason="",
+  )
+
+
+def _rename(files: dict[str, str]) -> dict[str, str]:
+  return rename_by_rules(
+    [BangoPorn(file=f, target_dir="jav", detail=_detail(b)) for f, b in files.items()]
+  )
+
+
+def test_normalize_bango():
+  assert normalize_bango("ssis-698") == "SSIS-698"
+  assert normalize_bango("SSIS698") == "SSIS-698"
+  assert normalize_bango("259luxu_1234") == "259LUXU-1234"
+  assert normalize_bango("FC2-1234567") == "FC2-1234567"
+  assert normalize_bango("fc2_1234567") == "FC2-1234567"
+  assert normalize_bango("fc2 ppv 1234567") == "FC2-PPV-1234567"
+
+
+def test_rename_by_rules_single():
+  assert _rename({"/d/ssis-698.mp4": "ssis-698"}) == {"/d/ssis-698.mp4": "SSIS-698.mp4"}
+  assert _rename({"/d/hhd800.com@SSIS698.mkv": "SSIS-698"}) == {
+    "/d/hhd800.com@SSIS698.mkv": "SSIS-698.mkv"
+  }
+
+
+def test_rename_by_rules_keeps_chinese_subtitles_hint():
+  assert _rename({"/d/SSIS-698-C.mp4": "SSIS-698"}) == {"/d/SSIS-698-C.mp4": "SSIS-698-C.mp4"}
+  assert _rename({"/d/ssis-698c.mp4": "SSIS-698"}) == {"/d/ssis-698c.mp4": "SSIS-698-C.mp4"}
+
+
+def test_rename_by_rules_parts():
+  got = _rename(
+    {
+      "/d/SSIS-698-A.mp4": "SSIS-698",
+      "/d/SSIS-698-B.mp4": "SSIS-698",
+      "/d/SSIS-698-C.mp4": "SSIS-698",
+    }
+  )
+  assert got == {
+    "/d/SSIS-698-A.mp4": "SSIS-698.part.1.mp4",
+    "/d/SSIS-698-B.mp4": "SSIS-698.part.2.mp4",
+    "/d/SSIS-698-C.mp4": "SSIS-698.part.3.mp4",
+  }
+
+  got = _rename({"/d/abc-123 cd1.mp4": "ABC-123", "/d/abc-123 cd2.mp4": "ABC-123"})
+  assert got == {
+    "/d/abc-123 cd1.mp4": "ABC-123.part.1.mp4",
+    "/d/abc-123 cd2.mp4": "ABC-123.part.2.mp4",
+  }
+
+
+def test_rename_by_rules_fc2():
+  assert _rename({"/d/fc2_1234567.mp4": "FC2-1234567"}) == {"/d/fc2_1234567.mp4": "FC2-1234567.mp4"}
+  assert _rename({"/d/fc2-ppv_1234567_1.mp4": "FC2-PPV-1234567"}) == {
+    "/d/fc2-ppv_1234567_1.mp4": "FC2-PPV-1234567.part.1.mp4"
+  }
+
+
+def test_rename_by_rules_leaves_unclear_groups_to_model():
+  # resolution tags, missing bango, names without the bango and mixed plain and parts.
+  assert _rename({"/d/SSIS-698 1080p.mp4": "SSIS-698"}) == {}
+  assert _rename({"/d/SSIS-698.mp4": None}) == {}
+  assert _rename({"/d/video.mp4": "SSIS-698"}) == {}
+  assert _rename({"/d/SSIS-698.mp4": "SSIS-698", "/d/SSIS-698-B.mp4": "SSIS-698"}) == {}
+  # same new name twice.
+  assert _rename({"/d/a/SSIS-698.mp4": "SSIS-698", "/d/b/ssis-698.mp4": "SSIS-698"}) == {}
+
+
+@pytest.mark.asyncio
+async def test_move_calls_model_only_for_unresolved(tmp_path, monkeypatch):
+  monkeypatch.setenv("JAV_ACTOR_FILE", str(tmp_path / "actors.json"))
+  (tmp_path / "actors.json").write_text("{}")
+  asked: list[list[str]] = []
+
+  def answer(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+    files = [f["file"] for f in json.loads(messages[-1].parts[-1].content)["files"]]
+    asked.append(files)
+    output = FilenameResponse(
+      filenames=[{"file": f, "new_filename": "SSIS-699.mp4"} for f in files]
+    )
+    return ModelResponse(parts=[ToolCallPart(info.output_tools[0].name, output.model_dump())])
+
+  fake = Agent(FunctionModel(answer), output_type=ToolOutput(FilenameResponse))
+  monkeypatch.setattr(bango_porn_mover, "mover", lambda: fake)
+
+  files = ["/d/ssis-698-C.mp4", "/d/SSIS-699 1080p.mp4", "/d/cover.jpg"]
+  req = PlanRequestWithCategory(
+    request=PlanRequest(files=files),
+    category=Category.bango_porn,
+    bango_porn=GroupIsBangoPornResponse(
+      is_bango_porn=SimpleAgentResponseResult.yes,
+      porns={files[0]: _detail("SSIS-698"), files[1]: _detail("SSIS-699")},
+    ),
+  )
+
+  res, usage = await move("", req, None)
+
+  assert asked == [["/d/SSIS-699 1080p.mp4"]]
+  assert usage.requests == 1
+  assert res == MoverResponse(
+    plan=[
+      PlanAction(file=files[0], action="move", target="jav/素人/SSIS-698-C.mp4"),
+      PlanAction(file=files[1], action="move", target="jav/素人/SSIS-699.mp4"),
+      PlanAction(file=files[2], action="skip"),
+    ]
+  )
+
+
+@pytest.mark.asyncio
+async def test_move_skips_videos_without_detection(tmp_path, monkeypatch):
+  monkeypatch.setenv("JAV_ACTOR_FILE", str(tmp_path / "actors.json"))
+  (tmp_path / "actors.json").write_text("{}")
+
+  # detection of the second file timed out.
+  files = ["/d/SSIS-698.mp4", "/d/SSIS-699.mp4"]
+  req = PlanRequestWithCategory(
+    request=PlanRequest(files=files),
+    category=Category.bango_porn,
+    bango_porn=GroupIsBangoPornResponse(
+      is_bango_porn=SimpleAgentResponseResult.yes,
+      porns={files[0]: _detail("SSIS-698")},
+    ),
+  )
+
+  res, _ = await move("", req, None)
+
+  assert res == MoverResponse(
+    plan=[
+      PlanAction(file=files[0], action="move", target="jav/素人/SSIS-698.mp4"),
+      PlanAction(file=files[1], action="skip"),
+    ]
+  )
+
+
+@pytest.mark.asyncio
+async def test_move_puts_vr_videos_in_a_normalized_bango_dir(tmp_path, monkeypatch):
+  monkeypatch.setenv("JAV_ACTOR_FILE", str(tmp_path / "actors.json"))
+  (tmp_path / "actors.json").write_text("{}")
+
+  files = ["/d/sivr-123.mp4"]
+  detail = _detail("sivr_123")
+  detail.is_vr = SimpleAgentResponseResult.yes
+  req = PlanRequestWithCategory(
+    request=PlanRequest(files=files),
+    category=Category.bango_porn,
+    bango_porn=GroupIsBangoPornResponse(
+      is_bango_porn=SimpleAgentResponseResult.yes, porns={files[0]: detail}
+    ),
+  )
+
+  res, _ = await move("", req, None)
+
+  assert res.plan == [
+    PlanAction(file=files[0], action="move", target="jav_vr/素人/SIVR-123/SIVR-123.mp4")
+  ]
@@ -0,0 +1,134 @@
+import re
+from os import path
+
+from pydantic import BaseModel
+
+_CN_DIGITS = {
+  "零": 0,
+  "〇": 0,
+  "一": 1,
+  "二": 2,
+  "两": 2,
+  "三": 3,
+  "四": 4,
+  "五": 5,
+  "六": 6,
+  "七": 7,
+  "八": 8,
+  "九": 9,
+}
+_CN_UNITS = {"十": 10, "百": 100}
+_CN_NUM = r"[0-9零〇一二两三四五六七八九十百]+"
+
+# release tags that look like episode numbers but are not.
+_NOT_EPISODE = {480, 540, 576, 720, 1080, 2160, 264, 265}
+
+_SXXEYY_RE = re.compile(r"(?<![A-Z0-9])S(\d{1,2})[ ._-]?E(\d{1,4})(?:(?:-E?|E)(\d{1,4}))?(?!\d)")
+_NXNN_RE = re.compile(r"(?<![A-Z0-9])(\d{1,2})X(\d{2,3})(?![0-9P])")
+_CN_EPISODE_RE = re.compile(rf"第\s*({_CN_NUM})\s*[集话話回]")
+_EP_RE = re.compile(r"(?<![A-Z0-9])(?:EP|E|EPISODE)[ ._-]?(\d{1,4})(?!\d)")
+# "[Group] Title - 01 [1080p].mkv", "Title - 01v2.mkv"
+_DASH_ABSOLUTE_RE = re.compile(r" - (\d{1,4})(?:V\d)?(?: |\[|\(|$)")
+# "[Group][Title][01][1080p].mkv"
+_BRACKET_ABSOLUTE_RE = re.compile(r"\[(\d{1,4})(?:V\d)?\]")
+_BARE_NUMBER_RE = re.compile(r"^(\d{1,4})$")
+
+_SEASON_RE = re.compile(r"(?<![A-Z0-9])(?:SEASON|S)[ ._-]?(\d{1,2})(?!\d)")
+_CN_SEASON_RE = re.compile(rf"第\s*({_CN_NUM})\s*季")
+
+# specials and extras are left to the agent.
+_EXTRA_RE = re.compile(
+  r"(?<![A-Z])(?:SAMPLE|TRAILER|NCOP|NCED|OVA|OAD|SP|SPECIALS?|EXTRAS?|PREVIEW|MENU)(?![A-Z])"
+)
+
+
+class Episode(BaseModel):
+  season: int
+  episode: int
+  # last episode of a multi-episode file, e.g. S01E01-E02
+  last_episode: int | None = None
+
+  def tag(self) -> str:
+    """SXXEYY, or SXXEYY-EZZ for multi-episode files."""
+    tag = f"S{self.season:02d}E{self.episode:02d}"
+    if self.last_episode:
+      tag += f"-E{self.last_episode:02d}"
+    return tag
+
+
+def cn_to_int(s: str) -> int | None:
+  """Convert arabic or chinese numerals up to 999, e.g. 12 or 十二."""
+  if s.isdigit():
+    return int(s)
+
+  total = 0
+  current = 0
+  for c in s:
+    if c in _CN_DIGITS:
+      current = _CN_DIGITS[c]
+    elif c in _CN_UNITS:
+      total += (current or 1) * _CN_UNITS[c]
+      current = 0
+    else:
+      return None
+  return total + current
+
+
+def _is_episode_number(n: int) -> bool:
+  return n not in _NOT_EPISODE and not 1900 <= n <= 2099
+
+
+def _season_from_path(file: str) -> int | None:
+  # the file name first, then its folders from the closest one.
+  for part in reversed(file.replace("\\", "/").split("/")):
+    upper = part.upper()
+    if m := _SEASON_RE.search(upper):
+      return int(m.group(1))
+    if m := _CN_SEASON_RE.search(part):
+      return cn_to_int(m.group(1))
+  return None
+
+
+def parse_episode(file: str) -> Episode | None:
+  """
+  Parse season and episode from a file path.
+
+  Understands S01E02, 1x02, EP02 / E02, 第2集 and absolute numbering (Title - 02, [02], 02.mkv).
+  When the file name has no season, it is taken from "Season 02", "S02" or "第2季" in the path,
+  and defaults to 1.
+
+  Returns:
+      Episode | None: None for files that look like extras or have no episode number
+  """
+  name = path.splitext(path.basename(file))[0]
+  upper = name.upper()
+  if _EXTRA_RE.search(upper):
+    return None
+
+  if m := _SXXEYY_RE.search(upper):
+    last = int(m.group(3)) if m.group(3) else None
+    episode = int(m.group(2))
+    return Episode(
+      season=int(m.group(1)),
+      episode=episode,
+      last_episode=last if last and last > episode else None,
+    )
+
+  if m := _NXNN_RE.search(upper):
+    return Episode(season=int(m.group(1)), episode=int(m.group(2)))
+
+  episode = None
+  if m := _CN_EPISODE_RE.search(name):
+    episode = cn_to_int(m.group(1))
+  else:
+    for pattern in [_EP_RE, _DASH_ABSOLUTE_RE, _BRACKET_ABSOLUTE_RE, _BARE_NUMBER_RE]:
+      m = pattern.search(upper)
+      if m and _is_episode_number(int(m.group(1))):
+        episode = int(m.group(1))
+        break
+
+  if not episode:
+    return None
+
+  season = _season_from_path(file)
+  return Episode(season=1 if season is None else season, episode=episode)
@@ -0,0 +1,53 @@
+import pytest
+
+from .episode_parser import Episode, cn_to_int, parse_episode
+
+
+@pytest.mark.parametrize(
+  "file,want",
+  [
+    ("Breaking.Bad.S05E16.Felina.1080p.BluRay.x265.mkv", (5, 16, None)),
+    ("The.Office.US.s02e01-e02.720p.mkv", (2, 1, 2)),
+    ("Friends.S01E01E02.mkv", (1, 1, 2)),
+    ("doctor.who.2005.3x07.hdtv.avi", (3, 7, None)),
+    ("Show.Season.02.2000/Show.Season.02.2000.EP1.mkv", (2, 1, None)),
+    ("Show.S03.1080p.WEB-DL/Show.E07.mkv", (3, 7, None)),
+    ("庆余年 第二季/庆余年第二季第05集.mp4", (2, 5, None)),
+    ("琅琊榜/琅琊榜 第十二集.mp4", (1, 12, None)),
+    ("[SubsPlease] Sousou no Frieren - 12 (1080p) [ABCD1234].mkv", (1, 12, None)),
+    ("[Group] Title - 01v2 [720p].mkv", (1, 1, None)),
+    ("[Nekomoe kissaten][Kusuriya no Hitorigoto][03][1080p][CHS].mp4", (1, 3, None)),
+    ("Season 2/05.mkv", (2, 5, None)),
+  ],
+)
+def test_parse_episode(file, want):
+  season, episode, last = want
+  assert parse_episode(file) == Episode(season=season, episode=episode, last_episode=last)
+
+
+@pytest.mark.parametrize(
+  "file",
+  [
+    "Show.2023.1080p.mkv",
+    "Show.S02.Sample.mkv",
+    "[Group] Title - NCOP [1080p].mkv",
+    "Show.S01.Trailer.mp4",
+    "1080.mkv",
+  ],
+)
+def test_parse_episode_unparsable(file):
+  assert parse_episode(file) is None
+
+
+def test_episode_tag():
+  assert Episode(season=2, episode=1).tag() == "S02E01"
+  assert Episode(season=1, episode=101, last_episode=102).tag() == "S01E101-E102"
+
+
+def test_cn_to_int():
+  assert cn_to_int("12") == 12
+  assert cn_to_int("十") == 10
+  assert cn_to_int("十二") == 12
+  assert cn_to_int("二十") == 20
+  assert cn_to_int("一百零五") == 105
+  assert cn_to_int("x") is None
@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import os
+import time
+import urllib.parse
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable
+
+import httpx
+from pydantic import BaseModel
+
+from ..ai import setupLogfireForStdLog
+
+setupLogfireForStdLog()
+_LOGGER = logging.getLogger(__name__)
+
+
+class FlareSolverrError(Exception):
+  pass
+
+
+class FlareSolverrStats(BaseModel):
+  # page loads where FlareSolverr had to solve a challenge, and the time spent on them
+  challenges: int = 0
+  challenge_seconds: float = 0
+  # page loads without a challenge
+  fetches: int = 0
+  fetch_seconds: float = 0
+  sessions_created: int = 0
+  sessions_reused: int = 0
+  sessions_expired: int = 0
+
+
+class FlareSolverrClient:
+  """
+  Async FlareSolverr client sharing a keep-alive connection pool between lookups.
+
+  Requests are cancelled with the task awaiting them, the event loop is never blocked.
+
+  Pages are loaded in a small pool of FlareSolverr browser sessions, so the browser is not
+  started for every lookup. Sessions idle for longer than session_idle_timeout are destroyed.
+  Cookies of a solved challenge are sent with later requests to the same site.
+  """
+
+  def __init__(
+    self,
+    url: str,
+    connect_timeout: float = 10,
+    max_timeout: float = 60,
+    max_connections: int = 4,
+    sessions: int = 2,
+    session_idle_timeout: float = 600,
+    transport: httpx.AsyncBaseTransport | None = None,
+    clock: Callable[[], float] = time.monotonic,
+  ):
+    self.url = url
+    self.max_timeout = max_timeout
+    self.stats = FlareSolverrStats()
+    self._sessions = sessions
+    self._session_idle_timeout = session_idle_timeout
+    self._clock = clock
+    self._session_slots = asyncio.Semaphore(max(1, sessions))
+    # idle sessions as (session id, last used)
+    self._idle: list[tuple[str, float]] = []
+    self._cookies: dict[str, list[dict[str, Any]]] = {}
+    self._expiry_task: asyncio.Task | None = None
+    self._client = httpx.AsyncClient(
+      # FlareSolverr answers after solving the challenge, read allows maxTimeout plus some slack.
+      timeout=httpx.Timeout(connect=connect_timeout, read=max_timeout + 10, write=10, pool=None),
+      limits=httpx.Limits(
+        max_connections=max_connections, max_keepalive_connections=max_connections
+      ),
+      transport=transport,
+    )
+
+  async def command(self, cmd: str, **params: Any) -> dict[str, Any]:
+    """
+    Send a command to FlareSolverr.
+
+    Returns:
+        dict[str, Any]: the FlareSolverr answer
+
+    Raises:
+        FlareSolverrError: if FlareSolverr can not be reached or answers with an error
+    """
+    try:
+      response = await self._client.post(self.url, json={"cmd": cmd, **params})
+      response.raise_for_status()
+      result = response.json()
+    except (httpx.HTTPError, ValueError) as e:
+      raise FlareSolverrError(f"{cmd} failed: {e!r}") from e
+
+    if result.get("status") != "ok":
+      raise FlareSolverrError(f"{cmd} failed: {result.get('message', result)}")
+    return result
+
+  async def get(self, url: str) -> dict[str, Any]:
+    """
+    Fetch url through FlareSolverr.
+
+    Returns:
+        dict[str, Any]: the solution, with the page HTML in "response"
+    """
+    site = urllib.parse.urlsplit(url).netloc
+    params: dict[str, Any] = {"url": url, "maxTimeout": int(self.max_timeout * 1000)}
+    cookies = self._valid_cookies(site)
+    if cookies:
+      params["cookies"] = cookies
+
+    async with self._session() as session:
+      if session:
+        params["session"] = session
+      start = self._clock()
+      result = await self.command("request.get", **params)
+      self._record(url, result, self._clock() - start)
+
+    solution = result.get("solution") or {}
+    if solution.get("cookies"):
+      self._cookies[site] = solution["cookies"]
+    return solution
+
+  async def expire_sessions(self):
+    """Destroy sessions idle for longer than session_idle_timeout."""
+    now = self._clock()
+    expired = [s for s, used in self._idle if now - used > self._session_idle_timeout]
+    self._idle = [(s, used) for s, used in self._idle if s not in expired]
+    for session in expired:
+      self.stats.sessions_expired += 1
+      await self._destroy(session)
+
+  async def aclose(self):
+    if self._expiry_task:
+      self._expiry_task.cancel()
+      await asyncio.gather(self._expiry_task, return_exceptions=True)
+      self._expiry_task = None
+    idle, self._idle = self._idle, []
+    for session, _ in idle:
+      await self._destroy(session)
+    await self._client.aclose()
+
+  @asynccontextmanager
+  async def _session(self) -> AsyncIterator[str | None]:
+    """Lease a browser session, None if sessions are disabled."""
+    if self._sessions <= 0:
+      yield None
+      return
+
+    async with self._session_slots:
+      await self.expire_sessions()
+      if self._idle:
+        session, _ = self._idle.pop()
+        self.stats.sessions_reused += 1
+      else:
+        result = await self.command("sessions.create")
+        session = result["session"]
+        self.stats.sessions_created += 1
+
+      try:
+        yield session
+      except BaseException:
+        # the browser may be stuck or still loading, do not hand it out again.
+        await self._destroy(session)
+        raise
+      else:
+        self._idle.append((session, self._clock()))
+        if self._expiry_task is None or self._expiry_task.done():
+          self._expiry_task = asyncio.create_task(self._expire_loop())
+
+  async def _expire_loop(self):
+    # runs while there are idle sessions, so they are destroyed without further lookups.
+    while self._idle:
+      await asyncio.sleep(self._session_idle_timeout / 2)
+      await self.expire_sessions()
+
+  async def _destroy(self, session: str):
+    try:
+      await self.command("sessions.destroy", session=session)
+    except FlareSolverrError as e:
+      _LOGGER.warning(f"failed to destroy FlareSolverr session {session}: {e}")
+
+  def _valid_cookies(self, site: str) -> list[dict[str, Any]]:
+    now = time.time()
+    cookies = [c for c in self._cookies.get(site, []) if c.get("expiry", now + 1) > now]
+    if len(cookies) != len(self._cookies.get(site, [])):
+      self._cookies[site] = cookies
+    return cookies
+
+  def _record(self, url: str, result: dict[str, Any], elapsed: float):
+    if result.get("startTimestamp") and result.get("endTimestamp"):
+      elapsed = (result["endTimestamp"] - result["startTimestamp"]) / 1000
+
+    if "challenge solved" in result.get("message", "").lower():
+      self.stats.challenges += 1
+      self.stats.challenge_seconds += elapsed
+      _LOGGER.info(f"FlareSolverr solved a challenge for {url} in {elapsed:.1f}s")
+    else:
+      self.stats.fetches += 1
+      self.stats.fetch_seconds += elapsed
+      _LOGGER.info(f"FlareSolverr fetched {url} in {elapsed:.1f}s")
+
+
+_client: FlareSolverrClient | None = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+
+
+def flaresolverr_client() -> FlareSolverrClient | None:
+  """
+  Shared client for FLARESOLVERR_URL, None if it is not set.
+
+  The connection pool belongs to the event loop that created it, a new loop gets a new client.
+  """
+  global _client, _client_loop
+  url = os.getenv("FLARESOLVERR_URL")
+  if not url:
+    return None
+
+  loop = asyncio.get_running_loop()
+  if _client is None or _client.url != url or _client_loop is not loop:
+    _client = FlareSolverrClient(
+      url,
+      connect_timeout=float(os.getenv("FLARESOLVERR_CONNECT_TIMEOUT", "10")),
+      max_timeout=float(os.getenv("FLARESOLVERR_MAX_TIMEOUT", "60")),
+      max_connections=int(os.getenv("FLARESOLVERR_MAX_CONNECTIONS", "4")),
+      sessions=int(os.getenv("FLARESOLVERR_SESSIONS", "2")),
+      session_idle_timeout=float(os.getenv("FLARESOLVERR_SESSION_IDLE_TIMEOUT", "600")),
+    )
+    _client_loop = loop
+  return _client
+
+
+async def close_flaresolverr_client():
+  global _client, _client_loop
+  if _client:
+    await _client.aclose()
+  _client = None
+  _client_loop = None
@@ -0,0 +1,171 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from .flaresolverr import FlareSolverrClient, FlareSolverrError
+
+
+class FakeFlareSolverr:
+  """FlareSolverr answering request.get and managing sessions."""
+
+  def __init__(self, challenge: bool = True):
+    self.challenge = challenge
+    self.commands: list[dict] = []
+    self.sessions: set[str] = set()
+    self.created = 0
+    self.fail_gets = False
+
+  def handler(self, request: httpx.Request) -> httpx.Response:
+    cmd = json.loads(request.content)
+    self.commands.append(cmd)
+
+    match cmd["cmd"]:
+      case "sessions.create":
+        self.created += 1
+        session = f"s{self.created}"
+        self.sessions.add(session)
+        return httpx.Response(200, json={"status": "ok", "session": session})
+      case "sessions.destroy":
+        self.sessions.discard(cmd["session"])
+        return httpx.Response(200, json={"status": "ok"})
+      case "request.get" if self.fail_gets:
+        return httpx.Response(200, json={"status": "error", "message": "timeout"})
+      case "request.get":
+        # a challenge is only shown to requests without the clearance cookie.
+        solved = self.challenge and not cmd.get("cookies")
+        return httpx.Response(
+          200,
+          json={
+            "status": "ok",
+            "message": "Challenge solved!" if solved else "Challenge not detected!",
+            "startTimestamp": 1000,
+            "endTimestamp": 6000 if solved else 1500,
+            "solution": {
+              "response": "<html></html>",
+              "cookies": [{"name": "cf_clearance", "value": "x"}],
+            },
+          },
+        )
+    return httpx.Response(400)
+
+  def client(self, **kwargs) -> FlareSolverrClient:
+    return FlareSolverrClient(
+      "http://flaresolverr/v1", transport=httpx.MockTransport(self.handler), **kwargs
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_returns_solution():
+  """Test that request.get is sent with maxTimeout and the solution is returned."""
+  fake = FakeFlareSolverr(challenge=False)
+  client = fake.client(max_timeout=30, sessions=0)
+  solution = await client.get("https://javdb.com/search?q=x")
+  await client.aclose()
+
+  assert solution["response"] == "<html></html>"
+  assert fake.commands == [
+    {"cmd": "request.get", "url": "https://javdb.com/search?q=x", "maxTimeout": 30000}
+  ]
+
+
+@pytest.mark.asyncio
+async def test_sessions_and_cookies_are_reused():
+  """Test that lookups share a session and send the cookies of the solved challenge."""
+  fake = FakeFlareSolverr()
+  client = fake.client(sessions=1)
+
+  await client.get("https://javdb.com/search?q=a")
+  await client.get("https://javdb.com/search?q=b")
+
+  gets = [c for c in fake.commands if c["cmd"] == "request.get"]
+  assert [c["session"] for c in gets] == ["s1", "s1"]
+  assert "cookies" not in gets[0]
+  assert gets[1]["cookies"] == [{"name": "cf_clearance", "value": "x"}]
+  assert client.stats.sessions_created == 1
+  assert client.stats.sessions_reused == 1
+  # challenge solving and page fetching are timed separately.
+  assert (client.stats.challenges, client.stats.challenge_seconds) == (1, 5)
+  assert (client.stats.fetches, client.stats.fetch_seconds) == (1, 0.5)
+
+  await client.aclose()
+  assert fake.sessions == set()
+
+
+@pytest.mark.asyncio
+async def test_idle_sessions_expire():
+  """Test that sessions idle for longer than session_idle_timeout are destroyed."""
+  now = 0.0
+  fake = FakeFlareSolverr()
+  client = fake.client(sessions=2, session_idle_timeout=60, clock=lambda: now)
+
+  await client.get("https://javdb.com/search?q=a")
+  assert fake.sessions == {"s1"}
+
+  now += 61
+  await client.expire_sessions()
+  assert fake.sessions == set()
+  assert client.stats.sessions_expired == 1
+
+  await client.get("https://javdb.com/search?q=b")
+  assert fake.sessions == {"s2"}
+  await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_failed_session_is_destroyed():
+  """Test that a session whose request failed is not handed out again."""
+  fake = FakeFlareSolverr()
+  client = fake.client(sessions=1)
+
+  fake.fail_gets = True
+  with pytest.raises(FlareSolverrError):
+    await client.get("https://javdb.com")
+  assert fake.sessions == set()
+
+  fake.fail_gets = False
+  await client.get("https://javdb.com")
+  assert client.stats.sessions_created == 2
+  await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_errors_raise_flaresolverr_error():
+  """Test that http errors and error answers raise FlareSolverrError."""
+
+  def error_status(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, json={"status": "error", "message": "Challenge not solved"})
+
+  def server_error(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(500)
+
+  def connect_error(request: httpx.Request) -> httpx.Response:
+    raise httpx.ConnectError("refused", request=request)
+
+  for handler in [error_status, server_error, connect_error]:
+    client = FlareSolverrClient(
+      "http://flaresolverr/v1", sessions=0, transport=httpx.MockTransport(handler)
+    )
+    with pytest.raises(FlareSolverrError):
+      await client.get("https://javdb.com")
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_get_is_cancellable():
+  """Test that cancelling the caller cancels the request instead of waiting for it."""
+
+  async def slow(request: httpx.Request) -> httpx.Response:
+    await asyncio.sleep(10)
+    return httpx.Response(200, json={"status": "ok"})
+
+  client = FlareSolverrClient(
+    "http://flaresolverr/v1", sessions=0, transport=httpx.MockTransport(slow)
+  )
+  task = asyncio.create_task(client.get("https://javdb.com"))
+  await asyncio.sleep(0.01)
+  task.cancel()
+  with pytest.raises(asyncio.CancelledError):
+    await asyncio.wait_for(task, 1)
+  await client.aclose()
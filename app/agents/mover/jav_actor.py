@@ -1,45 +1,136 @@
+import asyncio
 import json
 import logging
 import os
+import threading
 import urllib.parse
 from typing import Dict, Tuple
 
-import requests
 from bs4 import BeautifulSoup
 from filelock import FileLock
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
 from pydantic_ai import Agent, RunUsage, ToolOutput
 from pydantic_ai.mcp import MCPServer
 
 from ..ai import allowedTools, model, setupLogfireForStdLog
+from ..events import without_plan_events
+from ..mcp_cache import cached_tools
+from ..mcp_pool import metadata_mcp_session
+from ..registry import registered_agent
+from ..utils.cache import TTLCache
+from .actor_name import normalize_actor_name
+from .flaresolverr import FlareSolverrError, flaresolverr_client
 
 setupLogfireForStdLog()
 _LOGGER = logging.getLogger(__name__)
 
 
+class ActorAliasStats(BaseModel):
+  exact_hits: int = 0
+  # found only after folding spelling variants, see normalize_actor_name
+  normalized_hits: int = 0
+  # not found, searched with FlareSolverr and the alias agent
+  misses: int = 0
+
+  def hit_rate(self) -> float:
+    lookups = self.exact_hits + self.normalized_hits + self.misses
+    return (self.exact_hits + self.normalized_hits) / lookups if lookups else 0
+
+
+lookup_stats = ActorAliasStats()
+
+
+def _add_normalized(normalized_to_dir: Dict[str, str | None], name: str, dir: str):
+  key = normalize_actor_name(name)
+  if normalized_to_dir.setdefault(key, dir) != dir:
+    # variants of names of different actors, only the exact name can be trusted.
+    normalized_to_dir[key] = None
+
+
 class ActorAlias(BaseModel):
   dir_to_alias: Dict[str, list[str]]
   name_to_dir: Dict[str, str]
+  # normalize_actor_name(name) to dir, None if names of different actors share the key.
+  # Built on the first lookup that misses name_to_dir, actor_alias_index builds it right away.
+  _normalized_to_dir: Dict[str, str | None] | None = PrivateAttr(None)
+  # entries of the journal the aliases were read with, compacted once it gets too long
+  _journal_entries: int = PrivateAttr(0)
+
+  def normalized_to_dir(self) -> Dict[str, str | None]:
+    if self._normalized_to_dir is None:
+      normalized_to_dir = {}
+      for name, dir in self.name_to_dir.items():
+        _add_normalized(normalized_to_dir, name, dir)
+      self._normalized_to_dir = normalized_to_dir
+    return self._normalized_to_dir
 
   def find_dir(self, actor_name: str) -> str | None:
-    return self.name_to_dir.get(actor_name)
+    return self.name_to_dir.get(actor_name) or self.normalized_to_dir().get(
+      normalize_actor_name(actor_name)
+    )
 
   def _find_a_dir_for_list_of_actor_name(self, actor_names: list[str]) -> str:
     """
-    Find the first actor has dir
+    Find the first actor has dir, exact names first, then spelling variants.
     """
 
     for actor_name in actor_names:
-      dir = self.find_dir(actor_name)
+      dir = self.name_to_dir.get(actor_name)
       if dir:
+        lookup_stats.exact_hits += 1
         return dir
+
+    for actor_name in actor_names:
+      dir = self.normalized_to_dir().get(normalize_actor_name(actor_name))
+      if dir:
+        lookup_stats.normalized_hits += 1
+        return dir
+
+    lookup_stats.misses += 1
     return None
 
 
+def _journal_file(jav_actor_file: str) -> str:
+  return f"{jav_actor_file}.journal"
+
+
+def _apply_aliases(
+  dir_to_alias: Dict[str, list[str]], name_to_dir: Dict[str, str], dir: str, aliases: list[str]
+):
+  existing = dir_to_alias.setdefault(dir, [])
+  seen = set(existing)
+  for a in aliases:
+    if a not in seen:
+      existing.append(a)
+      seen.add(a)
+      name_to_dir[a] = dir
+
+
+def _read_journal(jav_actor_file: str) -> list[tuple[str, list[str]]]:
+  """(dir, aliases) added since the last compaction, oldest first."""
+  try:
+    with open(_journal_file(jav_actor_file), "r", encoding="utf-8") as f:
+      lines = f.readlines()
+  except FileNotFoundError:
+    return []
+
+  entries = []
+  for line in lines:
+    try:
+      entry = json.loads(line)
+      entries.append((entry["dir"], entry["aliases"]))
+    except (ValueError, KeyError, TypeError):
+      # a line cut short by a crash while appending.
+      _LOGGER.warning(f"skipping broken actor alias journal line: {line!r}")
+  return entries
+
+
 def read_actor_alias() -> ActorAlias:
   """
   Read actor aliases from JSON file specified by JAV_ACTOR_FILE environment variable.
 
+  Aliases added since the last compaction are replayed from the journal next to it.
+
   Returns:
       ActorAlias: ActorAlias object with dir_to_alias and name_to_dir mappings
 
@@ -53,57 +144,173 @@ def read_actor_alias() -> ActorAlias:
   with open(jav_actor_file, "r", encoding="utf-8") as f:
     dir_to_alias = json.load(f)
 
-    # Compute name_to_dir mapping
-    name_to_dir = {}
-    for dir_name, aliases in dir_to_alias.items():
-      for alias in aliases:
-        name_to_dir[alias] = dir_name
+  # Compute name_to_dir mapping
+  name_to_dir = {}
+  for dir_name, aliases in dir_to_alias.items():
+    for alias in aliases:
+      name_to_dir[alias] = dir_name
+
+  journal = _read_journal(jav_actor_file)
+  for dir_name, aliases in journal:
+    _apply_aliases(dir_to_alias, name_to_dir, dir_name, aliases)
+
+  aa = ActorAlias(dir_to_alias=dir_to_alias, name_to_dir=name_to_dir)
+  aa._journal_entries = len(journal)
+  return aa
+
+
+_IndexKey = tuple[str, int, int, int, int]
+
+# key of the files and the ActorAlias loaded from them, replaced as a whole on reload.
+_index: tuple[_IndexKey, ActorAlias] | None = None
+_index_lock = threading.Lock()
+# serializes writers of this process, FileLock serializes processes.
+_write_lock = threading.Lock()
+
 
-    return ActorAlias(dir_to_alias=dir_to_alias, name_to_dir=name_to_dir)
+def _index_key(jav_actor_file: str) -> _IndexKey:
+  st = os.stat(jav_actor_file)
+  try:
+    js = os.stat(_journal_file(jav_actor_file))
+    journal = (js.st_mtime_ns, js.st_size)
+  except FileNotFoundError:
+    journal = (0, 0)
+  return (jav_actor_file, st.st_mtime_ns, st.st_size, *journal)
+
+
+def actor_alias_index() -> ActorAlias:
+  """
+  Process wide ActorAlias of JAV_ACTOR_FILE.
+
+  The file is loaded once and reloaded only when another process changed it or its journal,
+  add_actor_alias updates it in place. The returned ActorAlias is shared and must not be
+  modified otherwise. Reads files and waits on _index_lock, async code uses
+  load_actor_alias_index.
+  """
+  global _index
+  jav_actor_file = os.getenv("JAV_ACTOR_FILE")
+  key = _index_key(jav_actor_file)
+
+  index = _index
+  if index and index[0] == key:
+    return index[1]
+
+  with _index_lock:
+    if _index and _index[0] == key:
+      return _index[1]
+    # stat before reading: a write in between only causes one more reload.
+    aa = read_actor_alias()
+    # while still off the event loop, and before add_actor_alias can add to it.
+    aa.normalized_to_dir()
+    _index = (key, aa)
+    _LOGGER.info(f"loaded {len(aa.name_to_dir)} actor aliases from {jav_actor_file}")
+    return aa
+
+
+async def load_actor_alias_index() -> ActorAlias:
+  """actor_alias_index, loaded or reloaded in a thread so the event loop does not block on it."""
+  return await asyncio.to_thread(actor_alias_index)
+
+
+def _add_aliases(aa: ActorAlias, dir: str, aliases: list[str]):
+  """Add aliases journaled for dir to aa in place, call it with _index_lock held."""
+  _apply_aliases(aa.dir_to_alias, aa.name_to_dir, dir, aliases)
+  if aa._normalized_to_dir is not None:
+    for a in aliases:
+      _add_normalized(aa._normalized_to_dir, a, dir)
+  aa._journal_entries += 1
 
 
 def add_actor_alias(name: str, alias: list[str]) -> str:
   """
-  Add actor aliases to the JAV_ACTOR_FILE JSON file.
+  Add actor aliases to JAV_ACTOR_FILE.
+
+  The aliases are appended to the journal next to the JSON file, which is merged into the JSON
+  file once it has JAV_ACTOR_COMPACT_ENTRIES entries. Waits up to 10 seconds for the file lock
+  other processes write under, so async code runs it with asyncio.to_thread.
 
   Args:
       name: The directory name for the actor
       alias: List of aliases for the actor
+
+  Returns:
+      str: the directory of the actor, an existing one if any alias is known already
   """
+  global _index
   jav_actor_file = os.getenv("JAV_ACTOR_FILE")
   lock_file = f"{jav_actor_file}.lock"
 
   # Use file lock to prevent concurrent access
-  with FileLock(lock_file, timeout=10):
-    # Read existing actor aliases
-    aa = read_actor_alias()
+  with _write_lock, FileLock(lock_file, timeout=10):
+    # other processes write under the same lock, the index is up to date after this.
+    aa = actor_alias_index()
 
-    # Check if actor already exists using name_to_dir
+    # Check if actor already exists, spelling variants included
     existing_dir = None
     for a in alias:
-      if a in aa.name_to_dir:
-        existing_dir = aa.name_to_dir[a]
+      existing_dir = aa.find_dir(a)
+      if existing_dir:
         break
+    dir = existing_dir if existing_dir else name
+
+    journal_file = _journal_file(jav_actor_file)
+    with open(journal_file, "a", encoding="utf-8") as f:
+      f.write(json.dumps({"dir": dir, "aliases": alias}, ensure_ascii=False) + "\n")
+      f.flush()
+      os.fsync(f.fileno())
+
+    with _index_lock:
+      _add_aliases(aa, dir, alias)
+      _index = (_index_key(jav_actor_file), aa)
+
+    if aa._journal_entries >= int(os.getenv("JAV_ACTOR_COMPACT_ENTRIES", "100")):
+      _compact(jav_actor_file)
 
-    if existing_dir:
-      # Merge existing list and new list
-      existing_aliases = set(aa.dir_to_alias[existing_dir])
-      new_aliases = [a for a in alias if a not in existing_aliases]
-      aa.dir_to_alias[existing_dir].extend(new_aliases)
-    else:
-      # Add new actor
-      aa.dir_to_alias[name] = alias
-      for a in alias:
-        aa.name_to_dir[a] = name
+    return dir
+
+
+def _compact(jav_actor_file: str):
+  global _index
+  journal_file = _journal_file(jav_actor_file)
+  if not os.path.exists(journal_file):
+    return
+
+  aa = read_actor_alias()
+  tmp_file = f"{jav_actor_file}.tmp"
+  with open(tmp_file, "w", encoding="utf-8") as f:
+    json.dump(aa.dir_to_alias, f, ensure_ascii=False, indent=2)
+    f.flush()
+    os.fsync(f.fileno())
+  os.replace(tmp_file, jav_actor_file)
+  # replaying the journal again after a crash here is harmless, entries are merged.
+  os.remove(journal_file)
+
+  with _index_lock:
+    _index = (_index_key(jav_actor_file), aa)
+  _LOGGER.info(f"compacted actor alias journal into {jav_actor_file}")
+
+
+def compact_actor_alias():
+  """Merge the journal into JAV_ACTOR_FILE, so the JSON file has every alias."""
+  jav_actor_file = os.getenv("JAV_ACTOR_FILE")
+  if not jav_actor_file or not os.path.exists(_journal_file(jav_actor_file)):
+    return
+  with _write_lock, FileLock(f"{jav_actor_file}.lock", timeout=10):
+    _compact(jav_actor_file)
 
-    # Write back to file
-    with open(jav_actor_file, "w", encoding="utf-8") as f:
-      json.dump(aa.dir_to_alias, f, ensure_ascii=False, indent=2)
 
-    return existing_dir if existing_dir else name
+def _parse_aliases(html_content: str) -> list[str]:
+  """Aliases in the title of the first actor box of a JAVDB search page."""
+  soup = BeautifulSoup(html_content, "html.parser")
 
+  actor_box = soup.select_one(".actor-box a")
+  if actor_box and actor_box.get("title"):
+    title = actor_box.get("title")
+    return [alias.strip() for alias in title.split(",")]
+  return []
 
-def search_alias(name: str) -> list[str]:
+
+async def search_alias(name: str) -> list[str]:
   """
   Search for actor aliases from JAVDB using FlareSolverr.
 
@@ -119,49 +326,30 @@ def search_alias(name: str) -> list[str]:
   encoded_name = urllib.parse.quote(name)
   search_url = f"{base_url}&q={encoded_name}"
 
-  flaresolverr_url = os.getenv("FLARESOLVERR_URL")
-  if not flaresolverr_url:
+  client = flaresolverr_client()
+  if not client:
     _LOGGER.error("FLARESOLVERR_URL environment variable is not set")
     return []
 
-  # FlareSolverr request payload
-  flaresolverr_payload = {"cmd": "request.get", "url": search_url, "maxTimeout": 60000}
-
   try:
-    # Make request through FlareSolverr
-    response = requests.post(flaresolverr_url, json=flaresolverr_payload, timeout=70)
-    response.raise_for_status()
-
-    flaresolverr_result = response.json()
-
-    # Check if FlareSolverr request was successful
-    if flaresolverr_result.get("status") != "ok":
-      _LOGGER.error(f"FlareSolverr request failed: {flaresolverr_result}")
-      return []
-
-    # Extract the HTML content from FlareSolverr response
-    html_content = flaresolverr_result.get("solution", {}).get("response")
-    if not html_content:
-      _LOGGER.error("No HTML content in FlareSolverr response")
-      return []
-
-    soup = BeautifulSoup(html_content, "html.parser")
+    solution = await client.get(search_url)
+  except FlareSolverrError as e:
+    _LOGGER.error(f"Error searching for actor aliases via FlareSolverr: {e}")
+    return []
 
-    # Find the first actor box and extract aliases from title attribute
-    aliases = []
-    actor_box = soup.select_one(".actor-box a")
-    if actor_box and actor_box.get("title"):
-      title = actor_box.get("title")
-      aliases = [alias.strip() for alias in title.split(",")]
+  # Extract the HTML content from FlareSolverr response
+  html_content = solution.get("response")
+  if not html_content:
+    _LOGGER.error("No HTML content in FlareSolverr response")
+    return []
 
-    if name not in aliases:
-      aliases.append(name)
+  # parsing a search page takes a while, keep it off the event loop.
+  aliases = await asyncio.to_thread(_parse_aliases, html_content)
 
-    return aliases
+  if name not in aliases:
+    aliases.append(name)
 
-  except Exception as e:
-    _LOGGER.error(f"Error searching for actor aliases via FlareSolverr: {e}")
-    return []
+  return aliases
 
 
 _INSTRUCTION = """\
@@ -183,35 +371,182 @@ class AliasType(BaseModel):
   aliases: list[str]
 
 
-def alias_agent(mcp: MCPServer) -> Agent:
+def _build_alias_agent() -> Agent:
   return Agent(
     name="jav_actor_alias",
     model=model(),
     instructions=_INSTRUCTION,
     output_type=ToolOutput(AliasType),
-    toolsets=[mcp],
     prepare_tools=allowedTools(["web_search"]),
   )
 
 
+def alias_agent() -> Agent:
+  return registered_agent("jav_actor_alias", _build_alias_agent)
+
+
+_negative_cache: TTLCache | None = None
+
+
+def negative_cache() -> TTLCache:
+  """Names JAVDB had no actor for, or FlareSolverr failed on, by normalize_actor_name."""
+  global _negative_cache
+  if _negative_cache is None:
+    _negative_cache = TTLCache(
+      "actor_alias_negative",
+      ttl=float(os.getenv("JAV_ACTOR_NEGATIVE_TTL", str(24 * 3600))),
+      max_entries=4096,
+    )
+  return _negative_cache
+
+
+# discoveries in flight by normalize_actor_name, concurrent callers await the same one.
+_inflight: dict[str, asyncio.Task] = {}
+
+
+async def _discover_actor(name: str, mcp: MCPServer) -> Tuple[str, RunUsage]:
+  # another discovery may have added the actor since the caller read the index.
+  dir = (await load_actor_alias_index()).find_dir(name)
+  if dir:
+    return dir, RunUsage()
+
+  key = normalize_actor_name(name)
+  if negative_cache().get(key):
+    _LOGGER.info(f"skipping JAVDB search for {name}, it found nothing recently")
+    new_actor_aliases = [name]
+  else:
+    new_actor_aliases = await search_alias(name)
+    if not set(new_actor_aliases) - {name}:
+      negative_cache().set(key, True)
+      new_actor_aliases = [name]
+
+  if new_actor_aliases == [name] and (
+    os.getenv("JAV_ACTOR_SKIP_UNKNOWN", "false").lower() == "true"
+  ):
+    # not stored without its JAVDB aliases, it is searched again once the entry expires.
+    return name, RunUsage()
+
+  a = alias_agent()
+  input = AliasType(aliases=new_actor_aliases)
+  res = await a.run(input.model_dump_json(), toolsets=[cached_tools(mcp)])
+  new_actor_aliases = res.output.aliases
+  # a thread blocked on the file lock, _shared_discovery keeps it to one per actor.
+  dir = await asyncio.to_thread(add_actor_alias, name, new_actor_aliases)
+
+  return dir, res.usage()
+
+
+async def _shared_discovery(name: str, mcp: MCPServer) -> Tuple[str, RunUsage]:
+  key = normalize_actor_name(name)
+  task = _inflight.get(key)
+  if task and task.get_loop() is asyncio.get_running_loop():
+    _LOGGER.info(f"waiting for the running alias discovery of {name}")
+    # the usage is reported by the caller that started the discovery.
+    dir, _ = await asyncio.shield(task)
+    return dir, RunUsage()
+
+  # shared by callers of other plans, so it reports to none of their streams.
+  task = asyncio.create_task(_discover_actor(name, mcp), context=without_plan_events())
+  _inflight[key] = task
+  task.add_done_callback(lambda t: _inflight.pop(key) if _inflight.get(key) is t else None)
+  # shielded, so a cancelled caller does not fail the others waiting for it.
+  return await asyncio.shield(task)
+
+
+class ActorRelocation(BaseModel):
+  actor: str
+  # actor dir files were moved to while the actor was not known yet
+  provisional_dir: str
+  # dir the actor turned out to belong to
+  dir: str
+
+
+def _relocations_file() -> str:
+  return f"{os.getenv('JAV_ACTOR_FILE')}.relocations.jsonl"
+
+
+def read_actor_relocations() -> list[ActorRelocation]:
+  """Actor dirs that need to be merged into another one, oldest first. Served by the API."""
+  try:
+    with open(_relocations_file(), "r", encoding="utf-8") as f:
+      return [ActorRelocation.model_validate_json(line) for line in f if line.strip()]
+  except FileNotFoundError:
+    return []
+
+
+def _record_relocation(relocation: ActorRelocation):
+  with open(_relocations_file(), "a", encoding="utf-8") as f:
+    f.write(relocation.model_dump_json() + "\n")
+
+
+# deferred discoveries by normalize_actor_name, kept referenced until done.
+_background: dict[str, asyncio.Task] = {}
+
+
+async def _discover_in_background(name: str):
+  try:
+    async with metadata_mcp_session() as mcp:
+      dir, usage = await _shared_discovery(name, mcp)
+  except Exception:
+    # the actor is not stored, the next plan with it tries again.
+    _LOGGER.exception(f"background alias discovery of {name} failed")
+    return
+
+  _LOGGER.info(f"background alias discovery of {name} done, usage: {usage}")
+  if dir != name:
+    _LOGGER.warning(f"files moved to actor dir {name} belong to {dir}")
+    await asyncio.to_thread(
+      _record_relocation, ActorRelocation(actor=name, provisional_dir=name, dir=dir)
+    )
+
+
+def _defer_discovery(name: str):
+  key = normalize_actor_name(name)
+  if key in _background:
+    return
+  task = asyncio.create_task(_discover_in_background(name), context=without_plan_events())
+  _background[key] = task
+  task.add_done_callback(lambda t: _background.pop(key) if _background.get(key) is t else None)
+
+
+async def stop_background_discoveries():
+  """Cancel deferred discoveries, their actors are discovered again on the next plan."""
+  tasks = list(_background.values())
+  for task in tasks:
+    task.cancel()
+  await asyncio.gather(*tasks, return_exceptions=True)
+
+
 async def find_a_dir_for_list_of_actor_name(
   alias: ActorAlias, mcp: MCPServer, actor_names: list[str]
 ) -> Tuple[str, RunUsage]:
+  """
+  Actor dir for the first known name, spelling variants included.
+
+  An unknown actor is searched on JAVDB and expanded by the alias agent, then stored under the
+  first name. With JAV_ACTOR_SKIP_UNKNOWN=true an actor JAVDB has nothing for is not stored, its
+  first name is used and JAVDB is searched again after JAV_ACTOR_NEGATIVE_TTL. With
+  JAV_ACTOR_DEFERRED_DISCOVERY=true the first name is returned right away and the search runs in
+  the background. If the actor turns out to be known under another dir, an ActorRelocation is
+  recorded for the files already moved.
+  """
   dir = alias._find_a_dir_for_list_of_actor_name(actor_names)
   if dir:
     return dir, RunUsage()
 
+  _LOGGER.info(
+    f"actor alias lookup missed {actor_names}, hit rate {lookup_stats.hit_rate():.0%} "
+    f"({lookup_stats.exact_hits} exact, {lookup_stats.normalized_hits} normalized, "
+    f"{lookup_stats.misses} missed)"
+  )
+
   # just add the first actor to our list.
   n = actor_names[0]
-  new_actor_aliases = search_alias(n)
-
-  a = alias_agent(mcp)
-  input = AliasType(aliases=new_actor_aliases)
-  res = await a.run(input.model_dump_json())
-  new_actor_aliases = res.output.aliases
-  dir = add_actor_alias(n, new_actor_aliases)
+  if os.getenv("JAV_ACTOR_DEFERRED_DISCOVERY", "false").lower() == "true":
+    _defer_discovery(n)
+    return n, RunUsage()
 
-  return dir, res.usage()
+  return await _shared_discovery(n, mcp)
 
 
 if __name__ == "__main__":
@@ -222,7 +557,7 @@ if __name__ == "__main__":
 
     input = AliasType(aliases=["七瀨愛麗絲", "七瀬アリス", "アリスさん", "市島亜美"])
     mcp = metadataMcp()
-    a = alias_agent(mcp)
-    res = a.run_sync(input.model_dump_json())
+    a = alias_agent()
+    res = a.run_sync(input.model_dump_json(), toolsets=[mcp])
     print(f"output: {res.output}")
     print(f"usage: {res.usage()}")
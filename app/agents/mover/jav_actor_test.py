@@ -1,14 +1,29 @@
+import asyncio
 import json
 import os
+import threading
+from contextlib import asynccontextmanager
 
+import httpx
 import pytest
-from pydantic_ai import RunUsage
+from pydantic_ai import Agent, ModelMessage, ModelResponse, RunUsage, ToolCallPart, ToolOutput
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from pydantic_ai.toolsets import FunctionToolset
 
 from ..ai import metadataMcp, model, setupLogfire
+from ..events import emit_plan_event, stream_plan_events
+from ..models import PlanResponse
+from ..utils.cache import TTLCache
+from . import jav_actor
+from .flaresolverr import FlareSolverrClient
 from .jav_actor import (
   ActorAlias,
+  AliasType,
+  actor_alias_index,
   add_actor_alias,
+  compact_actor_alias,
   find_a_dir_for_list_of_actor_name,
+  load_actor_alias_index,
   read_actor_alias,
   search_alias,
 )
@@ -85,6 +100,78 @@ def test_find_dir(tmp_path):
   assert actor_alias.find_dir("NonExistent") is None
 
 
+def test_find_dir_spelling_variants(monkeypatch):
+  """Test that spelling variants are found without searching, and counted"""
+  monkeypatch.setattr(jav_actor, "lookup_stats", jav_actor.ActorAliasStats())
+  aa = ActorAlias(
+    dir_to_alias={"波多野結衣": ["波多野結衣", "Yui Hatano"], "a": ["Ai"], "b": ["AI"]},
+    name_to_dir={"波多野結衣": "波多野結衣", "Yui Hatano": "波多野結衣", "Ai": "a", "AI": "b"},
+  )
+
+  assert aa.find_dir("波多野结衣") == "波多野結衣"
+  assert aa.find_dir("yui  hatano") == "波多野結衣"
+  # names of different actors sharing a key are only found exactly
+  assert aa.find_dir("ai") is None
+  assert aa.find_dir("AI") == "b"
+
+  assert aa._find_a_dir_for_list_of_actor_name(["someone", "波多野 結衣"]) == "波多野結衣"
+  assert aa._find_a_dir_for_list_of_actor_name(["Yui Hatano"]) == "波多野結衣"
+  assert aa._find_a_dir_for_list_of_actor_name(["someone"]) is None
+  stats = jav_actor.lookup_stats
+  assert (stats.exact_hits, stats.normalized_hits, stats.misses) == (1, 1, 1)
+  assert stats.hit_rate() == pytest.approx(2 / 3)
+
+
+def test_actor_alias_index_reloads_on_change(tmp_path):
+  """Test that the index is shared, updated in place by add_actor_alias and reloaded otherwise"""
+  test_file = tmp_path / "test_actors.json"
+  with open(test_file, "w", encoding="utf-8") as f:
+    json.dump({"actor1": ["name1"]}, f)
+
+  os.environ["JAV_ACTOR_FILE"] = str(test_file)
+
+  first = actor_alias_index()
+  assert first.find_dir("name1") == "actor1"
+  assert actor_alias_index() is first
+
+  add_actor_alias("actor2", ["name2"])
+
+  assert actor_alias_index() is first
+  assert first.find_dir("name2") == "actor2"
+
+  # another process appending to the journal.
+  with open(f"{test_file}.journal", "a", encoding="utf-8") as f:
+    f.write(json.dumps({"dir": "actor3", "aliases": ["name3"]}) + "\n")
+
+  second = actor_alias_index()
+  assert second is not first
+  assert second.find_dir("name3") == "actor3"
+
+
+@pytest.mark.asyncio
+async def test_load_actor_alias_index_off_the_event_loop(tmp_path, monkeypatch):
+  """Test that the index is loaded, normalized names included, outside of the event loop thread"""
+  test_file = tmp_path / "test_actors.json"
+  with open(test_file, "w", encoding="utf-8") as f:
+    json.dump({"actor1": ["Name One"]}, f)
+  monkeypatch.setenv("JAV_ACTOR_FILE", str(test_file))
+
+  threads = []
+  read = jav_actor.read_actor_alias
+
+  def read_in_thread():
+    threads.append(threading.get_ident())
+    return read()
+
+  monkeypatch.setattr(jav_actor, "read_actor_alias", read_in_thread)
+
+  aa = await load_actor_alias_index()
+
+  assert threads and threads[0] != threading.get_ident()
+  assert aa._normalized_to_dir is not None
+  assert aa.find_dir("name one") == "actor1"
+
+
 def test_add_actor_alias_new_actor(tmp_path):
   """Test adding aliases for a new actor"""
   test_file = tmp_path / "test_actors.json"
@@ -97,6 +184,7 @@ def test_add_actor_alias_new_actor(tmp_path):
   result = add_actor_alias("new_actor", ["name1", "alias1", "alias2"])
 
   # Verify file was updated
+  compact_actor_alias()
   with open(test_file, "r", encoding="utf-8") as f:
     saved_data = json.load(f)
 
@@ -121,6 +209,7 @@ def test_add_actor_alias_existing_actor_merge(tmp_path):
   result = add_actor_alias("existing_actor", ["old_alias", "new_alias1", "new_alias2"])
 
   # Verify file was updated
+  compact_actor_alias()
   with open(test_file, "r", encoding="utf-8") as f:
     saved_data = json.load(f)
 
@@ -146,6 +235,7 @@ def test_add_actor_alias_duplicate_detection(tmp_path):
   result = add_actor_alias("different_name", ["name1", "new_alias"])
 
   # Verify file was updated
+  compact_actor_alias()
   with open(test_file, "r", encoding="utf-8") as f:
     saved_data = json.load(f)
 
@@ -170,6 +260,7 @@ def test_add_actor_alias_unicode(tmp_path):
   result = add_actor_alias("波多野结衣", ["Yui Hatano", "波多野结衣", "波多野結衣"])
 
   # Verify file was updated with proper encoding
+  compact_actor_alias()
   with open(test_file, "r", encoding="utf-8") as f:
     saved_data = json.load(f)
 
@@ -192,6 +283,7 @@ def test_add_actor_alias_empty_alias_list(tmp_path):
   result = add_actor_alias("empty_actor", [])
 
   # Verify file was updated
+  compact_actor_alias()
   with open(test_file, "r", encoding="utf-8") as f:
     saved_data = json.load(f)
 
@@ -202,7 +294,61 @@ def test_add_actor_alias_empty_alias_list(tmp_path):
   assert result == "empty_actor"
 
 
-def test_search_alias():
+def test_add_actor_alias_appends_to_journal(tmp_path):
+  """Test that new aliases go to the journal and are merged into the JSON file on compaction"""
+  test_file = tmp_path / "test_actors.json"
+  with open(test_file, "w", encoding="utf-8") as f:
+    json.dump({"actor1": ["name1"]}, f)
+
+  os.environ["JAV_ACTOR_FILE"] = str(test_file)
+
+  add_actor_alias("actor2", ["name2"])
+  add_actor_alias("other", ["name1", "alias1"])
+
+  with open(test_file, "r", encoding="utf-8") as f:
+    assert json.load(f) == {"actor1": ["name1"]}
+  assert read_actor_alias().dir_to_alias == {"actor1": ["name1", "alias1"], "actor2": ["name2"]}
+
+  compact_actor_alias()
+
+  with open(test_file, "r", encoding="utf-8") as f:
+    assert json.load(f) == {"actor1": ["name1", "alias1"], "actor2": ["name2"]}
+  assert not os.path.exists(f"{test_file}.journal")
+
+
+def test_add_actor_alias_compacts_after_entries(tmp_path, monkeypatch):
+  """Test that the journal is merged once it has JAV_ACTOR_COMPACT_ENTRIES entries"""
+  test_file = tmp_path / "test_actors.json"
+  with open(test_file, "w", encoding="utf-8") as f:
+    json.dump({}, f)
+
+  os.environ["JAV_ACTOR_FILE"] = str(test_file)
+  monkeypatch.setenv("JAV_ACTOR_COMPACT_ENTRIES", "2")
+
+  add_actor_alias("actor1", ["name1"])
+  assert os.path.exists(f"{test_file}.journal")
+  add_actor_alias("actor2", ["name2"])
+  assert not os.path.exists(f"{test_file}.journal")
+
+  with open(test_file, "r", encoding="utf-8") as f:
+    assert json.load(f) == {"actor1": ["name1"], "actor2": ["name2"]}
+
+
+def test_read_actor_alias_skips_broken_journal_line(tmp_path):
+  """Test that a journal line cut short by a crash is skipped"""
+  test_file = tmp_path / "test_actors.json"
+  with open(test_file, "w", encoding="utf-8") as f:
+    json.dump({}, f)
+  with open(f"{test_file}.journal", "w", encoding="utf-8") as f:
+    f.write('{"dir": "actor1", "aliases": ["name1"]}\n{"dir": "actor2", "ali')
+
+  os.environ["JAV_ACTOR_FILE"] = str(test_file)
+
+  assert read_actor_alias().dir_to_alias == {"actor1": ["name1"]}
+
+
+@pytest.mark.asyncio
+async def test_search_alias():
   """Test searching for aliases of actor 藤森里穂 and verifying 井上遥香 is included"""
   import os
 
@@ -210,7 +356,7 @@ def test_search_alias():
   if not os.getenv("FLARESOLVERR_URL"):
     pytest.skip("FLARESOLVERR_URL environment variable not set")
 
-  aliases = search_alias("藤森里穂")
+  aliases = await search_alias("藤森里穂")
 
   # Verify that the result contains some aliases
   assert len(aliases) > 0
@@ -222,6 +368,208 @@ def test_search_alias():
   assert "藤森里穂" in aliases
 
 
+@pytest.mark.asyncio
+async def test_search_alias_parses_first_actor(monkeypatch):
+  """Test that aliases come from the first actor box of the FlareSolverr page"""
+  html = """
+  <div class="actor-box"><a title="藤森里穂, 井上遥香" href="/actors/1"></a></div>
+  <div class="actor-box"><a title="Other" href="/actors/2"></a></div>
+  """
+
+  def handler(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, json={"status": "ok", "solution": {"response": html}})
+
+  client = FlareSolverrClient(
+    "http://flaresolverr/v1", sessions=0, transport=httpx.MockTransport(handler)
+  )
+  monkeypatch.setattr(jav_actor, "flaresolverr_client", lambda: client)
+
+  assert await search_alias("藤森里穂") == ["藤森里穂", "井上遥香"]
+  assert await search_alias("Rio") == ["藤森里穂", "井上遥香", "Rio"]
+  await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_search_alias_flaresolverr_error(monkeypatch):
+  """Test that a FlareSolverr failure gives no aliases"""
+
+  def handler(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, json={"status": "error", "message": "timeout"})
+
+  client = FlareSolverrClient(
+    "http://flaresolverr/v1", sessions=0, transport=httpx.MockTransport(handler)
+  )
+  monkeypatch.setattr(jav_actor, "flaresolverr_client", lambda: client)
+
+  assert await search_alias("藤森里穂") == []
+  await client.aclose()
+
+
+class FakeDiscovery:
+  """search_alias and the alias agent, counting calls"""
+
+  def __init__(self, monkeypatch, aliases: dict[str, list[str]]):
+    self.searches: list[str] = []
+    self.agent_runs = 0
+    monkeypatch.setattr(jav_actor, "_negative_cache", None)
+
+    async def fake_search_alias(name: str) -> list[str]:
+      self.searches.append(name)
+      await asyncio.sleep(0.01)
+      return aliases.get(name, [])
+
+    def answer(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+      self.agent_runs += 1
+      output = AliasType.model_validate_json(messages[-1].parts[-1].content)
+      return ModelResponse(parts=[ToolCallPart(info.output_tools[0].name, output.model_dump())])
+
+    fake = Agent(FunctionModel(answer), output_type=ToolOutput(AliasType))
+    monkeypatch.setattr(jav_actor, "search_alias", fake_search_alias)
+    monkeypatch.setattr(jav_actor, "alias_agent", lambda: fake)
+
+
+@pytest.mark.asyncio
+async def test_find_a_dir_concurrent_callers_share_discovery(tmp_path, monkeypatch):
+  """Test that concurrent lookups of one new actor run a single discovery"""
+  test_file = tmp_path / "test_actors.json"
+  with open(test_file, "w", encoding="utf-8") as f:
+    json.dump({}, f)
+  monkeypatch.setenv("JAV_ACTOR_FILE", str(test_file))
+  fake = FakeDiscovery(monkeypatch, {"藤森里穂": ["藤森里穂", "井上遥香"]})
+
+  aa = read_actor_alias()
+  results = await asyncio.gather(
+    *[find_a_dir_for_list_of_actor_name(aa, FunctionToolset(), ["藤森里穂"]) for _ in range(3)]
+  )
+
+  assert [dir for dir, _ in results] == ["藤森里穂"] * 3
+  assert fake.searches == ["藤森里穂"]
+  assert fake.agent_runs == 1
+  assert sum(usage.requests for _, usage in results) == 1
+
+  # a caller holding the old index finds the added actor without searching again
+  assert await find_a_dir_for_list_of_actor_name(aa, FunctionToolset(), ["井上遥香"]) == (
+    "藤森里穂",
+    RunUsage(),
+  )
+  assert fake.searches == ["藤森里穂"]
+
+
+@pytest.mark.asyncio
+async def test_find_a_dir_negative_cache(tmp_path, monkeypatch):
+  """Test that a name JAVDB found nothing for is not searched again"""
+  test_file = tmp_path / "test_actors.json"
+  with open(test_file, "w", encoding="utf-8") as f:
+    json.dump({}, f)
+  monkeypatch.setenv("JAV_ACTOR_FILE", str(test_file))
+  fake = FakeDiscovery(monkeypatch, {})
+
+  dir, _ = await find_a_dir_for_list_of_actor_name(
+    read_actor_alias(), FunctionToolset(), ["Nobody"]
+  )
+  assert dir == "Nobody"
+  assert jav_actor.negative_cache().get("nobody")
+  assert read_actor_alias().find_dir("Nobody") == "Nobody"
+
+  # forget the stored actor, the next lookup runs the agent but does not search JAVDB again
+  with open(test_file, "w", encoding="utf-8") as f:
+    json.dump({}, f)
+  os.remove(f"{test_file}.journal")
+  await find_a_dir_for_list_of_actor_name(read_actor_alias(), FunctionToolset(), ["nobody"])
+
+  assert fake.searches == ["Nobody"]
+  assert fake.agent_runs == 2
+
+
+@pytest.mark.asyncio
+async def test_find_a_dir_skip_unknown(tmp_path, monkeypatch):
+  """Test that with JAV_ACTOR_SKIP_UNKNOWN a name JAVDB found nothing for is not stored"""
+  test_file = tmp_path / "test_actors.json"
+  with open(test_file, "w", encoding="utf-8") as f:
+    json.dump({}, f)
+  monkeypatch.setenv("JAV_ACTOR_FILE", str(test_file))
+  monkeypatch.setenv("JAV_ACTOR_SKIP_UNKNOWN", "true")
+  fake = FakeDiscovery(monkeypatch, {})
+  now = [1000.0]
+  monkeypatch.setattr(
+    jav_actor, "_negative_cache", TTLCache("actor_alias_negative", 60, clock=lambda: now[0])
+  )
+
+  dir, usage = await find_a_dir_for_list_of_actor_name(
+    read_actor_alias(), FunctionToolset(), ["Nobody"]
+  )
+  assert (dir, usage) == ("Nobody", RunUsage())
+  assert read_actor_alias().find_dir("Nobody") is None
+
+  # not searched again while the negative entry lives
+  await find_a_dir_for_list_of_actor_name(read_actor_alias(), FunctionToolset(), ["nobody"])
+  assert fake.searches == ["Nobody"]
+
+  now[0] += 61
+  await find_a_dir_for_list_of_actor_name(read_actor_alias(), FunctionToolset(), ["nobody"])
+  assert fake.searches == ["Nobody", "nobody"]
+  assert fake.agent_runs == 0
+
+
+@pytest.mark.asyncio
+async def test_find_a_dir_deferred_discovery(tmp_path, monkeypatch):
+  """Test that a new actor gets a provisional dir and a relocation once the real one is known"""
+  test_file = tmp_path / "test_actors.json"
+  with open(test_file, "w", encoding="utf-8") as f:
+    json.dump({"波多野結衣": ["波多野結衣"]}, f)
+  monkeypatch.setenv("JAV_ACTOR_FILE", str(test_file))
+  monkeypatch.setenv("JAV_ACTOR_DEFERRED_DISCOVERY", "true")
+  fake = FakeDiscovery(monkeypatch, {"Hatano Yui": ["Hatano Yui", "波多野結衣"]})
+
+  @asynccontextmanager
+  async def fake_session():
+    yield FunctionToolset()
+
+  monkeypatch.setattr(jav_actor, "metadata_mcp_session", fake_session)
+
+  aa = read_actor_alias()
+  assert await find_a_dir_for_list_of_actor_name(aa, None, ["Hatano Yui"]) == (
+    "Hatano Yui",
+    RunUsage(),
+  )
+  assert await find_a_dir_for_list_of_actor_name(aa, None, ["Hatano Yui"]) == (
+    "Hatano Yui",
+    RunUsage(),
+  )
+  await asyncio.gather(*jav_actor._background.values())
+
+  assert fake.searches == ["Hatano Yui"]
+  assert read_actor_alias().find_dir("Hatano Yui") == "波多野結衣"
+  assert jav_actor.read_actor_relocations() == [
+    jav_actor.ActorRelocation(actor="Hatano Yui", provisional_dir="Hatano Yui", dir="波多野結衣")
+  ]
+
+
+@pytest.mark.asyncio
+async def test_shared_discovery_reports_to_no_stream(tmp_path, monkeypatch):
+  """Test that a discovery shared by plans does not report to the stream of the one starting it"""
+  test_file = tmp_path / "test_actors.json"
+  with open(test_file, "w", encoding="utf-8") as f:
+    json.dump({}, f)
+  monkeypatch.setenv("JAV_ACTOR_FILE", str(test_file))
+  FakeDiscovery(monkeypatch, {"藤森里穂": ["藤森里穂", "井上遥香"]})
+  search = jav_actor.search_alias
+
+  async def reporting_search(name: str) -> list[str]:
+    emit_plan_event("actor_dir", actors=[name])
+    return await search(name)
+
+  monkeypatch.setattr(jav_actor, "search_alias", reporting_search)
+
+  async def plan() -> PlanResponse:
+    await find_a_dir_for_list_of_actor_name(read_actor_alias(), FunctionToolset(), ["藤森里穂"])
+    return PlanResponse(plan=[])
+
+  events = [event.stage async for event in stream_plan_events(plan)]
+
+  assert events == ["plan"]
+
+
 @pytest.fixture
 def cleanup_env():
   """Clean up environment variable after tests"""
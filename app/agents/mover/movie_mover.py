@@ -1,3 +1,5 @@
+import os
+import re
 from os import path
 from typing import Tuple
 
@@ -6,7 +8,31 @@ from pydantic_ai.usage import RunUsage
 
 from ..ai import model
 from ..categorizer.models import PlanRequestWithCategory
-from ..models import Category, Language, MoverResponse, SimpleAgentResponseResult, TargetDir
+from ..events import emit_plan_actions
+from ..models import (
+  Category,
+  Language,
+  MoverResponse,
+  PlanAction,
+  SimpleAgentResponseResult,
+  TargetDir,
+)
+from ..registry import registered_agent
+from .subtitle_mover import move as subtitle_move
+from .utils import (
+  filter_video_files_sub_files_and_others,
+  language_root,
+  subtitle_language_suffix,
+)
+
+_EXTRA_RE = re.compile(
+  r"(?<![a-z])(?:sample|trailer|teaser|featurettes?|extras?|bonus|behind[ ._-]the[ ._-]scenes|"
+  r"deleted[ ._-]scenes?|making[ ._-]of|ncop|nced)(?![a-z])|花絮|预告"
+)
+# part/pt is left out, "Part 1" and "Part 2" are usually separate movies.
+_DISC_RE = re.compile(r"(?<![a-z])(?:cd|dis[ck])[ ._-]?(\d)(?!\d)")
+# the main feature must be this many times larger than any other video.
+_MAIN_FEATURE_RATIO = 3
 
 
 def _build_instruction(target_dir: TargetDir, language: Language) -> str:
@@ -49,10 +75,10 @@ Specifics:
    - If the file doesn't match the provided movie or is an extra, `"action": "skip"`.
    - If multiple movies detected, separate into logical groups.
 ```
-""".replace("$PATH$", path.join(target_dir.name, language.name))
+""".replace("$PATH$", language_root(target_dir, language))
 
 
-def agent(target_dir: TargetDir, language: Language) -> Agent:
+def _build_agent(target_dir: TargetDir, language: Language) -> Agent:
   return Agent(
     name="movie_mover",
     model=model(),
@@ -61,14 +87,168 @@ def agent(target_dir: TargetDir, language: Language) -> Agent:
   )
 
 
-async def move(req: PlanRequestWithCategory) -> Tuple[MoverResponse, RunUsage]:
+def agent(target_dir: TargetDir, language: Language) -> Agent:
+  return registered_agent(
+    "movie_mover", lambda: _build_agent(target_dir, language), target_dir, language
+  )
+
+
+def _movie_name(req: PlanRequestWithCategory) -> str | None:
+  movie = req.movie
+  name = movie.movie_name_in_chinese or movie.movie_name
+  if not name:
+    return None
+  name = name.replace("/", " ").strip()
+  if movie.release_year:
+    return f"{name} ({movie.release_year})"
+  return name
+
+
+def _file_size(dir: str, file: str) -> int | None:
+  try:
+    return path.getsize(path.join(os.getenv("DOWNLOAD_COMPLETED_DIR", ""), dir, file))
+  except OSError:
+    return None
+
+
+def _is_extra(file: str) -> bool:
+  # the top folder is usually the release name, it may contain any word of the title.
+  parts = file.replace("\\", "/").split("/")[1:] or [file]
+  return any(_EXTRA_RE.search(part.lower()) for part in parts)
+
+
+def _disc(file: str) -> int | None:
+  m = _DISC_RE.search(path.splitext(path.basename(file))[0].lower())
+  return int(m.group(1)) if m else None
+
+
+def _without_disc(file: str) -> str:
+  """File name without its disc marker, the same for every disc of a movie."""
+  return _DISC_RE.sub("", path.basename(file).lower(), count=1)
+
+
+def _main_videos(dir: str, videos: list[str]) -> dict[str, str] | None:
+  """
+  Pick the video files of the movie.
+
+  Returns:
+      dict[str, str] | None: video file to its name suffix ("" or "-cdN" for multi-disc movies),
+          None if it is not clear which videos are the movie
+  """
+  if len(videos) <= 1:
+    return {file: "" for file in videos}
+
+  discs = [_disc(file) for file in videos]
+  if None not in discs and len(set(discs)) == len(discs):
+    # discs of one movie differ only in their marker, anything else may be several movies.
+    if len({_without_disc(file) for file in videos}) != 1:
+      return None
+    return {file: f"-cd{disc}" for file, disc in zip(videos, discs)}
+
+  sizes = sorted(((_file_size(dir, file), file) for file in videos), reverse=True)
+  if any(size is None for size, _ in sizes):
+    return None
+  (largest, main), (second, _) = sizes[0], sizes[1]
+  if largest >= second * _MAIN_FEATURE_RATIO:
+    return {main: ""}
+  return None
+
+
+def local_plan(
+  dir: str, req: PlanRequestWithCategory, root: str
+) -> Tuple[list[PlanAction], list[str]] | None:
+  """
+  Plan a single movie (or a multi-disc one) without asking the agent.
+
+  Extras and non media files are skipped, the main feature is picked by size. Subtitles whose
+  language is in the file name are named after their video.
+
+  Args:
+      dir: download dir of the request
+      req: request with movie information
+      root: target_dir/language folder
+
+  Returns:
+      Tuple[list[PlanAction], list[str]] | None:
+          - plan of the movie files
+          - subtitles left to the subtitle mover
+          None if the request is left to the agent, e.g. several movies in one download
+  """
+  name = _movie_name(req)
+  if not name:
+    return None
+
+  videos, subs, others = filter_video_files_sub_files_and_others(req.request.files)
+  plan = [PlanAction(file=file, action="skip") for file in others]
+
+  features = []
+  for file in videos:
+    if _is_extra(file):
+      plan.append(PlanAction(file=file, action="skip"))
+    else:
+      features.append(file)
+
+  main = _main_videos(dir, features)
+  if not main:
+    # no movie among the videos, or no video at all: nothing here is understood.
+    return None
+
+  base = path.join(root, name)
+  for file in features:
+    if file in main:
+      target = path.join(base, f"{name}{main[file]}{path.splitext(file)[1]}")
+      plan.append(PlanAction(file=file, action="move", target=target))
+    else:
+      plan.append(PlanAction(file=file, action="skip"))
+
+  disc_suffixes = {_disc(file): suffix for file, suffix in main.items()}
+  sub_targets: dict[str, list[str]] = {}
+  unresolved_subs = []
+  for file in subs:
+    language = subtitle_language_suffix(file)
+    # single feature subtitles belong to it, multi-disc ones need their disc number.
+    suffix = "" if len(main) == 1 else disc_suffixes.get(_disc(file))
+    if language and suffix is not None and not _is_extra(file):
+      target = path.join(base, f"{name}{suffix}.{language}{path.splitext(file)[1]}")
+      sub_targets.setdefault(target, []).append(file)
+    else:
+      unresolved_subs.append(file)
+
+  for target, files in sub_targets.items():
+    if len(files) > 1:
+      unresolved_subs.extend(files)
+    else:
+      plan.append(PlanAction(file=files[0], action="move", target=target))
+
+  return plan, unresolved_subs
+
+
+async def move(dir: str, req: PlanRequestWithCategory) -> Tuple[MoverResponse, RunUsage]:
   targer_dir = (
     TargetDir.anim_movie if req.movie.is_anim == SimpleAgentResponseResult.yes else TargetDir.movie
   )
   Language = req.movie.language
-  a = agent(targer_dir, Language)
-  res = await a.run(req.model_dump_json())
-  return res.output, res.usage()
+
+  local = local_plan(dir, req, language_root(targer_dir, Language))
+  if local is None:
+    a = agent(targer_dir, Language)
+    res = await a.run(req.model_dump_json())
+    emit_plan_actions(res.output.plan)
+    return res.output, res.usage()
+
+  plan, subs = local
+  emit_plan_actions(plan)
+  usage = RunUsage()
+  if subs:
+    video_plan = MoverResponse(plan=[action for action in plan if action.action == "move"])
+    subtitle_res, subtitle_usage = await subtitle_move(dir, subs, video_plan)
+    plan.extend(subtitle_res.plan)
+    emit_plan_actions(subtitle_res.plan)
+    usage.incr(subtitle_usage)
+
+  order = {file: i for i, file in enumerate(req.request.files)}
+  plan.sort(key=lambda action: order.get(action.file, len(order)))
+  return MoverResponse(plan=plan), usage
 
 
 if __name__ == "__main__":
@@ -102,6 +282,6 @@ if __name__ == "__main__":
       ),
     )
 
-    res, usage = asyncio.run(move(req))
+    res, usage = asyncio.run(move("", req))
     print(f"output: ${res}")
     print(f"usage: {usage}")
@@ -1,4 +1,10 @@
+import json
+
 import pytest
+from pydantic_ai import Agent, ToolOutput
+from pydantic_ai.messages import ModelMessage, ModelResponse, ToolCallPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from pydantic_ai.usage import RunUsage
 
 from ..ai import model, setupLogfire
 from ..categorizer.models import IsMovieResponse, PlanRequestWithCategory
@@ -10,6 +16,7 @@ from ..models import (
   PlanRequest,
   SimpleAgentResponseResult,
 )
+from . import movie_mover
 from .movie_mover import move
 
 
@@ -39,7 +46,7 @@ async def test_movie_mover_agent():
     ),
   )
 
-  res, usage = await move(req)
+  res, usage = await move("", req)
   want = MoverResponse(
     plan=[
       PlanAction(
@@ -65,3 +72,135 @@ async def test_movie_mover_agent():
 
   assert res == want
   assert usage is not None
+
+
+def _movie_request(files: list[str]) -> PlanRequestWithCategory:
+  return PlanRequestWithCategory(
+    request=PlanRequest(files=files),
+    category=Category.movie,
+    movie=IsMovieResponse(
+      is_movie=SimpleAgentResponseResult.yes,
+      is_anim=SimpleAgentResponseResult.no,
+      movie_name="The Mad Phoenix",
+      movie_name_in_chinese="南海十三郎",
+      release_year=1997,
+      language=Language.Chinese,
+      reason="metadata from tmdb",
+    ),
+  )
+
+
+class FakeAgents:
+  def __init__(self, monkeypatch):
+    self.agent_files: list[list[str]] = []
+    self.subtitle_files: list[list[str]] = []
+
+    def answer(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+      files = json.loads(messages[-1].parts[-1].content)["request"]["files"]
+      self.agent_files.append(files)
+      plan = MoverResponse(plan=[PlanAction(file=f, action="skip") for f in files])
+      return ModelResponse(parts=[ToolCallPart(info.output_tools[0].name, plan.model_dump())])
+
+    async def fake_subtitle_move(dir, files, video_move_plan):
+      self.subtitle_files.append(files)
+      return MoverResponse(plan=[PlanAction(file=f, action="skip") for f in files]), RunUsage()
+
+    fake = Agent(FunctionModel(answer), output_type=ToolOutput(MoverResponse))
+    monkeypatch.setattr(movie_mover, "agent", lambda target_dir, language: fake)
+    monkeypatch.setattr(movie_mover, "subtitle_move", fake_subtitle_move)
+
+
+@pytest.mark.asyncio
+async def test_movie_mover_single_feature(monkeypatch):
+  """Test that a single movie with junk is planned without the agent."""
+  agents = FakeAgents(monkeypatch)
+  files = [
+    "The.Mad.Phoenix.1997/The.Mad.Phoenix.1997.mkv",
+    "The.Mad.Phoenix.1997/The.Mad.Phoenix.en.ass",
+    "The.Mad.Phoenix.1997/The.Mad.Phoenix.ass",
+    "The.Mad.Phoenix.1997/cover.jpg",
+    "The.Mad.Phoenix.1997/behind the scenes.mp4.part",
+    "The.Mad.Phoenix.1997/Sample/sample.mkv",
+  ]
+
+  res, usage = await move("", _movie_request(files))
+
+  base = "movie/chinese/南海十三郎 (1997)/南海十三郎 (1997)"
+  assert res == MoverResponse(
+    plan=[
+      PlanAction(file=files[0], action="move", target=f"{base}.mkv"),
+      PlanAction(file=files[1], action="move", target=f"{base}.English.eng.ass"),
+      PlanAction(file=files[2], action="skip"),
+      PlanAction(file=files[3], action="skip"),
+      PlanAction(file=files[4], action="skip"),
+      PlanAction(file=files[5], action="skip"),
+    ]
+  )
+  assert agents.agent_files == []
+  assert agents.subtitle_files == [[files[2]]]
+  assert usage.requests == 0
+
+
+@pytest.mark.asyncio
+async def test_movie_mover_multi_disc(monkeypatch):
+  """Test that CD1/CD2 parts become -cdN files of the same movie."""
+  agents = FakeAgents(monkeypatch)
+  files = ["M/movie.cd1.avi", "M/movie.cd2.avi", "M/movie.cd2.chs.srt"]
+
+  res, _ = await move("", _movie_request(files))
+
+  base = "movie/chinese/南海十三郎 (1997)/南海十三郎 (1997)"
+  assert res == MoverResponse(
+    plan=[
+      PlanAction(file=files[0], action="move", target=f"{base}-cd1.avi"),
+      PlanAction(file=files[1], action="move", target=f"{base}-cd2.avi"),
+      PlanAction(file=files[2], action="move", target=f"{base}-cd2.简体中文.chi.srt"),
+    ]
+  )
+  assert agents.agent_files == []
+
+
+@pytest.mark.asyncio
+async def test_movie_mover_parts_go_to_agent(monkeypatch):
+  """Test that Part 1/Part 2 movies, or discs with different names, are left to the agent."""
+  agents = FakeAgents(monkeypatch)
+  files = [
+    "HP/Harry.Potter.and.the.Deathly.Hallows.Part.1.2010.mkv",
+    "HP/Harry.Potter.and.the.Deathly.Hallows.Part.2.2011.mkv",
+  ]
+  await move("", _movie_request(files))
+
+  discs = ["M/movie.2010.cd1.avi", "M/movie.2011.cd2.avi"]
+  await move("", _movie_request(discs))
+
+  assert agents.agent_files == [files, discs]
+
+
+@pytest.mark.asyncio
+async def test_movie_mover_main_feature_by_size(tmp_path, monkeypatch):
+  """Test that the largest video is the movie when it dominates the others."""
+  agents = FakeAgents(monkeypatch)
+  monkeypatch.setenv("DOWNLOAD_COMPLETED_DIR", str(tmp_path))
+  (tmp_path / "d").mkdir()
+  (tmp_path / "d" / "movie.mkv").write_bytes(b"x" * 3000)
+  (tmp_path / "d" / "clip.mp4").write_bytes(b"x" * 100)
+
+  res, _ = await move("d", _movie_request(["movie.mkv", "clip.mp4"]))
+
+  assert [(a.file, a.action) for a in res.plan] == [("movie.mkv", "move"), ("clip.mp4", "skip")]
+  assert agents.agent_files == []
+
+
+@pytest.mark.asyncio
+async def test_movie_mover_ambiguous_goes_to_agent(tmp_path, monkeypatch):
+  """Test that several movies of similar size are left to the agent."""
+  agents = FakeAgents(monkeypatch)
+  monkeypatch.setenv("DOWNLOAD_COMPLETED_DIR", str(tmp_path))
+  (tmp_path / "d").mkdir()
+  (tmp_path / "d" / "a.mkv").write_bytes(b"x" * 3000)
+  (tmp_path / "d" / "b.mkv").write_bytes(b"x" * 2000)
+  files = ["a.mkv", "b.mkv", "a.srt"]
+
+  await move("d", _movie_request(files))
+
+  assert agents.agent_files == [files]
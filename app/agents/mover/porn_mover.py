@@ -4,6 +4,7 @@ from typing import Tuple
 from pydantic_ai import RunUsage
 
 from ..categorizer.models import PlanRequestWithCategory
+from ..events import emit_plan_actions
 from ..models import MoverResponse, PlanAction, SimpleAgentResponseResult, TargetDir
 from .subtitle_mover import move as subtitle_move
 from .utils import filter_video_files_sub_files_and_others
@@ -31,12 +32,17 @@ async def move(dir: str, req: PlanRequestWithCategory) -> Tuple[MoverResponse, R
       PlanAction(file=file, action="move", target=path.join(target_dir, name, f"{name}{ext}"))
     )
 
-  _, subfiles, others = filter_video_files_sub_files_and_others(req.request.files)
+  emit_plan_actions(result.plan)
+
+  videos, subfiles, others = filter_video_files_sub_files_and_others(req.request.files)
+  # videos the categorizer has no answer for, e.g. timed out, are kept in place.
+  others = [file for file in videos if file not in req.porn.porns] + others
 
   # Handle subtitle files
   if subfiles:
     subtitle_response, subtitle_usage = await subtitle_move(dir, subfiles, result)
     result.plan.extend(subtitle_response.plan)
+    emit_plan_actions(subtitle_response.plan)
     total_usage.incr(subtitle_usage)
 
   # Handle other files (set to skip)
@@ -22,12 +22,12 @@ async def run_mover(
     return simple_move_plan(categorizer_res), usage
 
   if cat == Category.movie:
-    res, move_usage = await movie_move(categorizer_res)
+    res, move_usage = await movie_move(dir, categorizer_res)
     usage.incr(move_usage)
     return PlanResponse(plan=res.plan), usage
 
   if cat == Category.tv_series:
-    res, move_usage = await tv_series_move(categorizer_res)
+    res, move_usage = await tv_series_move(dir, categorizer_res)
     usage.incr(move_usage)
     return PlanResponse(plan=res.plan), usage
 
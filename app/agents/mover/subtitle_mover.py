@@ -8,6 +8,7 @@ from pydantic_ai.usage import RunUsage
 
 from ..ai import model
 from ..models import MoverResponse
+from ..registry import registered_agent
 
 
 class SubtitleFileWithContent(BaseModel):
@@ -74,7 +75,7 @@ Specifics:
 """
 
 
-def agent() -> Agent:
+def _build_agent() -> Agent:
   return Agent(
     name="subtitle_mover",
     model=model(),
@@ -83,6 +84,10 @@ def agent() -> Agent:
   )
 
 
+def agent() -> Agent:
+  return registered_agent("subtitle_mover", _build_agent)
+
+
 async def move(
   dir: str, files: list[str], video_move_plan: MoverResponse
 ) -> Tuple[MoverResponse, RunUsage]:
@@ -6,7 +6,23 @@ from pydantic_ai.usage import RunUsage
 
 from ..ai import model, setupLogfire
 from ..categorizer.models import PlanRequestWithCategory
-from ..models import Category, Language, MoverResponse, SimpleAgentResponseResult, TargetDir
+from ..events import emit_plan_actions
+from ..models import (
+  Category,
+  Language,
+  MoverResponse,
+  PlanAction,
+  SimpleAgentResponseResult,
+  TargetDir,
+)
+from ..registry import registered_agent
+from .episode_parser import Episode, parse_episode
+from .subtitle_mover import move as subtitle_move
+from .utils import (
+  filter_video_files_sub_files_and_others,
+  language_root,
+  subtitle_language_suffix,
+)
 
 
 def _build_instruction(target_dir: TargetDir, language: Language) -> str:
@@ -50,10 +66,10 @@ Specifics:
    - If the file doesn't match the provided TV series or is an extra, `"action": "skip"`.
    - If multiple series detected, separate into logical groups.
 ```
-""".replace("$PATH$", path.join(target_dir.name, language.name))
+""".replace("$PATH$", language_root(target_dir, language))
 
 
-def agent(target_dir: TargetDir, language: Language) -> Agent:
+def _build_agent(target_dir: TargetDir, language: Language) -> Agent:
   return Agent(
     name="tv_series_mover",
     model=model(),
@@ -62,16 +78,119 @@ def agent(target_dir: TargetDir, language: Language) -> Agent:
   )
 
 
-async def move(req: PlanRequestWithCategory) -> Tuple[MoverResponse, RunUsage]:
+def agent(target_dir: TargetDir, language: Language) -> Agent:
+  return registered_agent(
+    "tv_series_mover", lambda: _build_agent(target_dir, language), target_dir, language
+  )
+
+
+def _series_name(req: PlanRequestWithCategory) -> str | None:
+  tv = req.tv_series
+  name = tv.tv_series_name_in_chinese or tv.tv_series_name
+  if not name:
+    return None
+  name = name.replace("/", " ").strip()
+  if tv.the_first_season_release_year:
+    return f"{name} ({tv.the_first_season_release_year})"
+  return name
+
+
+def local_plan(
+  req: PlanRequestWithCategory, root: str
+) -> Tuple[list[PlanAction], list[str], list[str]]:
+  """
+  Plan files whose season and episode can be parsed, without asking the agent.
+
+  Args:
+      req: request with tv series information
+      root: target_dir/language folder
+
+  Returns:
+      Tuple[list[PlanAction], list[str], list[str]]:
+          - plan for parsed videos, subtitles of known language paired with them, and others
+            (skip)
+          - videos left to the agent: unparsable or more than one file for the same episode
+          - subtitles left to the subtitle mover
+  """
+  videos, subs, others = filter_video_files_sub_files_and_others(req.request.files)
+  plan = [PlanAction(file=file, action="skip") for file in others]
+
+  series = _series_name(req)
+  if not series:
+    return plan, videos, subs
+
+  by_tag: dict[str, list[tuple[str, Episode]]] = {}
+  unresolved_videos = []
+  for file in videos:
+    episode = parse_episode(file)
+    if episode:
+      by_tag.setdefault(episode.tag(), []).append((file, episode))
+    else:
+      unresolved_videos.append(file)
+
+  # episode tag to target path without extension, e.g. .../Season 02/Series (2000) S02E01
+  targets: dict[str, str] = {}
+  for tag, files in by_tag.items():
+    if len(files) > 1:
+      unresolved_videos.extend(file for file, _ in files)
+      continue
+    file, episode = files[0]
+    base = path.join(root, series, f"Season {episode.season:02d}", f"{series} {tag}")
+    targets[tag] = base
+    plan.append(PlanAction(file=file, action="move", target=base + path.splitext(file)[1]))
+
+  sub_targets: dict[str, list[str]] = {}
+  unresolved_subs = []
+  for file in subs:
+    episode = parse_episode(file)
+    suffix = subtitle_language_suffix(file)
+    if episode and suffix and episode.tag() in targets:
+      target = f"{targets[episode.tag()]}.{suffix}{path.splitext(file)[1]}"
+      sub_targets.setdefault(target, []).append(file)
+    else:
+      unresolved_subs.append(file)
+
+  for target, files in sub_targets.items():
+    if len(files) > 1:
+      unresolved_subs.extend(files)
+    else:
+      plan.append(PlanAction(file=files[0], action="move", target=target))
+
+  return plan, unresolved_videos, unresolved_subs
+
+
+async def move(dir: str, req: PlanRequestWithCategory) -> Tuple[MoverResponse, RunUsage]:
   target_dir = (
     TargetDir.anim_tv_series
     if req.tv_series.is_anim == SimpleAgentResponseResult.yes
     else TargetDir.tv_series
   )
   language = req.tv_series.language
-  a = agent(target_dir, language)
-  res = await a.run(req.model_dump_json())
-  return res.output, res.usage()
+  usage = RunUsage()
+
+  plan, videos, subs = local_plan(req, language_root(target_dir, language))
+  emit_plan_actions(plan)
+
+  # only files the parser does not understand go to the agent.
+  if videos:
+    agent_req = req.model_copy(update={"request": req.request.model_copy(update={"files": videos})})
+    a = agent(target_dir, language)
+    res = await a.run(agent_req.model_dump_json())
+    usage.incr(res.usage())
+    agent_plan = [action for action in res.output.plan if action.file in videos]
+    plan.extend(agent_plan)
+    emit_plan_actions(agent_plan)
+
+  if subs:
+    video_plan = MoverResponse(plan=[action for action in plan if action.action == "move"])
+    subtitle_res, subtitle_usage = await subtitle_move(dir, subs, video_plan)
+    plan.extend(subtitle_res.plan)
+    emit_plan_actions(subtitle_res.plan)
+    usage.incr(subtitle_usage)
+
+  order = {file: i for i, file in enumerate(req.request.files)}
+  plan.sort(key=lambda action: order.get(action.file, len(order)))
+  return MoverResponse(plan=plan), usage
 
 
 if __name__ == "__main__":
@@ -105,6 +224,6 @@ if __name__ == "__main__":
       ),
     )
 
-    res, usage = asyncio.run(move(req))
+    res, usage = asyncio.run(move("", req))
     print(f"output: ${res}")
     print(f"usage: {usage}")
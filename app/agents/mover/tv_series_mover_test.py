@@ -1,4 +1,10 @@
+import json
+
 import pytest
+from pydantic_ai import Agent, ToolOutput
+from pydantic_ai.messages import ModelMessage, ModelResponse, ToolCallPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from pydantic_ai.usage import RunUsage
 
 from ..ai import model, setupLogfire
 from ..categorizer.models import IsTVSeriesResponse, PlanRequestWithCategory
@@ -10,6 +16,7 @@ from ..models import (
   PlanRequest,
   SimpleAgentResponseResult,
 )
+from . import tv_series_mover
 from .tv_series_mover import move
 
 
@@ -40,7 +47,7 @@ async def test_tv_series_mover_agent():
     ),
   )
 
-  res, usage = await move(req)
+  res, usage = await move("", req)
   want = MoverResponse(
     plan=[
       PlanAction(
@@ -70,3 +77,96 @@ async def test_tv_series_mover_agent():
   )
   assert res == want
   assert usage is not None
+
+
+def _tv_request(files: list[str]) -> PlanRequestWithCategory:
+  return PlanRequestWithCategory(
+    request=PlanRequest(files=files),
+    category=Category.tv_series,
+    tv_series=IsTVSeriesResponse(
+      is_tv_series=SimpleAgentResponseResult.yes,
+      is_anim=SimpleAgentResponseResult.no,
+      tv_series_name="My Date with a Vampire",
+      tv_series_name_in_chinese="我和僵尸有个约会",
+      the_first_season_release_year=1998,
+      language=Language.Chinese,
+      reason="metadata from tmdb",
+    ),
+  )
+
+
+@pytest.mark.asyncio
+async def test_tv_series_mover_local_plan(monkeypatch):
+  """Test that parsable files are planned locally and only the rest goes to the agents."""
+  agent_files: list[list[str]] = []
+  subtitle_files: list[list[str]] = []
+
+  def answer(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+    files = json.loads(messages[-1].parts[-1].content)["request"]["files"]
+    agent_files.append(files)
+    plan = MoverResponse(plan=[PlanAction(file=f, action="skip") for f in files])
+    return ModelResponse(parts=[ToolCallPart(info.output_tools[0].name, plan.model_dump())])
+
+  async def fake_subtitle_move(dir, files, video_move_plan):
+    subtitle_files.append(files)
+    return MoverResponse(plan=[PlanAction(file=f, action="skip") for f in files]), RunUsage()
+
+  fake = Agent(FunctionModel(answer), output_type=ToolOutput(MoverResponse))
+  monkeypatch.setattr(tv_series_mover, "agent", lambda target_dir, language: fake)
+  monkeypatch.setattr(tv_series_mover, "subtitle_move", fake_subtitle_move)
+
+  d = "My.Date.with.a.Vampire.Season.02.2000"
+  files = [
+    f"{d}/My.Date.with.a.Vampire.Season.02.2000.EP1.mkv",
+    f"{d}/My.Date.with.a.Vampire.Season.02.2000.EP2.mkv",
+    f"{d}/My.Date.with.a.Vampire.Season.02.2000.EP1.en.ass",
+    f"{d}/My.Date.with.a.Vampire.Season.02.2000.EP2.ass",
+    f"{d}/behind the scenes.mp4",
+    f"{d}/cover.jpg",
+  ]
+  res, usage = await move("", _tv_request(files))
+
+  season = "tv_series/chinese/我和僵尸有个约会 (1998)/Season 02"
+  assert res == MoverResponse(
+    plan=[
+      PlanAction(
+        file=files[0], action="move", target=f"{season}/我和僵尸有个约会 (1998) S02E01.mkv"
+      ),
+      PlanAction(
+        file=files[1], action="move", target=f"{season}/我和僵尸有个约会 (1998) S02E02.mkv"
+      ),
+      PlanAction(
+        file=files[2],
+        action="move",
+        target=f"{season}/我和僵尸有个约会 (1998) S02E01.English.eng.ass",
+      ),
+      PlanAction(file=files[3], action="skip"),
+      PlanAction(file=files[4], action="skip"),
+      PlanAction(file=files[5], action="skip"),
+    ]
+  )
+  # the subtitle without language and the video without episode number.
+  assert subtitle_files == [[files[3]]]
+  assert agent_files == [[files[4]]]
+  assert usage.requests == 1
+
+
+@pytest.mark.asyncio
+async def test_tv_series_mover_duplicate_episodes_go_to_agent(monkeypatch):
+  """Test that two files of the same episode are not planned locally."""
+  agent_files: list[list[str]] = []
+
+  def answer(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+    files = json.loads(messages[-1].parts[-1].content)["request"]["files"]
+    agent_files.append(files)
+    plan = MoverResponse(plan=[PlanAction(file=f, action="skip") for f in files])
+    return ModelResponse(parts=[ToolCallPart(info.output_tools[0].name, plan.model_dump())])
+
+  fake = Agent(FunctionModel(answer), output_type=ToolOutput(MoverResponse))
+  monkeypatch.setattr(tv_series_mover, "agent", lambda target_dir, language: fake)
+
+  files = ["Show.S01E01.720p.mkv", "Show.S01E01.1080p.mkv", "Show.S01E02.1080p.mkv"]
+  res, _ = await move("", _tv_request(files))
+
+  assert agent_files == [files[:2]]
+  assert [a.action for a in res.plan] == ["skip", "skip", "move"]
@@ -1,7 +1,8 @@
+import re
 from os import path
 from typing import Tuple
 
-from ..models import SUB_EXT, VIDEO_EXT
+from ..models import SUB_EXT, VIDEO_EXT, Language, TargetDir
 
 
 def filter_video_files_sub_files_and_others(
@@ -19,3 +20,49 @@ def filter_video_files_sub_files_and_others(
     else:
       others.append(file)
   return video_files, sub_files, others
+
+
+def language_root(target_dir: TargetDir, language: Language) -> str:
+  """Folder of a language in a target dir, e.g. movie/chinese."""
+  return path.join(target_dir.name, language.name.lower())
+
+
+_SUB_LANGUAGE_TAGS = {
+  "简体中文.chi": {
+    "zh",
+    "chs",
+    "cht",
+    "sc",
+    "tc",
+    "chi",
+    "zho",
+    "chn",
+    "gb",
+    "big5",
+    "chinese",
+    "简体",
+    "繁体",
+    "繁體",
+    "简中",
+    "繁中",
+    "中文",
+    "中字",
+  },
+  "English.eng": {"en", "eng", "english"},
+  "日本語.jpn": {"ja", "jp", "jpn", "japanese", "日本語", "日语"},
+}
+
+
+def subtitle_language_suffix(file: str) -> str | None:
+  """
+  Jellyfin language suffix of a subtitle from its file name, e.g. "English.eng" for "x.en.srt".
+
+  Only the last tokens of the name are checked. Returns None if no or more than one language is
+  found (e.g. "chs&eng"), the content is needed to tell.
+  """
+  stem = path.splitext(path.basename(file))[0]
+  tokens = [t.lower() for t in re.split(r"[ ._\-\[\]()&+]+", stem) if t][-3:]
+  found = {suffix for suffix, tags in _SUB_LANGUAGE_TAGS.items() if tags.intersection(tokens)}
+  if len(found) != 1:
+    return None
+  return found.pop()
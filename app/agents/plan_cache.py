@@ -0,0 +1,72 @@
+import hashlib
+import json
+import os
+
+from .models import PlanRequest, PlanResponse
+from .utils.cache import TTLCache
+
+# Bump when agent prompts or planning rules change, so older plans are no longer served.
+PROMPT_VERSION = "1"
+
+_cache: TTLCache | None = None
+
+
+def plan_cache() -> TTLCache:
+  global _cache
+  if _cache is None:
+    _cache = TTLCache(
+      "plans",
+      ttl=float(os.getenv("PLAN_CACHE_TTL", str(7 * 24 * 3600))),
+      max_entries=int(os.getenv("PLAN_CACHE_SIZE", "256")),
+      path=os.getenv("PLAN_CACHE_FILE") or None,
+      max_rows=int(os.getenv("PLAN_CACHE_MAX_ROWS", "10000")),
+    )
+  return _cache
+
+
+def close_plan_cache():
+  global _cache
+  if _cache:
+    _cache.close()
+    _cache = None
+
+
+def plan_cache_key(dir: str, req: PlanRequest) -> str:
+  """
+  Content hash of a plan request.
+
+  Files are normalized (path separators, order and duplicates) so a retry listing the same files
+  differently still hits. Model name and PROMPT_VERSION are part of the key.
+  """
+  files = sorted({f.strip().replace("\\", "/") for f in req.files})
+  content = json.dumps(
+    {
+      "dir": dir,
+      "files": files,
+      "metadata": req.metadata or {},
+      "model": os.getenv("MODEL"),
+      "prompt_version": PROMPT_VERSION,
+    },
+    sort_keys=True,
+    ensure_ascii=False,
+    default=str,
+  )
+  return hashlib.sha256(content.encode()).hexdigest()
+
+
+def get_cached_plan(key: str) -> PlanResponse | None:
+  cached = plan_cache().get(key)
+  if cached is None:
+    return None
+  return PlanResponse.model_validate(cached)
+
+
+def put_cached_plan(key: str, resp: PlanResponse):
+  # failed and empty plans are retried rather than served again.
+  if resp.error or not resp.plan:
+    return
+  plan_cache().set(key, resp.model_dump(mode="json"))
+
+
+def invalidate_cached_plan(key: str):
+  plan_cache().delete(key)
@@ -0,0 +1,274 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Literal
+
+from pydantic import BaseModel
+
+from .ai import setupLogfireForStdLog
+from .models import APIPlanRequest, PlanRequest, PlanResponse
+from .plan_cache import plan_cache_key
+
+setupLogfireForStdLog()
+_LOGGER = logging.getLogger(__name__)
+
+# seconds idle workers wait before looking for due retries
+_POLL_INTERVAL = 1.0
+
+PlanJobStatus = Literal["queued", "running", "done", "failed"]
+
+
+class PlanJob(BaseModel):
+  id: str
+  dir: str
+  status: PlanJobStatus
+  # planning attempts so far, including the running one
+  attempts: int
+  request: APIPlanRequest
+  result: PlanResponse | None = None
+  # error of the last failed attempt
+  error: str | None = None
+  created_at: float
+  updated_at: float
+
+
+_COLUMNS = "id, dir, status, attempts, request, result, error, created_at, updated_at"
+
+
+def _job(row: tuple) -> PlanJob:
+  id, dir, status, attempts, request, result, error, created_at, updated_at = row
+  return PlanJob(
+    id=id,
+    dir=dir,
+    status=status,
+    attempts=attempts,
+    request=APIPlanRequest.model_validate_json(request),
+    result=PlanResponse.model_validate_json(result) if result else None,
+    error=error,
+    created_at=created_at,
+    updated_at=updated_at,
+  )
+
+
+class PlanQueue:
+  """
+  Durable queue of plan jobs in SQLite, planned by a pool of workers.
+
+  There is one job per download dir: submitting a dir again returns its job unless the files or
+  metadata changed, the job failed, or invalidate_cache is set. A job a restart interrupted is
+  planned again. Failed attempts are retried with exponential backoff, finished jobs are kept for
+  keep_seconds.
+  """
+
+  def __init__(
+    self,
+    path: str,
+    plan: Callable[[APIPlanRequest], Awaitable[PlanResponse]],
+    workers: int = 2,
+    max_attempts: int = 3,
+    retry_delay: float = 30,
+    keep_seconds: float = 7 * 24 * 3600,
+    clock: Callable[[], float] = time.time,
+  ):
+    self._plan = plan
+    self._workers = max(1, workers)
+    self._max_attempts = max(1, max_attempts)
+    self._retry_delay = retry_delay
+    self._keep_seconds = keep_seconds
+    self._clock = clock
+    self._lock = threading.Lock()
+    self._tasks: list[asyncio.Task] = []
+    self._wake: asyncio.Event | None = None
+
+    if os.path.dirname(path):
+      os.makedirs(os.path.dirname(path), exist_ok=True)
+    self._db = sqlite3.connect(path, check_same_thread=False)
+    self._db.execute("PRAGMA journal_mode=WAL")
+    self._db.execute(
+      "CREATE TABLE IF NOT EXISTS plan_jobs ("
+      "id TEXT PRIMARY KEY, dir TEXT NOT NULL UNIQUE, key TEXT NOT NULL, status TEXT NOT NULL, "
+      "attempts INTEGER NOT NULL, request TEXT NOT NULL, result TEXT, error TEXT, "
+      "run_after REAL NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+    )
+    self._db.execute("CREATE INDEX IF NOT EXISTS plan_jobs_due ON plan_jobs (status, run_after)")
+    self._db.commit()
+
+  async def start(self):
+    # nothing runs yet, so running jobs were interrupted by a restart.
+    with self._lock:
+      self._db.execute("UPDATE plan_jobs SET status = 'queued' WHERE status = 'running'")
+      self._db.commit()
+    self._wake = asyncio.Event()
+    self._tasks = [asyncio.create_task(self._work()) for _ in range(self._workers)]
+
+  async def close(self):
+    for task in self._tasks:
+      task.cancel()
+    await asyncio.gather(*self._tasks, return_exceptions=True)
+    self._tasks = []
+    with self._lock:
+      self._db.close()
+
+  async def submit(self, request: APIPlanRequest) -> PlanJob:
+    job = await asyncio.to_thread(self._submit, request)
+    if self._wake and job.status == "queued":
+      self._wake.set()
+    return job
+
+  def get(self, id: str) -> PlanJob | None:
+    with self._lock:
+      row = self._db.execute(f"SELECT {_COLUMNS} FROM plan_jobs WHERE id = ?", (id,)).fetchone()
+    return _job(row) if row else None
+
+  def for_dir(self, dir: str) -> PlanJob | None:
+    with self._lock:
+      row = self._db.execute(f"SELECT {_COLUMNS} FROM plan_jobs WHERE dir = ?", (dir,)).fetchone()
+    return _job(row) if row else None
+
+  def _submit(self, request: APIPlanRequest) -> PlanJob:
+    key = plan_cache_key(request.dir, PlanRequest(files=request.files, metadata=request.metadata))
+    now = self._clock()
+    with self._lock:
+      self._prune(now)
+      row = self._db.execute("SELECT id, key, status FROM plan_jobs WHERE dir = ?", (request.dir,))
+      row = row.fetchone()
+      if row:
+        id, old_key, status = row
+        same = old_key == key and status != "failed"
+        if same and (status == "running" or not request.invalidate_cache):
+          return self._get_locked(id)
+        self._db.execute("DELETE FROM plan_jobs WHERE id = ?", (id,))
+
+      id = uuid.uuid4().hex
+      self._db.execute(
+        "INSERT INTO plan_jobs (id, dir, key, status, attempts, request, run_after, created_at, "
+        "updated_at) VALUES (?, ?, ?, 'queued', 0, ?, ?, ?, ?)",
+        (id, request.dir, key, request.model_dump_json(), now, now, now),
+      )
+      self._db.commit()
+      return self._get_locked(id)
+
+  def _get_locked(self, id: str) -> PlanJob:
+    row = self._db.execute(f"SELECT {_COLUMNS} FROM plan_jobs WHERE id = ?", (id,)).fetchone()
+    return _job(row)
+
+  def _prune(self, now: float):
+    self._db.execute(
+      "DELETE FROM plan_jobs WHERE status IN ('done', 'failed') AND updated_at < ?",
+      (now - self._keep_seconds,),
+    )
+
+  def _claim(self) -> PlanJob | None:
+    """Mark the oldest due job running."""
+    now = self._clock()
+    with self._lock:
+      row = self._db.execute(
+        "SELECT id FROM plan_jobs WHERE status = 'queued' AND run_after <= ? "
+        "ORDER BY created_at LIMIT 1",
+        (now,),
+      ).fetchone()
+      if row is None:
+        return None
+      self._db.execute(
+        "UPDATE plan_jobs SET status = 'running', attempts = attempts + 1, updated_at = ? "
+        "WHERE id = ?",
+        (now, row[0]),
+      )
+      self._db.commit()
+      return self._get_locked(row[0])
+
+  def _finish(self, job: PlanJob, result: PlanResponse):
+    with self._lock:
+      self._db.execute(
+        "UPDATE plan_jobs SET status = 'done', result = ?, error = NULL, updated_at = ? "
+        "WHERE id = ?",
+        (result.model_dump_json(), self._clock(), job.id),
+      )
+      self._db.commit()
+
+  def _fail(self, job: PlanJob, error: str):
+    now = self._clock()
+    if job.attempts >= self._max_attempts:
+      status, run_after = "failed", now
+    else:
+      status, run_after = "queued", now + self._retry_delay * 2 ** (job.attempts - 1)
+    with self._lock:
+      self._db.execute(
+        "UPDATE plan_jobs SET status = ?, error = ?, run_after = ?, updated_at = ? WHERE id = ?",
+        (status, error, run_after, now, job.id),
+      )
+      self._db.commit()
+
+  async def _work(self):
+    while True:
+      try:
+        await self._work_once()
+      except Exception:
+        # e.g. the database is locked or full, the worker keeps going.
+        _LOGGER.exception("plan queue worker failed, retrying")
+        await asyncio.sleep(_POLL_INTERVAL)
+
+  async def _work_once(self):
+    job = await asyncio.to_thread(self._claim)
+    if job is None:
+      try:
+        await asyncio.wait_for(self._wake.wait(), timeout=_POLL_INTERVAL)
+      except TimeoutError:
+        pass
+      self._wake.clear()
+      return
+
+    try:
+      result = await self._plan(job.request)
+    except Exception as e:
+      _LOGGER.exception(f"plan job {job.id} of {job.dir} failed, attempt {job.attempts}")
+      await asyncio.to_thread(self._fail, job, str(e))
+      return
+
+    if result.error:
+      # planning reports some failures in the response instead of raising.
+      _LOGGER.warning(
+        f"plan job {job.id} of {job.dir} failed, attempt {job.attempts}: {result.error}"
+      )
+      await asyncio.to_thread(self._fail, job, result.error)
+    else:
+      await asyncio.to_thread(self._finish, job, result)
+
+
+_queue: PlanQueue | None = None
+
+
+async def start_plan_queue(plan: Callable[[APIPlanRequest], Awaitable[PlanResponse]]):
+  """
+  Start the queue at PLAN_QUEUE_FILE with PLAN_QUEUE_WORKERS workers planning with plan.
+  """
+  global _queue
+  if _queue:
+    return
+  _queue = PlanQueue(
+    os.getenv("PLAN_QUEUE_FILE")
+    or os.path.join(os.getenv("DOWNLOAD_COMPLETED_DIR"), ".organizer_plan_queue.db"),
+    plan,
+    workers=int(os.getenv("PLAN_QUEUE_WORKERS", "2")),
+    max_attempts=int(os.getenv("PLAN_QUEUE_MAX_ATTEMPTS", "3")),
+    retry_delay=float(os.getenv("PLAN_QUEUE_RETRY_DELAY", "30")),
+    keep_seconds=float(os.getenv("PLAN_QUEUE_KEEP", str(7 * 24 * 3600))),
+  )
+  await _queue.start()
+
+
+async def stop_plan_queue():
+  global _queue
+  if _queue:
+    await _queue.close()
+    _queue = None
+
+
+def plan_queue() -> PlanQueue:
+  if _queue is None:
+    raise RuntimeError("plan queue is not started")
+  return _queue
@@ -0,0 +1,170 @@
+import asyncio
+
+import pytest
+
+from .models import APIPlanRequest, PlanAction, PlanResponse
+from .plan_queue import PlanJob, PlanQueue
+
+
+class FakePlanner:
+  """
+  Plans every file as a move, failing the first fail_times calls, the next error_times with an
+  error in the response.
+  """
+
+  def __init__(self, fail_times: int = 0, error_times: int = 0):
+    self.fail_times = fail_times
+    self.error_times = error_times
+    self.calls: list[str] = []
+
+  async def __call__(self, request: APIPlanRequest) -> PlanResponse:
+    self.calls.append(request.dir)
+    if len(self.calls) <= self.fail_times:
+      raise RuntimeError("model unavailable")
+    if len(self.calls) <= self.fail_times + self.error_times:
+      return PlanResponse(error="no category")
+    return PlanResponse(
+      plan=[PlanAction(file=file, action="move", target=f"x/{file}") for file in request.files]
+    )
+
+
+async def _finished(queue: PlanQueue, id: str) -> PlanJob:
+  for _ in range(500):
+    job = queue.get(id)
+    if job.status in ("done", "failed"):
+      return job
+    await asyncio.sleep(0.01)
+  raise TimeoutError(id)
+
+
+def _request(dir: str = "d", files: list[str] | None = None, **kwargs) -> APIPlanRequest:
+  return APIPlanRequest(dir=dir, files=files or ["a.mkv"], **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_plan_queue(tmp_path):
+  """Test that jobs are planned by the workers and a dir is only planned once."""
+  planner = FakePlanner()
+  queue = PlanQueue(str(tmp_path / "queue.db"), planner, workers=2)
+  await queue.start()
+  try:
+    jobs = [await queue.submit(_request(dir)) for dir in ["d1", "d2", "d3"]]
+    assert jobs[0].status == "queued"
+
+    for job in jobs:
+      job = await _finished(queue, job.id)
+      assert job.status == "done"
+      assert job.attempts == 1
+      assert job.result.plan[0].target == "x/a.mkv"
+
+    # same dir and content returns the finished job.
+    again = await queue.submit(_request("d1"))
+    assert again.id == jobs[0].id
+    assert again.status == "done"
+    assert sorted(planner.calls) == ["d1", "d2", "d3"]
+
+    # new files or invalidate_cache plan again.
+    changed = await queue.submit(_request("d1", ["b.mkv"]))
+    assert changed.id != jobs[0].id
+    assert (await _finished(queue, changed.id)).result.plan[0].file == "b.mkv"
+    assert queue.get(jobs[0].id) is None
+    invalidated = await queue.submit(_request("d1", ["b.mkv"], invalidate_cache=True))
+    assert invalidated.id != changed.id
+    await _finished(queue, invalidated.id)
+    assert queue.for_dir("d1").id == invalidated.id
+  finally:
+    await queue.close()
+
+
+@pytest.mark.asyncio
+async def test_plan_queue_retries(tmp_path):
+  """Test that failed attempts are retried until max_attempts."""
+  queue = PlanQueue(str(tmp_path / "queue.db"), FakePlanner(fail_times=1), retry_delay=0)
+  await queue.start()
+  try:
+    job = await _finished(queue, (await queue.submit(_request())).id)
+    assert job.status == "done"
+    assert job.attempts == 2
+    assert job.error is None
+  finally:
+    await queue.close()
+
+  queue = PlanQueue(
+    str(tmp_path / "failing.db"), FakePlanner(fail_times=5), max_attempts=3, retry_delay=0
+  )
+  await queue.start()
+  try:
+    job = await _finished(queue, (await queue.submit(_request())).id)
+    assert job.status == "failed"
+    assert job.attempts == 3
+    assert job.error == "model unavailable"
+
+    # a failed dir is planned again when submitted again.
+    assert (await queue.submit(_request())).id != job.id
+  finally:
+    await queue.close()
+
+
+@pytest.mark.asyncio
+async def test_plan_queue_retries_plans_with_error(tmp_path):
+  """Test that a plan with an error is a failed attempt, and a broken claim does not stop workers."""
+  queue = PlanQueue(
+    str(tmp_path / "queue.db"), FakePlanner(error_times=1), workers=1, retry_delay=0
+  )
+  claim = queue._claim
+  claims = []
+
+  def flaky_claim():
+    claims.append(1)
+    if len(claims) == 1:
+      raise RuntimeError("database is locked")
+    return claim()
+
+  queue._claim = flaky_claim
+  await queue.start()
+  try:
+    job = await _finished(queue, (await queue.submit(_request())).id)
+    assert job.status == "done"
+    assert job.attempts == 2
+    assert job.result.error is None
+  finally:
+    await queue.close()
+
+
+@pytest.mark.asyncio
+async def test_plan_queue_survives_restart(tmp_path):
+  """Test that queued and interrupted jobs are planned after a restart."""
+  path = str(tmp_path / "queue.db")
+  queue = PlanQueue(path, FakePlanner())
+  interrupted = await queue.submit(_request("d1"))
+  queued = await queue.submit(_request("d2"))
+  # a worker took d1 and the process died.
+  assert queue._claim().id == interrupted.id
+  await queue.close()
+
+  planner = FakePlanner()
+  queue = PlanQueue(path, planner)
+  await queue.start()
+  try:
+    assert (await _finished(queue, interrupted.id)).attempts == 2
+    assert (await _finished(queue, queued.id)).status == "done"
+    assert sorted(planner.calls) == ["d1", "d2"]
+  finally:
+    await queue.close()
+
+
+@pytest.mark.asyncio
+async def test_plan_queue_forgets_old_jobs(tmp_path):
+  """Test that finished jobs are dropped keep_seconds after they finished."""
+  now = [1000.0]
+  queue = PlanQueue(
+    str(tmp_path / "queue.db"), FakePlanner(), keep_seconds=60, clock=lambda: now[0]
+  )
+  await queue.start()
+  try:
+    old = await _finished(queue, (await queue.submit(_request("d1"))).id)
+    now[0] += 61
+    await queue.submit(_request("d2"))
+    assert queue.get(old.id) is None
+  finally:
+    await queue.close()
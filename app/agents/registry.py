@@ -0,0 +1,83 @@
+import os
+import threading
+from typing import Callable, Hashable
+
+from pydantic_ai import Agent
+
+_agents: dict[tuple[Hashable, ...], Agent] = {}
+_lock = threading.Lock()
+
+
+def registered_agent(name: str, build: Callable[[], Agent], *key: Hashable) -> Agent:
+  """
+  Return the agent registered for (name, model, *key), building it on first use.
+
+  Agents hold no per-request state: MCP toolsets are passed to `Agent.run(toolsets=...)`, so one
+  agent is shared by all requests.
+
+  Args:
+      name: agent name
+      build: builds the agent when it is not registered yet
+      key: other values the agent is built from, e.g. TargetDir and Language
+  """
+  k = (name, os.getenv("MODEL"), os.getenv("LM_STUDIO_API_BASE"), *key)
+  a = _agents.get(k)
+  if a is None:
+    with _lock:
+      a = _agents.get(k)
+      if a is None:
+        a = build()
+        _agents[k] = a
+  return a
+
+
+def clear_registry():
+  with _lock:
+    _agents.clear()
+
+
+def prebuild_agents() -> int:
+  """Build every agent once, so no request pays for it. Returns the number of agents."""
+  from .categorizer import (
+    decision_maker,
+    is_audio_book,
+    is_bango_porn,
+    is_book,
+    is_movie,
+    is_music,
+    is_music_video,
+    is_photobook,
+    is_porn,
+    is_tv_series,
+  )
+  from .models import Language, TargetDir
+  from .mover import bango_porn_mover, jav_actor, movie_mover, subtitle_mover, tv_series_mover
+  from .replan_with_hints import replan_agent
+
+  for build in [
+    decision_maker.agent,
+    is_audio_book.agent,
+    is_bango_porn.agent,
+    is_bango_porn.batch_agent,
+    is_book.agent,
+    is_movie.agent,
+    is_music.agent,
+    is_music_video.agent,
+    is_photobook.agent,
+    is_porn.agent,
+    is_porn.batch_agent,
+    is_tv_series.agent,
+    bango_porn_mover.mover,
+    jav_actor.alias_agent,
+    subtitle_mover.agent,
+    replan_agent.agent,
+  ]:
+    build()
+
+  for language in Language:
+    for target_dir in [TargetDir.movie, TargetDir.anim_movie]:
+      movie_mover.agent(target_dir, language)
+    for target_dir in [TargetDir.tv_series, TargetDir.anim_tv_series]:
+      tv_series_mover.agent(target_dir, language)
+
+  return len(_agents)
@@ -0,0 +1,47 @@
+from .models import Language, TargetDir
+from .mover import movie_mover
+from .registry import clear_registry, prebuild_agents, registered_agent
+
+
+def test_registered_agent_is_reused(monkeypatch):
+  """Test that an agent is built once per name, model and key."""
+  clear_registry()
+  monkeypatch.setenv("MODEL", "a")
+  built = []
+
+  def build():
+    built.append(1)
+    return object()
+
+  first = registered_agent("x", build, 1)
+  assert registered_agent("x", build, 1) is first
+  assert registered_agent("x", build, 2) is not first
+
+  monkeypatch.setenv("MODEL", "b")
+  assert registered_agent("x", build, 1) is not first
+  assert len(built) == 3
+  clear_registry()
+
+
+def test_mover_agent_keyed_by_target_dir_and_language(monkeypatch):
+  """Test that mover agents with different instructions are different agents."""
+  clear_registry()
+  monkeypatch.setenv("MODEL", "test")
+
+  a = movie_mover.agent(TargetDir.movie, Language.English)
+  assert movie_mover.agent(TargetDir.movie, Language.English) is a
+  assert movie_mover.agent(TargetDir.anim_movie, Language.English) is not a
+  assert movie_mover.agent(TargetDir.movie, Language.Chinese) is not a
+  clear_registry()
+
+
+def test_prebuild_agents(monkeypatch):
+  """Test that prebuilding registers every agent, so later calls do not build."""
+  clear_registry()
+  monkeypatch.setenv("MODEL", "test")
+
+  count = prebuild_agents()
+
+  assert count == prebuild_agents()
+  assert count > len(Language) * 4
+  clear_registry()
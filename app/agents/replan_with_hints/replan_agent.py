@@ -5,6 +5,7 @@ from pydantic_ai.usage import RunUsage
 
 from ..ai import model
 from ..models import MoverResponse, PlanRequest, PlanResponse
+from ..registry import registered_agent
 
 
 def _build_instruction() -> str:
@@ -40,7 +41,7 @@ Specifics:
 """
 
 
-def agent() -> Agent:
+def _build_agent() -> Agent:
   return Agent(
     name="replan_with_hints",
     model=model(),
@@ -49,6 +50,10 @@ def agent() -> Agent:
   )
 
 
+def agent() -> Agent:
+  return registered_agent("replan_with_hints", _build_agent)
+
+
 async def replan(
   request: PlanRequest, previous_response: PlanResponse, user_hint: str
 ) -> Tuple[MoverResponse, RunUsage]:
@@ -2,16 +2,22 @@ from typing import Tuple
 
 from pydantic_ai.usage import RunUsage
 
-from .ai import metadataMcp
 from .categorizer.runner import run_categorizer
+from .events import emit_plan_event
+from .mcp_pool import metadata_mcp_session
 from .models import PlanRequest, PlanResponse
 from .mover.runner import run_mover
 
 
 async def create_plan(dir: str, req: PlanRequest) -> Tuple[PlanResponse, RunUsage]:
-  mcp = metadataMcp()
-  categorizer_res, categorizer_usage = await run_categorizer(req, mcp)
-  mover_res, mover_usage = await run_mover(dir, categorizer_res, mcp)
+  async with metadata_mcp_session() as mcp:
+    categorizer_res, categorizer_usage = await run_categorizer(req, mcp)
+    emit_plan_event(
+      "category",
+      category=categorizer_res.category.name,
+      unknown_reason=categorizer_res.unknown_reason,
+    )
+    mover_res, mover_usage = await run_mover(dir, categorizer_res, mcp)
 
   total_usage = RunUsage()
   total_usage.incr(categorizer_usage)
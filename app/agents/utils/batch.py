@@ -0,0 +1,161 @@
+import json
+import logging
+import os
+from typing import Any, Sequence
+
+from pydantic_ai import Agent, capture_run_messages
+from pydantic_ai.exceptions import UnexpectedModelBehavior
+from pydantic_ai.toolsets import AbstractToolset
+from pydantic_ai.usage import RunUsage
+
+from ..ai import setupLogfireForStdLog
+from ..models import PlanRequest
+from .concurrency import run_per_file, usage_of
+
+setupLogfireForStdLog()
+_LOGGER = logging.getLogger(__name__)
+
+# rough size of one structured answer, the output grows with the chunk as well as the input.
+_OUTPUT_TOKENS_PER_FILE = 150
+
+
+def estimate_tokens(text: str) -> int:
+  """Cheap token estimate: ~4 ascii chars per token, ~1 token per CJK (non-ascii) char."""
+  non_ascii = sum(1 for c in text if ord(c) > 127)
+  return (len(text) - non_ascii) // 4 + non_ascii + 1
+
+
+def chunk_files(
+  files: list[str],
+  metadata: dict[str, Any] | None,
+  max_chunk_size: int,
+  token_budget: int,
+) -> list[tuple[str, ...]]:
+  """
+  Split files into chunks sent in a single agent call.
+
+  Metadata is sent once per chunk, every file costs its path plus its answer. A chunk is closed
+  when adding the next file would exceed token_budget or max_chunk_size. A single file larger
+  than the budget still gets its own chunk.
+  """
+  base = estimate_tokens(json.dumps(metadata or {}, ensure_ascii=False))
+  chunks: list[tuple[str, ...]] = []
+  current: list[str] = []
+  used = base
+
+  for file in files:
+    cost = estimate_tokens(json.dumps(file, ensure_ascii=False)) + _OUTPUT_TOKENS_PER_FILE
+    if current and (len(current) >= max_chunk_size or used + cost > token_budget):
+      chunks.append(tuple(current))
+      current = []
+      used = base
+    current.append(file)
+    used += cost
+
+  if current:
+    chunks.append(tuple(current))
+  return chunks
+
+
+def _match_entries(chunk: tuple[str, ...], entries: dict[str, Any]) -> dict[str, Any]:
+  """Map keys returned by the model back to chunk files, tolerating basename-only keys."""
+  matched = {file: entries[file] for file in chunk if file in entries}
+
+  by_basename: dict[str, list[str]] = {}
+  for file in chunk:
+    by_basename.setdefault(os.path.basename(file), []).append(file)
+
+  for key, value in entries.items():
+    if key in matched:
+      continue
+    candidates = by_basename.get(os.path.basename(key), [])
+    if len(candidates) == 1 and candidates[0] not in matched:
+      matched[candidates[0]] = value
+
+  return matched
+
+
+async def run_file_agent(
+  files: list[str],
+  metadata: dict[str, Any] | None,
+  per_file_agent: Agent,
+  batch_agent: Agent,
+  batch_size: int | None = None,
+  token_budget: int | None = None,
+  toolsets: Sequence[AbstractToolset] | None = None,
+) -> tuple[list[tuple[str, Any | None]], RunUsage]:
+  """
+  Run a per-file detector over files, batching several files per agent call.
+
+  batch_agent must output a model with a `porns` dict keyed by file. Files the batch answer
+  omits or garbles, and files of a batch call that failed or timed out, are retried one by one
+  with per_file_agent.
+
+  Args:
+      files: files to analyze
+      metadata: request metadata, sent with every call
+      per_file_agent: agent answering a PlanRequest with a single file
+      batch_agent: agent answering a PlanRequest with many files
+      batch_size: max files per call, defaults to PORN_DETECTOR_BATCH_SIZE env var. 1 disables
+          batching.
+      token_budget: estimated input+output tokens per call, defaults to
+          PORN_DETECTOR_BATCH_TOKEN_BUDGET env var
+      toolsets: toolsets for every agent call, e.g. the metadata MCP session
+
+  Returns:
+      tuple[list[tuple[str, Any | None]], RunUsage]:
+          - (file, output) in the order of files, output is None if the file timed out
+          - usage of all agent calls
+  """
+  if batch_size is None:
+    batch_size = int(os.getenv("PORN_DETECTOR_BATCH_SIZE", "1"))
+  if token_budget is None:
+    token_budget = int(os.getenv("PORN_DETECTOR_BATCH_TOKEN_BUDGET", "4000"))
+
+  # also counts calls that timed out, see run_per_file.
+  usage = RunUsage()
+  outputs: dict[str, Any | None] = {}
+
+  async def run_single(file: str):
+    return await per_file_agent.run(
+      PlanRequest(files=[file], metadata=metadata).model_dump_json(), toolsets=toolsets
+    )
+
+  async def run_chunk(chunk: tuple[str, ...]):
+    # the messages run_per_file captures for this chunk.
+    with capture_run_messages() as messages:
+      if len(chunk) == 1:
+        res = await run_single(chunk[0])
+        return {chunk[0]: res.output}, res.usage()
+
+      try:
+        res = await batch_agent.run(
+          PlanRequest(files=list(chunk), metadata=metadata).model_dump_json(), toolsets=toolsets
+        )
+      except UnexpectedModelBehavior as e:
+        _LOGGER.warning(f"batch of {len(chunk)} files failed, falling back to per-file: {e}")
+        return {}, usage_of(messages)
+      return _match_entries(chunk, res.output.porns), res.usage()
+
+  chunks = chunk_files(files, metadata, max(1, batch_size), token_budget)
+  for chunk, chunk_res in await run_per_file(chunks, run_chunk, usage=usage):
+    if chunk_res is None:
+      if len(chunk) == 1:
+        outputs[chunk[0]] = None
+      else:
+        _LOGGER.warning(f"batch of {len(chunk)} files timed out, falling back to per-file")
+      continue
+
+    entries, chunk_usage = chunk_res
+    usage.incr(chunk_usage)
+    outputs.update(entries)
+
+  missing = [file for file in files if file not in outputs]
+  if missing:
+    _LOGGER.info(f"{len(missing)} files missing from batch answers, checking them one by one")
+  for file, per_file_res in await run_per_file(missing, run_single, usage=usage):
+    outputs[file] = per_file_res.output if per_file_res else None
+    if per_file_res:
+      usage.incr(per_file_res.usage())
+
+  return [(file, outputs[file]) for file in files], usage
@@ -0,0 +1,174 @@
+import asyncio
+import json
+
+import pytest
+from pydantic_ai import Agent, ToolOutput
+from pydantic_ai.messages import ModelMessage, ModelResponse, ToolCallPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+from ..categorizer.models import BatchIsPornResponse, IsPornResponse
+from ..models import Language, SimpleAgentResponseResult
+from .batch import chunk_files, estimate_tokens, run_file_agent
+
+
+def _porn(name: str) -> IsPornResponse:
+  return IsPornResponse(
+    id=None,
+    is_porn=SimpleAgentResponseResult.yes,
+    is_vr=SimpleAgentResponseResult.no,
+    from_onlyfans=SimpleAgentResponseResult.no,
+    name=name,
+    actors=[],
+    language=Language.English,
+    reason="fake",
+  )
+
+
+class FakeAgents:
+  """Per-file and batch agents answering from the files in the prompt."""
+
+  def __init__(self, batch_answer=None, batch_delay: float = 0):
+    # batch_answer: files -> dict of key -> name or None for an invalid answer, defaults to
+    # answering every file
+    self.batch_answer = batch_answer or (lambda files: {f: f for f in files})
+    self.batch_delay = batch_delay
+    self.single_calls: list[str] = []
+    self.batch_calls: list[list[str]] = []
+
+  def _files(self, messages: list[ModelMessage]) -> list[str]:
+    # the first prompt, retries are appended after it.
+    return json.loads(messages[0].parts[-1].content)["files"]
+
+  def per_file(self) -> Agent:
+    def answer(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+      file = self._files(messages)[0]
+      self.single_calls.append(file)
+      args = _porn(file).model_dump(mode="json")
+      return ModelResponse(parts=[ToolCallPart(info.output_tools[0].name, args)])
+
+    return Agent(FunctionModel(answer), output_type=ToolOutput(IsPornResponse))
+
+  def batch(self) -> Agent:
+    async def answer(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+      files = self._files(messages)
+      self.batch_calls.append(files)
+      await asyncio.sleep(self.batch_delay)
+      answer = self.batch_answer(files)
+      if answer is None:
+        args = {"porns": "garbled"}
+      else:
+        porns = {k: _porn(v) for k, v in answer.items()}
+        args = BatchIsPornResponse(porns=porns).model_dump(mode="json")
+      return ModelResponse(parts=[ToolCallPart(info.output_tools[0].name, args)])
+
+    return Agent(FunctionModel(answer), output_type=ToolOutput(BatchIsPornResponse))
+
+
+def test_estimate_tokens_counts_cjk_per_char():
+  """Test that CJK text is estimated at about one token per char."""
+  assert estimate_tokens("abcd" * 10) == 11
+  assert estimate_tokens("波多野結衣") == 6
+
+
+def test_chunk_files_by_size():
+  """Test that chunks are closed at max_chunk_size."""
+  files = [f"{i}.mp4" for i in range(5)]
+  got = chunk_files(files, {}, max_chunk_size=2, token_budget=100000)
+  assert got == [("0.mp4", "1.mp4"), ("2.mp4", "3.mp4"), ("4.mp4",)]
+
+
+def test_chunk_files_by_token_budget():
+  """Test that chunks are closed when the token budget is used up."""
+  files = [f"{i}.mp4" for i in range(5)]
+  # every file costs its path plus ~150 tokens of answer.
+  got = chunk_files(files, {}, max_chunk_size=100, token_budget=400)
+  assert got == [("0.mp4", "1.mp4"), ("2.mp4", "3.mp4"), ("4.mp4",)]
+
+
+def test_chunk_files_large_metadata_still_progresses():
+  """Test that a file larger than the budget gets a chunk of its own."""
+  got = chunk_files(["a.mp4", "b.mp4"], {"description": "x" * 10000}, 10, 100)
+  assert got == [("a.mp4",), ("b.mp4",)]
+
+
+@pytest.mark.asyncio
+async def test_run_file_agent_batches_files():
+  """Test that files are answered in one batch call, in input order."""
+  agents = FakeAgents()
+  files = ["c.mp4", "a.mp4", "b.mp4"]
+
+  got, usage = await run_file_agent(files, {}, agents.per_file(), agents.batch(), 8, 100000)
+
+  assert [f for f, _ in got] == files
+  assert [o.name for _, o in got] == files
+  assert agents.batch_calls == [files]
+  assert agents.single_calls == []
+  assert usage.requests == 1
+
+
+@pytest.mark.asyncio
+async def test_run_file_agent_falls_back_for_omitted_entries():
+  """Test that only the entries the batch answer omits are checked one by one."""
+  agents = FakeAgents(batch_answer=lambda files: {f: f for f in files if f != "b.mp4"})
+  files = ["a.mp4", "b.mp4", "c.mp4"]
+
+  got, usage = await run_file_agent(files, {}, agents.per_file(), agents.batch(), 8, 100000)
+
+  assert [o.name for _, o in got] == files
+  assert agents.single_calls == ["b.mp4"]
+  assert usage.requests == 2
+
+
+@pytest.mark.asyncio
+async def test_run_file_agent_matches_basename_keys():
+  """Test that keys returned without the directory are matched back to the input path."""
+  agents = FakeAgents(batch_answer=lambda files: {f.split("/")[-1]: f for f in files})
+  files = ["dir/a.mp4", "dir/b.mp4"]
+
+  got, _ = await run_file_agent(files, {}, agents.per_file(), agents.batch(), 8, 100000)
+
+  assert [o.name for _, o in got] == files
+  assert agents.single_calls == []
+
+
+@pytest.mark.asyncio
+async def test_run_file_agent_without_batching():
+  """Test that batch_size 1 keeps one call per file."""
+  agents = FakeAgents()
+  files = ["a.mp4", "b.mp4"]
+
+  got, usage = await run_file_agent(files, {}, agents.per_file(), agents.batch(), 1, 100000)
+
+  assert [o.name for _, o in got] == files
+  assert agents.batch_calls == []
+  assert sorted(agents.single_calls) == files
+  assert usage.requests == 2
+
+
+@pytest.mark.asyncio
+async def test_run_file_agent_retries_failed_batch_per_file():
+  """Test that files of a batch call that failed are checked one by one, counting its usage."""
+  agents = FakeAgents(batch_answer=lambda files: None)
+  files = ["a.mp4", "b.mp4"]
+
+  got, usage = await run_file_agent(files, {}, agents.per_file(), agents.batch(), 8, 100000)
+
+  assert [o.name for _, o in got] == files
+  assert sorted(agents.single_calls) == files
+  # the invalid batch answer and its retry, then one call per file.
+  assert len(agents.batch_calls) == 2
+  assert usage.requests == 4
+
+
+@pytest.mark.asyncio
+async def test_run_file_agent_retries_timed_out_batch_per_file(monkeypatch):
+  """Test that files of a batch call that timed out are checked one by one."""
+  monkeypatch.setenv("PER_FILE_AGENT_TIMEOUT", "0.05")
+  agents = FakeAgents(batch_delay=1)
+  files = ["a.mp4", "b.mp4"]
+
+  got, usage = await run_file_agent(files, {}, agents.per_file(), agents.batch(), 8, 100000)
+
+  assert [o.name for _, o in got] == files
+  assert sorted(agents.single_calls) == files
+  assert usage.requests == 2
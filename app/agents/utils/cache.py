@@ -0,0 +1,143 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+from pydantic import BaseModel
+
+
+class CacheStats(BaseModel):
+  memory_hits: int = 0
+  disk_hits: int = 0
+  misses: int = 0
+
+  @property
+  def hits(self) -> int:
+    return self.memory_hits + self.disk_hits
+
+
+class TTLCache:
+  """
+  Two tier cache for JSON values: an in-process LRU and an optional SQLite file.
+
+  Both tiers honor the entry TTL. The memory tier keeps at most max_entries, the SQLite tier at
+  most max_rows (least recently used rows are dropped first).
+  """
+
+  def __init__(
+    self,
+    name: str,
+    ttl: float,
+    max_entries: int = 256,
+    path: str | None = None,
+    max_rows: int = 10000,
+    clock: Callable[[], float] = time.time,
+  ):
+    self.name = name
+    self.ttl = ttl
+    self.max_entries = max_entries
+    self.max_rows = max_rows
+    self.stats = CacheStats()
+    self._clock = clock
+    self._memory: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+    self._lock = threading.Lock()
+    self._db: sqlite3.Connection | None = None
+
+    if path:
+      if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+      self._db = sqlite3.connect(path, check_same_thread=False)
+      self._db.execute("PRAGMA journal_mode=WAL")
+      self._db.execute(
+        f"CREATE TABLE IF NOT EXISTS {name} ("
+        "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, "
+        "accessed_at REAL NOT NULL)"
+      )
+      self._db.execute(f"CREATE INDEX IF NOT EXISTS {name}_accessed ON {name} (accessed_at)")
+      self._db.commit()
+
+  def get(self, key: str) -> Any | None:
+    now = self._clock()
+    with self._lock:
+      entry = self._memory.get(key)
+      if entry:
+        expires_at, value = entry
+        if expires_at > now:
+          self._memory.move_to_end(key)
+          self.stats.memory_hits += 1
+          return value
+        del self._memory[key]
+
+      if self._db:
+        row = self._db.execute(
+          f"SELECT value, expires_at FROM {self.name} WHERE key = ?", (key,)
+        ).fetchone()
+        if row and row[1] > now:
+          self._db.execute(f"UPDATE {self.name} SET accessed_at = ? WHERE key = ?", (now, key))
+          self._db.commit()
+          value = json.loads(row[0])
+          self._remember(key, row[1], value)
+          self.stats.disk_hits += 1
+          return value
+        if row:
+          self._db.execute(f"DELETE FROM {self.name} WHERE key = ?", (key,))
+          self._db.commit()
+
+      self.stats.misses += 1
+      return None
+
+  def set(self, key: str, value: Any, ttl: float | None = None):
+    now = self._clock()
+    expires_at = now + (self.ttl if ttl is None else ttl)
+    with self._lock:
+      self._remember(key, expires_at, value)
+
+      if self._db:
+        self._db.execute(
+          f"INSERT OR REPLACE INTO {self.name} (key, value, expires_at, accessed_at) "
+          "VALUES (?, ?, ?, ?)",
+          (key, json.dumps(value, ensure_ascii=False), expires_at, now),
+        )
+        self._evict_rows(now)
+        self._db.commit()
+
+  def delete(self, key: str):
+    with self._lock:
+      self._memory.pop(key, None)
+      if self._db:
+        self._db.execute(f"DELETE FROM {self.name} WHERE key = ?", (key,))
+        self._db.commit()
+
+  def clear(self):
+    with self._lock:
+      self._memory.clear()
+      if self._db:
+        self._db.execute(f"DELETE FROM {self.name}")
+        self._db.commit()
+
+  def close(self):
+    with self._lock:
+      if self._db:
+        self._db.close()
+        self._db = None
+
+  def _remember(self, key: str, expires_at: float, value: Any):
+    if self.max_entries <= 0:
+      return
+    self._memory[key] = (expires_at, value)
+    self._memory.move_to_end(key)
+    while len(self._memory) > self.max_entries:
+      self._memory.popitem(last=False)
+
+  def _evict_rows(self, now: float):
+    self._db.execute(f"DELETE FROM {self.name} WHERE expires_at <= ?", (now,))
+    (count,) = self._db.execute(f"SELECT COUNT(*) FROM {self.name}").fetchone()
+    if count > self.max_rows:
+      self._db.execute(
+        f"DELETE FROM {self.name} WHERE key IN "
+        f"(SELECT key FROM {self.name} ORDER BY accessed_at ASC LIMIT ?)",
+        (count - self.max_rows,),
+      )
@@ -0,0 +1,94 @@
+from .cache import TTLCache
+
+
+class FakeClock:
+  def __init__(self):
+    self.now = 1000.0
+
+  def __call__(self) -> float:
+    return self.now
+
+
+def test_cache_memory_hit():
+  """Test that a stored value is served from memory."""
+  cache = TTLCache("t", ttl=10)
+  cache.set("a", {"x": 1})
+
+  assert cache.get("a") == {"x": 1}
+  assert cache.get("b") is None
+  assert cache.stats.memory_hits == 1
+  assert cache.stats.misses == 1
+
+
+def test_cache_ttl_expiry():
+  """Test that entries are not served after their ttl."""
+  clock = FakeClock()
+  cache = TTLCache("t", ttl=10, clock=clock)
+  cache.set("a", 1)
+  cache.set("b", 2, ttl=100)
+
+  clock.now += 11
+
+  assert cache.get("a") is None
+  assert cache.get("b") == 2
+
+
+def test_cache_lru_eviction():
+  """Test that the least recently used entry is dropped from memory."""
+  cache = TTLCache("t", ttl=10, max_entries=2)
+  cache.set("a", 1)
+  cache.set("b", 2)
+  cache.get("a")
+  cache.set("c", 3)
+
+  assert cache.get("b") is None
+  assert cache.get("a") == 1
+  assert cache.get("c") == 3
+
+
+def test_cache_sqlite_survives_restart(tmp_path):
+  """Test that values in the sqlite tier are served by a new cache instance."""
+  path = str(tmp_path / "cache.db")
+  cache = TTLCache("t", ttl=10, path=path)
+  cache.set("a", {"plan": ["x"]})
+  cache.close()
+
+  cache = TTLCache("t", ttl=10, path=path)
+  assert cache.get("a") == {"plan": ["x"]}
+  assert cache.stats.disk_hits == 1
+  # promoted to memory
+  assert cache.get("a") == {"plan": ["x"]}
+  assert cache.stats.memory_hits == 1
+
+
+def test_cache_sqlite_expiry_and_delete(tmp_path):
+  """Test that expired and deleted rows are not served from sqlite."""
+  clock = FakeClock()
+  path = str(tmp_path / "cache.db")
+  cache = TTLCache("t", ttl=10, max_entries=0, path=path, clock=clock)
+  cache.set("a", 1)
+  cache.set("b", 2)
+
+  cache.delete("b")
+  assert cache.get("b") is None
+
+  clock.now += 11
+  assert cache.get("a") is None
+
+
+def test_cache_sqlite_max_rows(tmp_path):
+  """Test that the sqlite tier keeps at most max_rows, dropping least recently used."""
+  clock = FakeClock()
+  path = str(tmp_path / "cache.db")
+  cache = TTLCache("t", ttl=100, max_entries=0, path=path, max_rows=2, clock=clock)
+  cache.set("a", 1)
+  clock.now += 1
+  cache.set("b", 2)
+  clock.now += 1
+  cache.get("a")
+  clock.now += 1
+  cache.set("c", 3)
+
+  assert cache.get("b") is None
+  assert cache.get("a") == 1
+  assert cache.get("c") == 3
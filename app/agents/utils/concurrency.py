@@ -0,0 +1,73 @@
+import asyncio
+import os
+from typing import Awaitable, Callable, TypeVar
+
+from pydantic_ai import capture_run_messages
+from pydantic_ai.messages import ModelMessage, ModelResponse
+from pydantic_ai.usage import RunUsage
+
+K = TypeVar("K")
+T = TypeVar("T")
+
+
+def usage_of(messages: list[ModelMessage]) -> RunUsage:
+  """Usage of the model responses of an agent run, also when the run failed or was cancelled."""
+  usage = RunUsage()
+  for message in messages:
+    if isinstance(message, ModelResponse):
+      usage.requests += 1
+      usage.incr(message.usage)
+  return usage
+
+
+async def run_per_file(
+  files: list[K],
+  run: Callable[[K], Awaitable[T]],
+  concurrency: int | None = None,
+  timeout: float | None = None,
+  usage: RunUsage | None = None,
+) -> list[tuple[K, T | None]]:
+  """
+  Run run(file) for every file with bounded concurrency and a per-file timeout.
+
+  Args:
+      files: files (or groups of files) to process
+      run: coroutine function processing a single item of files
+      concurrency: max number of files in flight, defaults to PER_FILE_AGENT_CONCURRENCY env var
+      timeout: seconds before a single file is given up, defaults to PER_FILE_AGENT_TIMEOUT env
+          var. 0 means no timeout.
+      usage: incremented with the usage of the agent run of a file that timed out, which has
+          no result to report it. Only the first agent run of a file is captured.
+
+  Returns:
+      list[tuple[K, T | None]]: (file, result) in the order of files, result is None if the
+          file timed out. Other errors are raised and cancel the remaining files.
+  """
+  if concurrency is None:
+    concurrency = int(os.getenv("PER_FILE_AGENT_CONCURRENCY", "4"))
+  if timeout is None:
+    timeout = float(os.getenv("PER_FILE_AGENT_TIMEOUT", "180"))
+
+  semaphore = asyncio.Semaphore(max(1, concurrency))
+
+  async def run_one(file: K) -> T | None:
+    async with semaphore:
+      with capture_run_messages() as messages:
+        try:
+          # the timeout starts when the file gets a slot, not while it waits for one.
+          async with asyncio.timeout(timeout or None):
+            return await run(file)
+        except TimeoutError:
+          if usage is not None:
+            usage.incr(usage_of(messages))
+          return None
+
+  tasks = [asyncio.create_task(run_one(file)) for file in files]
+  try:
+    results = await asyncio.gather(*tasks)
+  finally:
+    for task in tasks:
+      task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+  return list(zip(files, results))
@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelMessage, ModelResponse, ToolCallPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from pydantic_ai.toolsets import FunctionToolset
+from pydantic_ai.usage import RunUsage
+
+from .concurrency import run_per_file
+
+
+@pytest.mark.asyncio
+async def test_run_per_file_keeps_input_order():
+  """Test that results follow the order of files, not the order they finish."""
+  delays = {"a.mp4": 0.03, "b.mp4": 0.01, "c.mp4": 0.02}
+
+  async def run(file: str) -> str:
+    await asyncio.sleep(delays[file])
+    return file.upper()
+
+  got = await run_per_file(list(delays), run, concurrency=3, timeout=0)
+
+  assert got == [("a.mp4", "A.MP4"), ("b.mp4", "B.MP4"), ("c.mp4", "C.MP4")]
+
+
+@pytest.mark.asyncio
+async def test_run_per_file_bounded_concurrency():
+  """Test that no more than concurrency files run at the same time."""
+  in_flight = 0
+  max_in_flight = 0
+
+  async def run(file: str) -> str:
+    nonlocal in_flight, max_in_flight
+    in_flight += 1
+    max_in_flight = max(max_in_flight, in_flight)
+    await asyncio.sleep(0.01)
+    in_flight -= 1
+    return file
+
+  files = [f"{i}.mp4" for i in range(10)]
+  got = await run_per_file(files, run, concurrency=3, timeout=0)
+
+  assert [f for f, _ in got] == files
+  assert max_in_flight == 3
+
+
+@pytest.mark.asyncio
+async def test_run_per_file_timeout_does_not_stall_group():
+  """Test that a slow file times out to None while the others complete."""
+
+  async def run(file: str) -> str:
+    if file == "slow.mp4":
+      await asyncio.sleep(10)
+    return file
+
+  loop = asyncio.get_running_loop()
+  start = loop.time()
+  got = await run_per_file(["fast.mp4", "slow.mp4"], run, concurrency=2, timeout=0.05)
+
+  assert got == [("fast.mp4", "fast.mp4"), ("slow.mp4", None)]
+  assert loop.time() - start < 1
+
+
+@pytest.mark.asyncio
+async def test_run_per_file_counts_usage_of_timed_out_runs():
+  """Test that the model requests a run made before it timed out are added to usage."""
+
+  async def hang() -> str:
+    await asyncio.sleep(10)
+    return "never"
+
+  def answer(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+    return ModelResponse(parts=[ToolCallPart("hang", {})])
+
+  agent = Agent(FunctionModel(answer), toolsets=[FunctionToolset([hang])])
+  usage = RunUsage()
+
+  got = await run_per_file(["slow.mp4"], agent.run, concurrency=1, timeout=0.05, usage=usage)
+
+  assert got == [("slow.mp4", None)]
+  assert usage.requests == 1
+  assert usage.input_tokens > 0
+
+
+@pytest.mark.asyncio
+async def test_run_per_file_raises_errors():
+  """Test that errors other than timeout are raised."""
+
+  async def run(file: str) -> str:
+    raise ValueError(file)
+
+  with pytest.raises(ValueError):
+    await run_per_file(["a.mp4"], run, concurrency=1, timeout=0)
+
+
+@pytest.mark.asyncio
+async def test_run_per_file_empty():
+  """Test that no files gives no results."""
+
+  async def run(file: str) -> str:
+    return file
+
+  assert await run_per_file([], run) == []
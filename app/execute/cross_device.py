@@ -0,0 +1,227 @@
+import errno
+import hashlib
+import json
+import logging
+import os
+import shutil
+from typing import Callable
+
+from ..agents.ai import setupLogfireForStdLog
+
+setupLogfireForStdLog()
+_LOGGER = logging.getLogger(__name__)
+
+# bytes asked from the kernel per zero-copy call, also how often progress is reported
+_ZERO_COPY_CHUNK = 64 << 20
+
+# errors meaning the zero-copy call does not work for these files, not that the copy failed.
+_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSOCK}
+
+
+class CopyVerificationError(Exception):
+  pass
+
+
+def _zero_copy_calls() -> list[Callable[[int, int, int], int]]:
+  calls = []
+  if hasattr(os, "copy_file_range"):
+    calls.append(lambda src, dst, n: os.copy_file_range(src, dst, n))
+  if hasattr(os, "sendfile"):
+    calls.append(lambda src, dst, n: os.sendfile(dst, src, None, n))
+  return calls
+
+
+def _seek(src: int, dst: int, offset: int):
+  os.lseek(src, offset, os.SEEK_SET)
+  os.lseek(dst, offset, os.SEEK_SET)
+
+
+def _copy_range(
+  src: int,
+  dst: int,
+  offset: int,
+  size: int,
+  buffer_size: int,
+  hasher,
+  progress: Callable[[int], None] | None,
+) -> int:
+  """Copy src from offset to size, returns the offset reached."""
+  _seek(src, dst, offset)
+  if hasher is None:
+    for call in _zero_copy_calls():
+      try:
+        while offset < size:
+          n = call(src, dst, min(_ZERO_COPY_CHUNK, size - offset))
+          if n == 0:
+            return offset
+          offset += n
+          if progress:
+            progress(n)
+        return offset
+      except OSError as e:
+        if e.errno not in _UNSUPPORTED:
+          raise
+        _seek(src, dst, offset)
+
+  # read / write fallback, also used to hash the source while copying.
+  buffer = bytearray(buffer_size)
+  view = memoryview(buffer)
+  while offset < size:
+    n = os.readv(src, [view[: min(buffer_size, size - offset)]])
+    if n == 0:
+      return offset
+    if hasher:
+      hasher.update(view[:n])
+    written = 0
+    while written < n:
+      written += os.write(dst, view[written:n])
+    offset += n
+    if progress:
+      progress(n)
+  return offset
+
+
+def _hash_range(fd: int, size: int, buffer_size: int, hasher):
+  os.lseek(fd, 0, os.SEEK_SET)
+  buffer = bytearray(buffer_size)
+  view = memoryview(buffer)
+  done = 0
+  while done < size:
+    n = os.readv(fd, [view[: min(buffer_size, size - done)]])
+    if n == 0:
+      return
+    hasher.update(view[:n])
+    done += n
+
+
+def _prefix_hash(fd: int, size: int, buffer_size: int):
+  hasher = hashlib.blake2b()
+  _hash_range(fd, size, buffer_size, hasher)
+  return hasher
+
+
+def _source_id(source: str, st: os.stat_result) -> dict:
+  return {"source": os.path.abspath(source), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _read_source_id(path: str) -> dict | None:
+  try:
+    with open(path, encoding="utf-8") as f:
+      return json.load(f)
+  except (OSError, ValueError):
+    return None
+
+
+def _write_source_id(path: str, source_id: dict):
+  with open(path, "w", encoding="utf-8") as f:
+    json.dump(source_id, f)
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def remove_partial(target: str):
+  """Remove the partial file of a copy to target and the record of its source, if any."""
+  for path in (f"{target}.partial", f"{target}.partial.source"):
+    try:
+      os.remove(path)
+    except FileNotFoundError:
+      pass
+
+
+def _fsync_dir(dir: str):
+  fd = os.open(dir, os.O_RDONLY)
+  try:
+    os.fsync(fd)
+  finally:
+    os.close(fd)
+
+
+def copy_file(
+  source: str,
+  target: str,
+  verify: bool = False,
+  buffer_size: int = 8 << 20,
+  progress: Callable[[int], None] | None = None,
+):
+  """
+  Copy source to target, for targets on another device.
+
+  The data goes to target.partial with copy_file_range or sendfile, falling back to buffered
+  read / write, and is fsynced before the partial file is renamed to target. The source path,
+  size and mtime are kept next to the partial file in target.partial.source: a partial file left
+  by an interrupted copy of the same source is resumed from its size once its content matches
+  the start of the source, any other partial file is copied again from the start. A copy that
+  fails removes its partial file.
+
+  Args:
+      verify: hash the source while copying and compare it with the fsynced copy, this reads
+        the data through userspace instead of zero-copy
+      progress: called with the number of bytes copied, including those of a resumed partial file
+
+  Raises:
+      CopyVerificationError: if the copy differs from source, the partial file is removed
+  """
+  partial = f"{target}.partial"
+  source_id_path = f"{partial}.source"
+  hasher = hashlib.blake2b() if verify else None
+
+  src = os.open(source, os.O_RDONLY)
+  try:
+    source_id = _source_id(source, os.fstat(src))
+    size = source_id["size"]
+    resume = _read_source_id(source_id_path) == source_id and os.path.exists(partial)
+    if not resume:
+      # the partial file, if any, is not known to be a copy of this source.
+      _write_source_id(source_id_path, source_id)
+    dst = os.open(partial, os.O_RDWR | os.O_CREAT | (0 if resume else os.O_TRUNC), 0o644)
+    try:
+      offset = os.fstat(dst).st_size
+      if offset:
+        source_prefix = _prefix_hash(src, min(offset, size), buffer_size)
+        copied = _prefix_hash(dst, offset, buffer_size)
+        if offset > size or copied.digest() != source_prefix.digest():
+          _LOGGER.warning(f"partial copy of {source} differs from the source, copying it again")
+          os.ftruncate(dst, 0)
+          offset = 0
+        else:
+          _LOGGER.info(f"resuming copy of {source} at {offset}/{size} bytes")
+          hasher = source_prefix if verify else None
+          if progress:
+            progress(offset)
+
+      offset = _copy_range(src, dst, offset, size, buffer_size, hasher, progress)
+      if offset != size:
+        raise OSError(errno.EIO, f"{source} changed size while copying")
+      os.fsync(dst)
+    except BaseException:
+      os.close(dst)
+      remove_partial(target)
+      raise
+    else:
+      os.close(dst)
+  finally:
+    os.close(src)
+
+  if hasher:
+    with open(partial, "rb") as f:
+      copied = hashlib.file_digest(f, "blake2b")
+    if copied.digest() != hasher.digest():
+      remove_partial(target)
+      raise CopyVerificationError(f"copy of {source} does not match the source")
+
+  shutil.copystat(source, partial)
+  os.replace(partial, target)
+  os.remove(source_id_path)
+  _fsync_dir(os.path.dirname(target))
+
+
+def move_across_devices(
+  source: str,
+  target: str,
+  verify: bool = False,
+  buffer_size: int = 8 << 20,
+  progress: Callable[[int], None] | None = None,
+):
+  """copy_file, then remove source once the copy is on disk."""
+  copy_file(source, target, verify=verify, buffer_size=buffer_size, progress=progress)
+  os.remove(source)
@@ -0,0 +1,146 @@
+import errno
+import json
+import os
+
+import pytest
+
+from . import cross_device
+from .cross_device import CopyVerificationError, copy_file, move_across_devices
+
+DATA = bytes(range(256)) * 4096
+
+
+def _unsupported(*args):
+  raise OSError(errno.ENOSYS, "not supported")
+
+
+def _interrupted_copy(source, target, data):
+  """Leave the partial file of a copy of source to target interrupted after data."""
+  (target.parent / f"{target.name}.partial").write_bytes(data)
+  st = os.stat(source)
+  (target.parent / f"{target.name}.partial.source").write_text(
+    json.dumps({"source": str(source), "size": st.st_size, "mtime_ns": st.st_mtime_ns})
+  )
+
+
+@pytest.mark.parametrize("verify", [False, True])
+def test_move_across_devices(tmp_path, verify):
+  """Test that the file is copied with its mtime and the source removed."""
+  source = tmp_path / "source.mkv"
+  source.write_bytes(DATA)
+  os.utime(source, (1_000_000, 1_000_000))
+  target = tmp_path / "target.mkv"
+
+  move_across_devices(str(source), str(target), verify=verify, buffer_size=4096)
+
+  assert target.read_bytes() == DATA
+  assert os.stat(target).st_mtime == 1_000_000
+  assert not source.exists()
+  assert not (tmp_path / "target.mkv.partial").exists()
+
+
+def test_copy_file_buffered_fallback(tmp_path, monkeypatch):
+  """Test that files are copied with read / write when zero-copy calls are not supported."""
+  monkeypatch.setattr(os, "copy_file_range", _unsupported, raising=False)
+  monkeypatch.setattr(os, "sendfile", _unsupported, raising=False)
+  source = tmp_path / "source.mkv"
+  source.write_bytes(DATA)
+
+  copy_file(str(source), str(tmp_path / "target.mkv"), buffer_size=1000)
+
+  assert (tmp_path / "target.mkv").read_bytes() == DATA
+  assert source.exists()
+
+
+@pytest.mark.parametrize("verify", [False, True])
+def test_copy_file_resumes_partial(tmp_path, verify):
+  """Test that an interrupted copy continues from the partial file."""
+  source = tmp_path / "source.mkv"
+  source.write_bytes(DATA)
+  _interrupted_copy(source, tmp_path / "target.mkv", DATA[:5000])
+  copied = []
+
+  copy_file(
+    str(source),
+    str(tmp_path / "target.mkv"),
+    verify=verify,
+    buffer_size=4096,
+    progress=copied.append,
+  )
+
+  assert copied[0] == 5000
+  assert (tmp_path / "target.mkv").read_bytes() == DATA
+  assert not (tmp_path / "target.mkv.partial.source").exists()
+
+
+@pytest.mark.parametrize("stale", ["other source", "changed source", "torn write"])
+def test_copy_file_does_not_resume_stale_partial(tmp_path, stale):
+  """Test that a partial file is copied again unless it is the start of this source."""
+  source = tmp_path / "source.mkv"
+  source.write_bytes(DATA)
+  target = tmp_path / "target.mkv"
+  if stale == "other source":
+    other = tmp_path / "other.mkv"
+    other.write_bytes(DATA)
+    _interrupted_copy(other, target, DATA[:5000])
+  elif stale == "changed source":
+    _interrupted_copy(source, target, DATA[:5000])
+    os.utime(source, ns=(0, 0))
+  else:
+    # the size reached disk before the data.
+    _interrupted_copy(source, target, bytes(5000))
+  copied = []
+
+  copy_file(str(source), str(target), buffer_size=4096, progress=copied.append)
+
+  assert copied[0] != 5000
+  assert sum(copied) == len(DATA)
+  assert target.read_bytes() == DATA
+
+
+def test_copy_file_verify_detects_corrupt_copy(tmp_path, monkeypatch):
+  """Test that verification fails for a copy that differs from the source."""
+  copy_range = cross_device._copy_range
+
+  def corrupt(src, dst, *args):
+    offset = copy_range(src, dst, *args)
+    os.pwrite(dst, b"x", 0)
+    return offset
+
+  monkeypatch.setattr(cross_device, "_copy_range", corrupt)
+  source = tmp_path / "source.mkv"
+  source.write_bytes(DATA)
+
+  with pytest.raises(CopyVerificationError):
+    copy_file(str(source), str(tmp_path / "target.mkv"), verify=True)
+
+  assert os.listdir(tmp_path) == ["source.mkv"]
+
+
+def test_copy_file_failure_removes_partial(tmp_path, monkeypatch):
+  """Test that a copy that fails leaves no partial file to be resumed later."""
+
+  def fail(*args):
+    raise OSError(errno.ENOSPC, "no space left")
+
+  monkeypatch.setattr(cross_device, "_copy_range", fail)
+  source = tmp_path / "source.mkv"
+  source.write_bytes(DATA)
+
+  with pytest.raises(OSError):
+    copy_file(str(source), str(tmp_path / "target.mkv"))
+
+  assert os.listdir(tmp_path) == ["source.mkv"]
+
+
+def test_copy_file_reports_progress(tmp_path):
+  """Test that progress counts every byte once, including those of a resumed partial file."""
+  source = tmp_path / "source.mkv"
+  source.write_bytes(DATA)
+  _interrupted_copy(source, tmp_path / "target.mkv", DATA[:5000])
+  copied = []
+
+  copy_file(str(source), str(tmp_path / "target.mkv"), buffer_size=4096, progress=copied.append)
+
+  assert copied[0] == 5000
+  assert sum(copied) == len(DATA)
@@ -0,0 +1,256 @@
+import asyncio
+import errno
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack
+from functools import partial
+from typing import Any, Callable, Literal
+
+from ..agents.ai import setupLogfireForStdLog
+from ..agents.models import ActionTiming, ExecuteResponse, PlanAction, PlanFailed
+from .cross_device import CopyVerificationError, move_across_devices
+from .journal import PlanJournal
+from .link import link_file
+from .progress import ExecuteProgress
+
+setupLogfireForStdLog()
+_LOGGER = logging.getLogger(__name__)
+
+
+class Executor:
+  """
+  Runs the file operations of a plan in a thread pool, so the event loop is never blocked.
+
+  Actions are scheduled by the devices (st_dev) of their file and target: actions on different
+  disks run in parallel, at most per_device actions touch one disk at a time. Each target
+  directory is created, and the device of each directory looked up, once per plan.
+
+  Files are renamed on the same device and copied across devices, see move_across_devices.
+  """
+
+  def __init__(
+    self,
+    workers: int = 8,
+    per_device: int = 2,
+    verify_copy: bool = False,
+    copy_buffer_size: int = 8 << 20,
+  ):
+    self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="execute")
+    self._per_device = per_device
+    self._verify_copy = verify_copy
+    self._copy_buffer_size = copy_buffer_size
+    self._device_slots: dict[int, asyncio.Semaphore] = {}
+
+  async def run(
+    self,
+    source_dir: str,
+    target_root: str,
+    plan: list[PlanAction],
+    mode: Literal["move", "link"] = "move",
+    journal: PlanJournal | None = None,
+    progress: ExecuteProgress | None = None,
+  ) -> ExecuteResponse:
+    """
+    Move the files of plan from source_dir to target_root.
+
+    Args:
+        mode: "link" keeps the files in source_dir and links them to the targets, see link_file
+        journal: every action is journaled before it starts and once it finished
+        progress: counts the files and bytes moved
+
+    Returns:
+        ExecuteResponse: actions that failed, and timings of the others
+
+    Raises:
+        Exception: the first unexpected error of an action, once every other action finished
+    """
+    dirs: dict[str, asyncio.Future] = {}
+    # st_dev of directories, only for this run: mounts may change between plans.
+    devices: dict[str, int] = {}
+    results = await asyncio.gather(
+      *[
+        self._move(
+          action,
+          os.path.join(source_dir, action.file),
+          os.path.join(target_root, action.target),
+          mode,
+          journal,
+          progress,
+          dirs,
+          devices,
+        )
+        for action in plan
+        if action.action == "move"
+      ],
+      # so the moves that finished are journaled before an error of another one is raised.
+      return_exceptions=True,
+    )
+    for result in results:
+      if isinstance(result, BaseException):
+        raise result
+
+    resp = ExecuteResponse(failed_move=[])
+    for result in results:
+      if isinstance(result, PlanFailed):
+        resp.failed_move.append(result)
+      else:
+        resp.timings.append(result)
+    return resp
+
+  def close(self):
+    self._pool.shutdown(wait=True)
+
+  async def _call(self, fn: Callable[..., Any], *args: Any) -> Any:
+    return await asyncio.get_running_loop().run_in_executor(self._pool, partial(fn, *args))
+
+  async def _move(
+    self,
+    action: PlanAction,
+    source: str,
+    target: str,
+    mode: Literal["move", "link"],
+    journal: PlanJournal | None,
+    progress: ExecuteProgress | None,
+    dirs: dict[str, asyncio.Future],
+    known_devices: dict[str, int],
+  ) -> PlanFailed | ActionTiming:
+    queued = time.perf_counter()
+    devices = {
+      await self._call(self.device, os.path.dirname(source), known_devices),
+      await self._call(self.device, os.path.dirname(target), known_devices),
+    }
+
+    async with AsyncExitStack() as stack:
+      # always in the same order, so two actions never wait on each other's device.
+      for device in sorted(devices):
+        await stack.enter_async_context(self._slot(device))
+      start = time.perf_counter()
+
+      if not await self._call(os.path.exists, source):
+        return _failed(action, "file not found")
+      copied = None
+      if progress:
+        progress.started(action.file)
+        copied = partial(progress.copied, action.file)
+      try:
+        await self._make_dir(os.path.dirname(target), dirs)
+        if journal:
+          await self._call(journal.started, action)
+        if mode == "link":
+          method = await self._call(
+            partial(
+              link_file,
+              source,
+              target,
+              cross_device=len(devices) > 1,
+              verify=self._verify_copy,
+              buffer_size=self._copy_buffer_size,
+              progress=copied,
+            )
+          )
+        elif len(devices) > 1:
+          method = await self._copy(source, target, copied)
+        else:
+          try:
+            await self._call(os.rename, source, target)
+            method = "rename"
+          except OSError as e:
+            # bind mounts of one filesystem share st_dev but can not be renamed across.
+            if e.errno != errno.EXDEV:
+              raise
+            method = await self._copy(source, target, copied)
+        if journal:
+          await self._call(journal.done, action, method)
+      except (OSError, CopyVerificationError) as e:
+        _LOGGER.error(f"failed to move {source} to {target}: {e}")
+        if progress:
+          progress.finished(action.file, ok=False)
+        return _failed(action, str(e))
+      if progress:
+        progress.finished(action.file)
+
+      end = time.perf_counter()
+    return ActionTiming(
+      **action.model_dump(), queued_seconds=start - queued, seconds=end - start, method=method
+    )
+
+  async def _copy(
+    self, source: str, target: str, progress: Callable[[int], None] | None = None
+  ) -> str:
+    await self._call(
+      partial(
+        move_across_devices,
+        source,
+        target,
+        verify=self._verify_copy,
+        buffer_size=self._copy_buffer_size,
+        progress=progress,
+      )
+    )
+    return "copy"
+
+  def _slot(self, device: int) -> asyncio.Semaphore:
+    if device not in self._device_slots:
+      self._device_slots[device] = asyncio.Semaphore(self._per_device)
+    return self._device_slots[device]
+
+  async def _make_dir(self, dir: str, dirs: dict[str, asyncio.Future]):
+    if dir not in dirs:
+      dirs[dir] = asyncio.ensure_future(self._call(partial(os.makedirs, dir, exist_ok=True)))
+    await dirs[dir]
+
+  def device(self, dir: str, known: dict[str, int]) -> int:
+    """st_dev of dir, or of its closest existing parent. known caches the lookups of a run."""
+    if dir in known:
+      return known[dir]
+
+    try:
+      device = os.stat(dir).st_dev
+    except FileNotFoundError:
+      parent = os.path.dirname(dir)
+      if parent == dir:
+        raise
+      return self.device(parent, known)
+
+    known[dir] = device
+    return device
+
+
+def _failed(action: PlanAction, reason: str) -> PlanFailed:
+  return PlanFailed(file=action.file, action=action.action, target=action.target, reason=reason)
+
+
+_executor: Executor | None = None
+_executor_loop: asyncio.AbstractEventLoop | None = None
+
+
+def plan_executor() -> Executor:
+  """
+  Shared executor, configured by EXECUTE_WORKERS, EXECUTE_PER_DEVICE_CONCURRENCY,
+  EXECUTE_VERIFY_COPY and EXECUTE_COPY_BUFFER_SIZE.
+
+  Device slots belong to the event loop that created them, a new loop gets a new executor.
+  """
+  global _executor, _executor_loop
+  loop = asyncio.get_running_loop()
+  if _executor is None or _executor_loop is not loop:
+    if _executor:
+      _executor.close()
+    _executor = Executor(
+      workers=int(os.getenv("EXECUTE_WORKERS", "8")),
+      per_device=int(os.getenv("EXECUTE_PER_DEVICE_CONCURRENCY", "2")),
+      verify_copy=os.getenv("EXECUTE_VERIFY_COPY", "false").lower() == "true",
+      copy_buffer_size=int(os.getenv("EXECUTE_COPY_BUFFER_SIZE", str(8 << 20))),
+    )
+    _executor_loop = loop
+  return _executor
+
+
+def close_plan_executor():
+  global _executor, _executor_loop
+  if _executor:
+    _executor.close()
+  _executor = None
+  _executor_loop = None
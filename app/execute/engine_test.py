@@ -0,0 +1,151 @@
+import errno
+import os
+import threading
+import time
+
+import pytest
+
+from ..agents.models import PlanAction
+from .engine import Executor
+from .journal import PlanJournal
+
+
+def _write_files(dir, names: list[str]):
+  dir.mkdir(parents=True, exist_ok=True)
+  for name in names:
+    (dir / name).write_text(name)
+
+
+@pytest.mark.asyncio
+async def test_executor_moves_files(tmp_path):
+  """Test that files are moved, skipped actions are left and missing files are reported."""
+  _write_files(tmp_path / "src", ["a.mkv", "b.mkv", "c.nfo"])
+  plan = [
+    PlanAction(file="a.mkv", action="move", target="movie/A/a.mkv"),
+    PlanAction(file="b.mkv", action="move", target="movie/A/b.mkv"),
+    PlanAction(file="c.nfo", action="skip"),
+    PlanAction(file="d.mkv", action="move", target="movie/A/d.mkv"),
+  ]
+
+  executor = Executor()
+  resp = await executor.run(str(tmp_path / "src"), str(tmp_path / "target"), plan)
+  executor.close()
+
+  assert (tmp_path / "target/movie/A/a.mkv").read_text() == "a.mkv"
+  assert (tmp_path / "target/movie/A/b.mkv").read_text() == "b.mkv"
+  assert (tmp_path / "src/c.nfo").exists()
+  assert [(f.file, f.reason) for f in resp.failed_move] == [("d.mkv", "file not found")]
+  assert [t.file for t in resp.timings] == ["a.mkv", "b.mkv"]
+  assert all(t.seconds >= 0 and t.queued_seconds >= 0 for t in resp.timings)
+
+
+@pytest.mark.asyncio
+async def test_executor_limits_actions_per_device(tmp_path, monkeypatch):
+  """Test that at most per_device actions run on one device, and dirs are created once."""
+  names = [f"{i}.mkv" for i in range(6)]
+  _write_files(tmp_path / "src", names)
+
+  lock = threading.Lock()
+  running = 0
+  most_running = 0
+  rename = os.rename
+
+  def slow_rename(source, target):
+    nonlocal running, most_running
+    with lock:
+      running += 1
+      most_running = max(most_running, running)
+    time.sleep(0.05)
+    rename(source, target)
+    with lock:
+      running -= 1
+
+  makedirs_calls = []
+  makedirs = os.makedirs
+
+  def counting_makedirs(dir, exist_ok=False):
+    makedirs_calls.append(dir)
+    makedirs(dir, exist_ok=exist_ok)
+
+  monkeypatch.setattr(os, "rename", slow_rename)
+  monkeypatch.setattr(os, "makedirs", counting_makedirs)
+
+  executor = Executor(workers=8, per_device=2)
+  plan = [PlanAction(file=n, action="move", target=f"tv/S01/{n}") for n in names]
+  resp = await executor.run(str(tmp_path / "src"), str(tmp_path / "target"), plan)
+  executor.close()
+
+  assert resp.failed_move == []
+  assert most_running == 2
+  assert makedirs_calls.count(str(tmp_path / "target/tv/S01")) == 1
+  assert sorted(os.listdir(tmp_path / "target/tv/S01")) == names
+
+
+@pytest.mark.asyncio
+async def test_executor_copies_across_devices(tmp_path, monkeypatch):
+  """Test that files are copied when file and target are on different devices."""
+  _write_files(tmp_path / "src", ["a.mkv"])
+  executor = Executor()
+  device = executor.device
+  monkeypatch.setattr(executor, "device", lambda dir, known: device(dir, known) + ("target" in dir))
+
+  def no_rename(source, target):
+    raise AssertionError("rename across devices")
+
+  monkeypatch.setattr(os, "rename", no_rename)
+
+  plan = [PlanAction(file="a.mkv", action="move", target="movie/a.mkv")]
+  resp = await executor.run(str(tmp_path / "src"), str(tmp_path / "target"), plan)
+  executor.close()
+
+  assert resp.failed_move == []
+  assert (tmp_path / "target/movie/a.mkv").read_text() == "a.mkv"
+  assert not (tmp_path / "src/a.mkv").exists()
+
+
+@pytest.mark.asyncio
+async def test_executor_copies_on_exdev(tmp_path, monkeypatch):
+  """Test that a rename failing with EXDEV falls back to a copy."""
+  _write_files(tmp_path / "src", ["a.mkv"])
+
+  def exdev(source, target):
+    raise OSError(errno.EXDEV, "cross-device link")
+
+  monkeypatch.setattr(os, "rename", exdev)
+
+  executor = Executor()
+  plan = [PlanAction(file="a.mkv", action="move", target="movie/a.mkv")]
+  resp = await executor.run(str(tmp_path / "src"), str(tmp_path / "target"), plan)
+  executor.close()
+
+  assert resp.failed_move == []
+  assert (tmp_path / "target/movie/a.mkv").read_text() == "a.mkv"
+  assert not (tmp_path / "src/a.mkv").exists()
+
+
+@pytest.mark.asyncio
+async def test_executor_journals_finished_moves_before_raising(tmp_path, monkeypatch):
+  """Test that an unexpected error of one move is raised once the others finished and journaled."""
+  _write_files(tmp_path / "src", ["a.mkv", "b.mkv"])
+  rename = os.rename
+
+  def failing_rename(source, target):
+    if source.endswith("a.mkv"):
+      raise ValueError("broken rename")
+    time.sleep(0.05)
+    rename(source, target)
+
+  monkeypatch.setattr(os, "rename", failing_rename)
+
+  journal = PlanJournal(str(tmp_path / "journal.jsonl"))
+  journal.begin("src", "move")
+  executor = Executor()
+  plan = [
+    PlanAction(file="a.mkv", action="move", target="movie/a.mkv"),
+    PlanAction(file="b.mkv", action="move", target="movie/b.mkv"),
+  ]
+  with pytest.raises(ValueError):
+    await executor.run(str(tmp_path / "src"), str(tmp_path / "target"), plan, journal=journal)
+  executor.close()
+
+  assert journal.done_actions() == {("b.mkv", "movie/b.mkv"): "rename"}
@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import AsyncIterator, Literal
+
+from pydantic import BaseModel
+
+from ..agents.ai import setupLogfireForStdLog
+from ..agents.models import APIExecuteRequest, ExecuteResponse, PlanAction, PlanFailed
+from .journal import journal_for
+from .progress import ExecuteProgress, ProgressSnapshot
+from .runner import execute
+
+setupLogfireForStdLog()
+_LOGGER = logging.getLogger(__name__)
+
+# seconds between progress events
+_EVENT_INTERVAL = 1.0
+
+
+class ExecuteJob(BaseModel):
+  id: str
+  dir: str
+  status: Literal["queued", "running", "done", "failed"]
+  progress: ProgressSnapshot
+  # set once the job finished, failed_move has the moves a failed job did not apply
+  result: ExecuteResponse | None = None
+
+
+def _unapplied_moves(request: APIExecuteRequest) -> list[PlanAction]:
+  """
+  Moves of request a failed execute did not apply.
+
+  A journal left running knows the finished moves. Otherwise it was rolled back, committed or
+  never begun, and a move is applied if its target is in place: targets are renamed into place
+  when complete.
+  """
+  journal = journal_for(request.dir)
+  moves = [a for a in request.plan if a.action == "move"]
+  if journal.resumable():
+    done = journal.done_actions()
+    return [a for a in moves if (a.file, a.target) not in done]
+  target_root = os.getenv("TARGET_DIR")
+  return [a for a in moves if not os.path.exists(os.path.join(target_root, a.target))]
+
+
+class _Job:
+  def __init__(self, request: APIExecuteRequest):
+    self.id = uuid.uuid4().hex
+    self.request = request
+    self.status: Literal["queued", "running", "done", "failed"] = "queued"
+    self.progress = ExecuteProgress()
+    self.result: ExecuteResponse | None = None
+    self.finished_at: float | None = None
+    self.task: asyncio.Task | None = None
+
+  def view(self) -> ExecuteJob:
+    return ExecuteJob(
+      id=self.id,
+      dir=self.request.dir,
+      status=self.status,
+      progress=self.progress.snapshot(),
+      result=self.result,
+    )
+
+  async def run(self):
+    self.status = "running"
+    try:
+      self.result = await execute(self.request, self.progress)
+      self.status = "failed" if self.result.failed_move else "done"
+    except Exception as e:
+      _LOGGER.exception(f"execute job {self.id} of {self.request.dir} failed")
+      unapplied = await asyncio.to_thread(_unapplied_moves, self.request)
+      self.result = ExecuteResponse(
+        failed_move=[
+          PlanFailed(file=a.file, action=a.action, target=a.target, reason=str(e))
+          for a in unapplied
+        ]
+      )
+      # failed even if every move was applied, e.g. archiving the download dir failed.
+      self.status = "failed"
+    self.finished_at = time.monotonic()
+
+
+_jobs: dict[str, _Job] = {}
+
+
+def _prune():
+  """Forget jobs finished more than EXECUTE_JOB_TTL seconds ago."""
+  ttl = float(os.getenv("EXECUTE_JOB_TTL", "3600"))
+  now = time.monotonic()
+  for id, job in list(_jobs.items()):
+    if job.finished_at is not None and now - job.finished_at > ttl:
+      del _jobs[id]
+
+
+def start_execute_job(request: APIExecuteRequest) -> ExecuteJob:
+  """Run execute in the background, returns the queued job right away."""
+  _prune()
+  job = _Job(request)
+  _jobs[job.id] = job
+  job.task = asyncio.create_task(job.run())
+  return job.view()
+
+
+def execute_job(id: str) -> ExecuteJob | None:
+  _prune()
+  job = _jobs.get(id)
+  return job.view() if job else None
+
+
+async def execute_job_events(id: str) -> AsyncIterator[ExecuteJob]:
+  """The job every time its progress changed, until it finished."""
+  job = _jobs.get(id)
+  if job is None:
+    return
+
+  last = None
+  while True:
+    view = job.view()
+    if view != last:
+      yield view
+      last = view
+    if job.finished_at is not None:
+      return
+    # woken early when the job finishes.
+    await asyncio.wait([job.task], timeout=_EVENT_INTERVAL)
+
+
+async def stop_execute_jobs():
+  """
+  Cancel running jobs, their journals are left running so a retry of the execute resumes them.
+  """
+  tasks = [job.task for job in _jobs.values() if job.task and not job.task.done()]
+  for task in tasks:
+    task.cancel()
+  await asyncio.gather(*tasks, return_exceptions=True)
+  _jobs.clear()
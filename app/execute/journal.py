@@ -0,0 +1,233 @@
+import errno
+import hashlib
+import logging
+import os
+import threading
+from typing import Literal
+
+from pydantic import BaseModel
+
+from ..agents.ai import setupLogfireForStdLog
+from ..agents.models import PlanAction, PlanFailed
+from .cross_device import move_across_devices, remove_partial
+
+setupLogfireForStdLog()
+_LOGGER = logging.getLogger(__name__)
+
+
+class JournalEntry(BaseModel):
+  op: Literal["begin", "start", "done", "commit", "rollback"]
+  dir: str | None = None
+  mode: Literal["move", "link"] | None = None
+  file: str | None = None
+  target: str | None = None
+  method: str | None = None
+
+
+class JournaledAction(BaseModel):
+  file: str
+  target: str
+  method: str
+
+
+class JournalState(BaseModel):
+  dir: str
+  mode: Literal["move", "link"]
+  status: Literal["running", "committed", "rolled_back"]
+  # finished actions, in the order they finished
+  done: list[JournaledAction]
+  # started but not finished, a crash interrupted them
+  started: list[PlanAction]
+
+
+class PlanJournal:
+  """
+  Write-ahead journal of one plan execution.
+
+  Every action is journaled before it starts and after it finished, fsynced, so after a crash the
+  execution can be resumed without redoing finished actions, or rolled back.
+  """
+
+  def __init__(self, path: str):
+    self.path = path
+    self.state: JournalState | None = None
+    self._lock = threading.Lock()
+    try:
+      with open(path, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    except FileNotFoundError:
+      lines = []
+    for line in lines:
+      try:
+        self._apply(JournalEntry.model_validate_json(line))
+      except ValueError:
+        # cut short by a crash while appending.
+        _LOGGER.warning(f"skipping broken journal line in {path}: {line!r}")
+    # the next entry starts a new line instead of ending up on a broken one.
+    self._torn = bool(lines) and not lines[-1].endswith("\n")
+
+  def resumable(self) -> bool:
+    return self.state is not None and self.state.status == "running"
+
+  def done_actions(self) -> dict[tuple[str, str], str]:
+    """(file, target) of finished actions to the method used."""
+    if not self.resumable():
+      return {}
+    return {(a.file, a.target): a.method for a in self.state.done}
+
+  def begin(self, dir: str, mode: Literal["move", "link"]):
+    with self._lock:
+      self.state = None
+      self._torn = False
+      with open(self.path, "w", encoding="utf-8"):
+        pass
+    self._append(JournalEntry(op="begin", dir=dir, mode=mode))
+
+  def started(self, action: PlanAction):
+    self._append(JournalEntry(op="start", file=action.file, target=action.target))
+
+  def done(self, action: PlanAction, method: str):
+    self._append(JournalEntry(op="done", file=action.file, target=action.target, method=method))
+
+  def commit(self):
+    """Mark the execution finished, the journal file is removed."""
+    self._append(JournalEntry(op="commit"))
+    os.remove(self.path)
+
+  def rollback(self, source_dir: str, target_root: str):
+    """Undo finished and interrupted actions, newest first."""
+    if not self.resumable():
+      return
+
+    actions = [(a.file, a.target) for a in reversed(self.state.done)]
+    actions += [(a.file, a.target) for a in self.state.started]
+    for file, target in actions:
+      self._undo(os.path.join(source_dir, file), os.path.join(target_root, target))
+    self._append(JournalEntry(op="rollback"))
+
+  def _undo(self, source: str, target: str):
+    # a copy interrupted by the crash is not resumed once rolled back.
+    remove_partial(target)
+    if not os.path.exists(target):
+      return
+
+    if self.state.mode == "link" or os.path.exists(source):
+      # the source is still in place, only the target was made.
+      os.remove(target)
+    else:
+      os.makedirs(os.path.dirname(source), exist_ok=True)
+      try:
+        os.rename(target, source)
+      except OSError as e:
+        if e.errno != errno.EXDEV:
+          raise
+        move_across_devices(target, source)
+    _LOGGER.info(f"rolled back {target} to {source}")
+
+  def _append(self, entry: JournalEntry):
+    with self._lock:
+      with open(self.path, "a", encoding="utf-8") as f:
+        f.write(("\n" if self._torn else "") + entry.model_dump_json(exclude_none=True) + "\n")
+        self._torn = False
+        f.flush()
+        os.fsync(f.fileno())
+      self._apply(entry)
+
+  def _apply(self, entry: JournalEntry):
+    if entry.op == "begin":
+      self.state = JournalState(
+        dir=entry.dir, mode=entry.mode, status="running", done=[], started=[]
+      )
+    elif self.state is None:
+      return
+    elif entry.op == "start":
+      action = PlanAction(file=entry.file, action="move", target=entry.target)
+      if action not in self.state.started:
+        self.state.started.append(action)
+    elif entry.op == "done":
+      self.state.started = [
+        a for a in self.state.started if (a.file, a.target) != (entry.file, entry.target)
+      ]
+      self.state.done.append(
+        JournaledAction(file=entry.file, target=entry.target, method=entry.method)
+      )
+    elif entry.op == "commit":
+      self.state.status = "committed"
+    elif entry.op == "rollback":
+      self.state.status = "rolled_back"
+
+
+def journal_for(dir: str) -> PlanJournal:
+  """Journal of the executions of download dir, in EXECUTE_JOURNAL_DIR."""
+  journal_dir = os.getenv("EXECUTE_JOURNAL_DIR") or os.path.join(
+    os.getenv("DOWNLOAD_COMPLETED_DIR"), ".organizer_journal"
+  )
+  os.makedirs(journal_dir, exist_ok=True)
+  name = hashlib.sha256(dir.encode("utf-8")).hexdigest()[:32]
+  return PlanJournal(os.path.join(journal_dir, f"{name}.jsonl"))
+
+
+def preflight(
+  source_dir: str,
+  target_root: str,
+  actions: list[PlanAction],
+  journal: PlanJournal | None = None,
+) -> list[PlanFailed]:
+  """
+  Check every action before anything is moved.
+
+  Each directory is listed once instead of stat-ing every file. Fails actions whose file is
+  missing, whose target exists, or whose target is used by another action. Actions a crash
+  interrupted after their target was made pass, see interrupted_complete. Changes nothing.
+  """
+  listings: dict[str, set[str]] = {}
+
+  def exists(file: str) -> bool:
+    dir, name = os.path.split(file)
+    if dir not in listings:
+      try:
+        listings[dir] = set(os.listdir(dir))
+      except (FileNotFoundError, NotADirectoryError):
+        listings[dir] = set()
+    return name in listings[dir]
+
+  started = set()
+  if journal and journal.resumable():
+    started = {(a.file, a.target) for a in journal.state.started}
+  failed = []
+  targets: set[str] = set()
+  for action in actions:
+    source = os.path.join(source_dir, action.file)
+    target = os.path.join(target_root, action.target)
+
+    reason = None
+    if target in targets:
+      reason = "duplicate target"
+    elif (action.file, action.target) in started and exists(target):
+      # targets are renamed into place, so an existing one is complete.
+      pass
+    elif not exists(source):
+      reason = "file not found"
+    elif exists(target):
+      reason = "target exists"
+    targets.add(target)
+
+    if reason:
+      failed.append(
+        PlanFailed(file=action.file, action=action.action, target=action.target, reason=reason)
+      )
+  return failed
+
+
+def interrupted_complete(
+  target_root: str, actions: list[PlanAction], journal: PlanJournal
+) -> list[PlanAction]:
+  """Actions a crash interrupted after their target was made, they only need journaling as done."""
+  if not journal.resumable():
+    return []
+  started = {(a.file, a.target) for a in journal.state.started}
+  return [
+    a
+    for a in actions
+    if (a.file, a.target) in started and os.path.exists(os.path.join(target_root, a.target))
+  ]
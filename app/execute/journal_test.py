@@ -0,0 +1,75 @@
+import os
+
+from ..agents.models import PlanAction
+from .journal import PlanJournal, interrupted_complete, preflight
+
+
+def _move(file: str, target: str) -> PlanAction:
+  return PlanAction(file=file, action="move", target=target)
+
+
+def test_preflight(tmp_path):
+  """Test that missing files, existing and duplicate targets fail before anything moves."""
+  (tmp_path / "src").mkdir()
+  (tmp_path / "target/movie").mkdir(parents=True)
+  for name in ["a.mkv", "b.mkv", "c.mkv", "d.mkv"]:
+    (tmp_path / "src" / name).write_text(name)
+  (tmp_path / "target/movie/b.mkv").write_text("old")
+
+  failed = preflight(
+    str(tmp_path / "src"),
+    str(tmp_path / "target"),
+    [
+      _move("a.mkv", "movie/a.mkv"),
+      _move("b.mkv", "movie/b.mkv"),
+      _move("c.mkv", "movie/c.mkv"),
+      _move("d.mkv", "movie/c.mkv"),
+      _move("e.mkv", "movie/e.mkv"),
+    ],
+  )
+
+  assert [(f.file, f.reason) for f in failed] == [
+    ("b.mkv", "target exists"),
+    ("d.mkv", "duplicate target"),
+    ("e.mkv", "file not found"),
+  ]
+  assert (tmp_path / "src/a.mkv").exists()
+
+
+def test_journal_replay_and_rollback(tmp_path):
+  """Test that a journal read after a crash resumes or rolls back the finished actions."""
+  (tmp_path / "src").mkdir()
+  (tmp_path / "target").mkdir()
+  for name in ["a.mkv", "b.mkv", "c.mkv"]:
+    (tmp_path / "src" / name).write_text(name)
+  path = str(tmp_path / "journal.jsonl")
+
+  journal = PlanJournal(path)
+  journal.begin("dl", "move")
+  for name in ["a.mkv", "b.mkv"]:
+    journal.started(_move(name, name))
+    os.rename(tmp_path / "src" / name, tmp_path / "target" / name)
+  journal.done(_move("a.mkv", "a.mkv"), "rename")
+  journal.started(_move("c.mkv", "c.mkv"))
+  (tmp_path / "target" / "c.mkv.partial").write_text("c")
+  # crash: b.mkv was moved but not journaled as done, c.mkv was partly copied
+  with open(path, "a", encoding="utf-8") as f:
+    f.write('{"op": "do')
+
+  journal = PlanJournal(path)
+  assert journal.resumable()
+  assert journal.done_actions() == {("a.mkv", "a.mkv"): "rename"}
+  assert [a.file for a in journal.state.started] == ["b.mkv", "c.mkv"]
+
+  # resuming: b.mkv is complete, c.mkv still has to be moved
+  actions = [_move("b.mkv", "b.mkv"), _move("c.mkv", "c.mkv")]
+  assert preflight(str(tmp_path / "src"), str(tmp_path / "target"), actions, journal) == []
+  # the check changes nothing
+  assert journal.done_actions() == {("a.mkv", "a.mkv"): "rename"}
+  assert interrupted_complete(str(tmp_path / "target"), actions, journal) == [actions[0]]
+
+  journal.rollback(str(tmp_path / "src"), str(tmp_path / "target"))
+
+  assert sorted(os.listdir(tmp_path / "src")) == ["a.mkv", "b.mkv", "c.mkv"]
+  assert os.listdir(tmp_path / "target") == []
+  assert PlanJournal(path).state.status == "rolled_back"
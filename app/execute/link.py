@@ -0,0 +1,176 @@
+import errno
+import fcntl
+import os
+import shutil
+import threading
+from typing import Callable, Literal
+
+from pydantic import BaseModel
+
+from .cross_device import copy_file
+
+# linux FICLONE ioctl, shares the data blocks of the source with a new inode.
+_FICLONE = 0x40049409
+
+# errors meaning the filesystem can not reflink these files.
+_NO_REFLINK = {errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EXDEV, errno.ENOSYS}
+
+LinkMethod = Literal["reflink", "hardlink", "copy"]
+
+
+def _reflink(source: str, target: str):
+  with open(source, "rb") as src, open(target, "wb") as dst:
+    fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+  shutil.copystat(source, target)
+
+
+def _remove(file: str):
+  try:
+    os.remove(file)
+  except FileNotFoundError:
+    pass
+
+
+def link_file(
+  source: str,
+  target: str,
+  cross_device: bool,
+  verify: bool = False,
+  buffer_size: int = 8 << 20,
+  progress: Callable[[int], None] | None = None,
+) -> LinkMethod:
+  """
+  Make target have the content of source, keeping source in place.
+
+  Reflinks where the filesystem supports it, else hardlinks. Both are zero-copy, and the link is
+  made under a temporary name and renamed to target, so target appears atomically. Files on
+  another device are copied with copy_file.
+
+  Returns:
+      LinkMethod: how target was made
+  """
+  if cross_device:
+    copy_file(source, target, verify=verify, buffer_size=buffer_size, progress=progress)
+    return "copy"
+
+  tmp = f"{target}.linking"
+  _remove(tmp)
+  try:
+    _reflink(source, tmp)
+    method: LinkMethod = "reflink"
+  except OSError as e:
+    _remove(tmp)
+    if e.errno not in _NO_REFLINK:
+      raise
+    try:
+      os.link(source, tmp)
+      method = "hardlink"
+    except OSError as e:
+      if e.errno != errno.EXDEV:
+        raise
+      copy_file(source, target, verify=verify, buffer_size=buffer_size, progress=progress)
+      return "copy"
+
+  os.replace(tmp, target)
+  return method
+
+
+class LinkRecord(BaseModel):
+  dir: str
+  file: str
+  target: str
+  method: LinkMethod
+  device: int
+  inode: int
+  size: int
+
+
+class LinkReport(BaseModel):
+  links: list[LinkRecord]
+  # bytes freed by removing the linked files from the download dir now
+  reclaimable_bytes: int
+
+
+_ledger_lock = threading.Lock()
+
+
+class LinkLedger:
+  """
+  Append-only record of linked files, by source dir.
+
+  Tells archive cleanup how many bytes removing a source dir actually frees: hardlinked files
+  share the inode with their target and reflinked files share data blocks, so they free nothing
+  while the target exists.
+  """
+
+  def __init__(self, path: str):
+    self.path = path
+
+  def append(self, records: list[LinkRecord]):
+    if not records:
+      return
+    with _ledger_lock, open(self.path, "a", encoding="utf-8") as f:
+      for record in records:
+        f.write(record.model_dump_json() + "\n")
+
+  def records(self, dir: str) -> list[LinkRecord]:
+    try:
+      with open(self.path, "r", encoding="utf-8") as f:
+        records = [LinkRecord.model_validate_json(line) for line in f if line.strip()]
+    except FileNotFoundError:
+      return []
+    # the latest record of a file, a resumed execute may record it again.
+    latest = {(r.file, r.target): r for r in records if r.dir == dir}
+    return list(latest.values())
+
+  def reclaimable_bytes(self, source_dir: str, target_root: str, dir: str) -> int:
+    """Bytes of linked files of dir freed by removing them from source_dir now."""
+    total = 0
+    for record in self.records(dir):
+      try:
+        st = os.stat(os.path.join(source_dir, record.file))
+      except FileNotFoundError:
+        continue
+
+      if record.method == "hardlink":
+        shared = st.st_nlink > 1
+      elif record.method == "reflink":
+        shared = os.path.exists(os.path.join(target_root, record.target))
+      else:
+        shared = False
+      if not shared:
+        total += st.st_size
+    return total
+
+
+def link_records(
+  dir: str, source_dir: str, target_root: str, linked: list[tuple[str, str, str]]
+) -> list[LinkRecord]:
+  """LinkRecords of (file, target, method) linked for dir."""
+  records = []
+  for file, target, method in linked:
+    st = os.stat(os.path.join(target_root, target))
+    if method not in ("reflink", "hardlink", "copy"):
+      # interrupted by a crash, a hardlink shares the inode, a reflink can not be told apart.
+      same_inode = os.stat(os.path.join(source_dir, file)).st_ino == st.st_ino
+      method = "hardlink" if same_inode else "copy"
+    records.append(
+      LinkRecord(
+        dir=dir,
+        file=file,
+        target=target,
+        method=method,
+        device=st.st_dev,
+        inode=st.st_ino,
+        size=st.st_size,
+      )
+    )
+  return records
+
+
+def link_ledger() -> LinkLedger:
+  """Ledger at EXECUTE_LINK_LEDGER, next to the downloads by default."""
+  return LinkLedger(
+    os.getenv("EXECUTE_LINK_LEDGER")
+    or os.path.join(os.getenv("DOWNLOAD_COMPLETED_DIR"), ".organizer_links.jsonl")
+  )
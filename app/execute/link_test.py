@@ -0,0 +1,79 @@
+import errno
+import os
+import shutil
+
+import pytest
+
+from . import link
+from .link import LinkLedger, link_file, link_records
+
+
+def _no_reflink(source, target):
+  raise OSError(errno.EOPNOTSUPP, "not supported")
+
+
+def test_link_file_hardlink(tmp_path, monkeypatch):
+  """Test that files are hardlinked where reflinks are not supported."""
+  monkeypatch.setattr(link, "_reflink", _no_reflink)
+  source = tmp_path / "a.mkv"
+  source.write_text("a")
+
+  assert link_file(str(source), str(tmp_path / "b.mkv"), cross_device=False) == "hardlink"
+
+  assert os.stat(tmp_path / "b.mkv").st_ino == os.stat(source).st_ino
+  assert not (tmp_path / "b.mkv.linking").exists()
+
+
+def test_link_file_prefers_reflink(tmp_path, monkeypatch):
+  """Test that a reflink is used when the filesystem supports it."""
+  monkeypatch.setattr(link, "_reflink", shutil.copy2)
+  source = tmp_path / "a.mkv"
+  source.write_text("a")
+
+  assert link_file(str(source), str(tmp_path / "b.mkv"), cross_device=False) == "reflink"
+
+  assert (tmp_path / "b.mkv").read_text() == "a"
+  assert os.stat(tmp_path / "b.mkv").st_ino != os.stat(source).st_ino
+
+
+def test_link_file_copies_across_devices(tmp_path):
+  """Test that files on another device are copied and kept in place."""
+  source = tmp_path / "a.mkv"
+  source.write_text("a")
+
+  assert link_file(str(source), str(tmp_path / "b.mkv"), cross_device=True) == "copy"
+
+  assert (tmp_path / "b.mkv").read_text() == "a"
+  assert source.exists()
+
+
+@pytest.mark.parametrize(
+  "method, reclaimable_linked, reclaimable_unlinked",
+  [("hardlink", 0, 5), ("copy", 5, 5)],
+)
+def test_link_ledger_reclaimable_bytes(
+  tmp_path, monkeypatch, method, reclaimable_linked, reclaimable_unlinked
+):
+  """Test that linked files only count as freed space once their target is gone."""
+  monkeypatch.setattr(link, "_reflink", _no_reflink)
+  (tmp_path / "src").mkdir()
+  (tmp_path / "target").mkdir()
+  (tmp_path / "src/a.mkv").write_text("aaaaa")
+  link_file(
+    str(tmp_path / "src/a.mkv"), str(tmp_path / "target/a.mkv"), cross_device=method == "copy"
+  )
+
+  ledger = LinkLedger(str(tmp_path / "links.jsonl"))
+  records = link_records(
+    "dl", str(tmp_path / "src"), str(tmp_path / "target"), [("a.mkv", "a.mkv", method)]
+  )
+  ledger.append(records)
+  ledger.append(records)
+
+  assert [(r.file, r.method, r.size) for r in ledger.records("dl")] == [("a.mkv", method, 5)]
+  assert ledger.records("other") == []
+  args = (str(tmp_path / "src"), str(tmp_path / "target"), "dl")
+  assert ledger.reclaimable_bytes(*args) == reclaimable_linked
+
+  os.remove(tmp_path / "target/a.mkv")
+  assert ledger.reclaimable_bytes(*args) == reclaimable_unlinked
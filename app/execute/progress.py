@@ -0,0 +1,74 @@
+import threading
+import time
+
+from pydantic import BaseModel
+
+
+class ProgressSnapshot(BaseModel):
+  files_total: int = 0
+  files_done: int = 0
+  bytes_total: int = 0
+  bytes_done: int = 0
+  # the file started last of those still moving
+  current_file: str | None = None
+  eta_seconds: float | None = None
+
+
+class ExecuteProgress:
+  """
+  Progress of one plan execution, updated from the executor threads.
+
+  Renames finish at once and count their whole file, copies count their bytes as they go. The ETA
+  assumes the remaining bytes move at the rate seen so far.
+  """
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._sizes: dict[str, int] = {}
+    self._copied: dict[str, int] = {}
+    self._running: list[str] = []
+    self._files_done = 0
+    self._bytes_done = 0
+    self._start: float | None = None
+
+  def plan(self, sizes: dict[str, int]):
+    """Start counting, sizes are the bytes of the files to move."""
+    with self._lock:
+      self._sizes = dict(sizes)
+      self._start = time.monotonic()
+
+  def started(self, file: str):
+    with self._lock:
+      self._running.append(file)
+
+  def copied(self, file: str, n: int):
+    with self._lock:
+      self._copied[file] = self._copied.get(file, 0) + n
+      self._bytes_done += n
+
+  def finished(self, file: str, ok: bool = True):
+    with self._lock:
+      if file in self._running:
+        self._running.remove(file)
+      copied = self._copied.pop(file, 0)
+      if ok:
+        self._files_done += 1
+        self._bytes_done += self._sizes.get(file, 0) - copied
+      else:
+        self._bytes_done -= copied
+
+  def snapshot(self) -> ProgressSnapshot:
+    with self._lock:
+      bytes_total = sum(self._sizes.values())
+      eta = None
+      if self._start is not None and self._bytes_done > 0:
+        rate = self._bytes_done / max(time.monotonic() - self._start, 1e-6)
+        eta = max(bytes_total - self._bytes_done, 0) / rate
+      return ProgressSnapshot(
+        files_total=len(self._sizes),
+        files_done=self._files_done,
+        bytes_total=bytes_total,
+        bytes_done=self._bytes_done,
+        current_file=self._running[-1] if self._running else None,
+        eta_seconds=eta,
+      )
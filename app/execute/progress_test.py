@@ -0,0 +1,32 @@
+from .progress import ExecuteProgress
+
+
+def test_progress():
+  """Test that renames count their whole file and copies count their bytes as they go."""
+  progress = ExecuteProgress()
+  progress.plan({"a.mkv": 100, "b.mkv": 300, "c.mkv": 50})
+  assert progress.snapshot().eta_seconds is None
+
+  progress.started("a.mkv")
+  progress.finished("a.mkv")
+  progress.started("b.mkv")
+  progress.copied("b.mkv", 100)
+
+  snapshot = progress.snapshot()
+  assert snapshot.files_total == 3
+  assert snapshot.files_done == 1
+  assert snapshot.bytes_total == 450
+  assert snapshot.bytes_done == 200
+  assert snapshot.current_file == "b.mkv"
+  assert snapshot.eta_seconds is not None
+
+  progress.copied("b.mkv", 200)
+  progress.finished("b.mkv")
+  progress.started("c.mkv")
+  progress.copied("c.mkv", 10)
+  progress.finished("c.mkv", ok=False)
+
+  snapshot = progress.snapshot()
+  assert snapshot.files_done == 2
+  assert snapshot.bytes_done == 400
+  assert snapshot.current_file is None
@@ -0,0 +1,109 @@
+import asyncio
+import os
+import weakref
+from contextlib import asynccontextmanager
+
+from ..agents.models import APIExecuteRequest, ExecuteResponse
+from .engine import plan_executor
+from .journal import interrupted_complete, journal_for, preflight
+from .link import link_ledger, link_records
+from .progress import ExecuteProgress
+
+
+def archive_source_dir(dir: str):
+  # Create archive directory if it doesn't exist
+  archive_dir = os.path.join(os.getenv("DOWNLOAD_COMPLETED_DIR"), "archive")
+  os.makedirs(archive_dir, exist_ok=True)
+
+  # Check if source directory still exists before moving
+  source_dir = os.path.join(os.getenv("DOWNLOAD_COMPLETED_DIR"), dir)
+  if os.path.exists(source_dir):
+    os.rename(
+      source_dir,
+      os.path.join(archive_dir, dir),
+    )
+
+
+# held while a download dir is executed or rolled back, dropped once nobody uses it.
+_dir_locks: weakref.WeakValueDictionary[str, asyncio.Lock] = weakref.WeakValueDictionary()
+
+
+@asynccontextmanager
+async def execute_lock(dir: str):
+  """Serialize executes and rollbacks of download dir, they share its journal."""
+  lock = _dir_locks.get(dir)
+  if lock is None:
+    lock = _dir_locks[dir] = asyncio.Lock()
+  async with lock:
+    yield
+
+
+def _sizes(source_dir: str, files: list[str]) -> dict[str, int]:
+  return {file: os.stat(os.path.join(source_dir, file)).st_size for file in files}
+
+
+async def execute(
+  request: APIExecuteRequest, progress: ExecuteProgress | None = None
+) -> ExecuteResponse:
+  """
+  Execute the plan of request: pre-flight, journaled moves, then archive.
+
+  All or nothing, when an action fails what was moved before is put back. Executes of the same
+  dir run one after the other.
+
+  Returns:
+      ExecuteResponse: failed_move is not empty when nothing was executed
+  """
+  async with execute_lock(request.dir):
+    return await _execute(request, progress)
+
+
+async def _execute(request: APIExecuteRequest, progress: ExecuteProgress | None) -> ExecuteResponse:
+  mode = request.mode or os.getenv("EXECUTE_MODE", "move")
+  source_dir = os.path.join(os.getenv("DOWNLOAD_COMPLETED_DIR"), request.dir)
+  target_root = os.getenv("TARGET_DIR")
+
+  journal = await asyncio.to_thread(journal_for, request.dir)
+  # a retry after a crash skips what the journal has finished.
+  resuming = journal.resumable() and journal.state.mode == mode
+  if journal.resumable() and not resuming:
+    await asyncio.to_thread(journal.rollback, source_dir, target_root)
+  done = journal.done_actions() if resuming else {}
+  actions = [a for a in request.plan if a.action == "move" and (a.file, a.target) not in done]
+
+  failed = await asyncio.to_thread(
+    preflight, source_dir, target_root, actions, journal if resuming else None
+  )
+  if failed:
+    return ExecuteResponse(failed_move=failed)
+
+  if resuming:
+    complete = await asyncio.to_thread(interrupted_complete, target_root, actions, journal)
+    for action in complete:
+      await asyncio.to_thread(journal.done, action, "interrupted")
+    actions = [a for a in actions if a not in complete]
+  else:
+    await asyncio.to_thread(journal.begin, request.dir, mode)
+
+  if progress:
+    progress.plan(await asyncio.to_thread(_sizes, source_dir, [a.file for a in actions]))
+  resp = await plan_executor().run(
+    source_dir, target_root, actions, mode=mode, journal=journal, progress=progress
+  )
+
+  if resp.failed_move:
+    # all or nothing: put back what was moved before the failure.
+    await asyncio.to_thread(journal.rollback, source_dir, target_root)
+    return resp
+
+  if mode == "link":
+    # including files linked before a crash that is resumed now.
+    linked = [(a.file, a.target, a.method) for a in journal.state.done]
+    records = await asyncio.to_thread(link_records, request.dir, source_dir, target_root, linked)
+    await asyncio.to_thread(link_ledger().append, records)
+
+  await asyncio.to_thread(journal.commit)
+  # linked files stay in place, so the torrent keeps seeding.
+  if mode != "link":
+    await asyncio.to_thread(archive_source_dir, request.dir)
+  return resp
@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+
+from ..agents.models import APIExecuteRequest, ExecuteResponse
+from . import runner
+
+
+@pytest.mark.asyncio
+async def test_execute_runs_one_execute_per_dir(monkeypatch):
+  """Test that executes of the same dir wait for each other, other dirs run meanwhile."""
+  running: list[str] = []
+  overlaps: list[list[str]] = []
+
+  async def fake_execute(request, progress):
+    running.append(request.dir)
+    overlaps.append(list(running))
+    await asyncio.sleep(0.01)
+    running.remove(request.dir)
+    return ExecuteResponse(failed_move=[])
+
+  monkeypatch.setattr(runner, "_execute", fake_execute)
+
+  await asyncio.gather(
+    *[runner.execute(APIExecuteRequest(dir=dir, plan=[])) for dir in ["a", "a", "b"]]
+  )
+
+  assert len(overlaps) == 3
+  assert all(dirs.count("a") <= 1 for dirs in overlaps)
+  assert ["a", "b"] in overlaps
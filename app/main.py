@@ -1,3 +1,4 @@
+import asyncio
 import os
 import sys
 from contextlib import asynccontextmanager
@@ -5,20 +6,49 @@ from typing import List
 
 import logfire
 from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 
 from .agents.ai import setupLogfire
+from .agents.events import stream_plan_events
+from .agents.mcp_cache import close_mcp_call_cache
+from .agents.mcp_pool import start_mcp_pool, stop_mcp_pool
 from .agents.models import (
   APIExecuteRequest,
   APIPlanRequest,
   APIReplanRequest,
   ExecuteResponse,
-  PlanFailed,
   PlanRequest,
   PlanResponse,
   TargetDir,
 )
+from .agents.mover.flaresolverr import close_flaresolverr_client
+from .agents.mover.jav_actor import (
+  ActorRelocation,
+  compact_actor_alias,
+  read_actor_relocations,
+  stop_background_discoveries,
+)
+from .agents.plan_cache import (
+  close_plan_cache,
+  get_cached_plan,
+  invalidate_cached_plan,
+  plan_cache_key,
+  put_cached_plan,
+)
+from .agents.plan_queue import PlanJob, plan_queue, start_plan_queue, stop_plan_queue
+from .agents.registry import prebuild_agents
 from .agents.runner import create_plan as ai_create_plan
+from .execute.engine import close_plan_executor
+from .execute.jobs import (
+  ExecuteJob,
+  execute_job,
+  execute_job_events,
+  start_execute_job,
+  stop_execute_jobs,
+)
+from .execute.journal import JournalState, journal_for
+from .execute.link import LinkReport, link_ledger
+from .execute.runner import execute, execute_lock
 
 setupLogfire()
 
@@ -63,9 +93,21 @@ def startup_check():
 async def lifespan(app: FastAPI):
   # Startup
   startup_check()
+  prebuild_agents()
+  await start_mcp_pool()
+  await start_plan_queue(_plan)
 
   yield
   # Shutdown
+  await stop_execute_jobs()
+  await stop_background_discoveries()
+  await stop_plan_queue()
+  await stop_mcp_pool()
+  await close_flaresolverr_client()
+  await asyncio.to_thread(compact_actor_alias)
+  close_plan_cache()
+  close_mcp_call_cache()
+  close_plan_executor()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -74,50 +116,141 @@ if os.getenv("LOGFIRE_TOKEN"):
   logfire.instrument_fastapi(app)
 
 
-@app.post("/v1/plan", response_model=PlanResponse)
-async def create_plan(request: APIPlanRequest):
+async def _plan(request: APIPlanRequest) -> PlanResponse:
   # Create PlanRequest from APIPlanRequest
   plan_request = PlanRequest(files=request.files, metadata=request.metadata)
+  # planning mutates the request metadata, hash it first.
+  cache_key = plan_cache_key(request.dir, plan_request)
+  # the SQLite tier of the cache is read and written in a thread, not on the event loop.
+  if request.invalidate_cache:
+    await asyncio.to_thread(invalidate_cached_plan, cache_key)
+  elif not request.bypass_cache:
+    cached = await asyncio.to_thread(get_cached_plan, cache_key)
+    if cached:
+      return cached
+
   plan_response, _ = await ai_create_plan(request.dir, plan_request)
+  if not request.bypass_cache:
+    await asyncio.to_thread(put_cached_plan, cache_key, plan_response)
   return plan_response
 
 
-@app.post("/v1/execute", response_model=ExecuteResponse)
+@app.post("/v1/plan", response_model=PlanResponse)
+async def create_plan(request: APIPlanRequest):
+  return await _plan(request)
+
+
+@app.post("/v1/plan/jobs", response_model=PlanJob)
+async def submit_plan_job(request: APIPlanRequest):
+  """Queue the plan, planned by the plan queue workers. The dir's job is returned if unchanged."""
+  job = await plan_queue().submit(request)
+  return JSONResponse(content=job.model_dump(mode="json"), status_code=202)
+
+
+@app.get("/v1/plan/jobs/{id}", response_model=PlanJob)
+async def get_plan_job(id: str):
+  job = await asyncio.to_thread(plan_queue().get, id)
+  if job is None:
+    return JSONResponse(content={"detail": "no job"}, status_code=404)
+  return job
+
+
+@app.get("/v1/plan/jobs", response_model=PlanJob)
+async def get_plan_job_of_dir(dir: str):
+  job = await asyncio.to_thread(plan_queue().for_dir, dir)
+  if job is None:
+    return JSONResponse(content={"detail": "no job"}, status_code=404)
+  return job
+
+
+@app.post("/v1/plan/stream")
+async def stream_plan(request: APIPlanRequest):
+  """
+  NDJSON of PlanEvents as planning goes, the last line is the plan. A cached plan is streamed as
+  the plan line only.
+  """
+
+  async def lines():
+    async for event in stream_plan_events(lambda: _plan(request)):
+      yield event.model_dump_json() + "\n"
+
+  return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.post("/v1/execute", response_model=ExecuteResponse | ExecuteJob)
 async def execute_plan(request: APIExecuteRequest):
-  resp = ExecuteResponse(failed_move=[])
-
-  for action in request.plan:
-    if action.action == "move":
-      # check original file exists using completed_dir/request.dir/file
-      original_file = os.path.join(os.getenv("DOWNLOAD_COMPLETED_DIR"), request.dir, action.file)
-      if not os.path.exists(original_file):
-        resp.failed_move.append(
-          PlanFailed(
-            file=action.file, action=action.action, target=action.target, reason="file not found"
-          )
-        )
-        continue
-      # check target folder exists
-      target_file = os.path.join(os.getenv("TARGET_DIR"), action.target)
-      os.makedirs(os.path.dirname(target_file), exist_ok=True)
-      # move file
-      os.rename(original_file, target_file)
+  if request.job:
+    job = start_execute_job(request)
+    return JSONResponse(content=job.model_dump(), status_code=202)
 
+  resp = await execute(request)
   if resp.failed_move:
     return JSONResponse(content=resp.model_dump(), status_code=400)
-  else:
-    # Create archive directory if it doesn't exist
-    archive_dir = os.path.join(os.getenv("DOWNLOAD_COMPLETED_DIR"), "archive")
-    os.makedirs(archive_dir, exist_ok=True)
-
-    # Check if source directory still exists before moving
-    source_dir = os.path.join(os.getenv("DOWNLOAD_COMPLETED_DIR"), request.dir)
-    if os.path.exists(source_dir):
-      os.rename(
-        source_dir,
-        os.path.join(archive_dir, request.dir),
-      )
-    return resp
+  return resp
+
+
+@app.get("/v1/execute/jobs/{id}", response_model=ExecuteJob)
+async def get_execute_job(id: str):
+  job = execute_job(id)
+  if job is None:
+    return JSONResponse(content={"detail": "no job"}, status_code=404)
+  return job
+
+
+@app.get("/v1/execute/jobs/{id}/events")
+async def execute_job_progress(id: str):
+  """Server-Sent Events of the job progress, the last event is the finished job."""
+  if execute_job(id) is None:
+    return JSONResponse(content={"detail": "no job"}, status_code=404)
+
+  async def events():
+    async for job in execute_job_events(id):
+      event = "progress" if job.result is None else job.status
+      yield f"event: {event}\ndata: {job.model_dump_json()}\n\n"
+
+  return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/v1/execute/journal", response_model=JournalState)
+async def execute_journal(dir: str):
+  journal = await asyncio.to_thread(journal_for, dir)
+  if journal.state is None:
+    return JSONResponse(content={"detail": "no journal"}, status_code=404)
+  return journal.state
+
+
+@app.post("/v1/execute/rollback", response_model=JournalState)
+async def rollback_execute(dir: str):
+  """Undo an execution a crash interrupted, instead of resuming it with a retry."""
+  async with execute_lock(dir):
+    journal = await asyncio.to_thread(journal_for, dir)
+    if journal.state is None:
+      return JSONResponse(content={"detail": "no journal"}, status_code=404)
+    await asyncio.to_thread(
+      journal.rollback,
+      os.path.join(os.getenv("DOWNLOAD_COMPLETED_DIR"), dir),
+      os.getenv("TARGET_DIR"),
+    )
+    return journal.state
+
+
+@app.get("/v1/links", response_model=LinkReport)
+async def linked_files(dir: str):
+  ledger = link_ledger()
+  links = await asyncio.to_thread(ledger.records, dir)
+  reclaimable = await asyncio.to_thread(
+    ledger.reclaimable_bytes,
+    os.path.join(os.getenv("DOWNLOAD_COMPLETED_DIR"), dir),
+    os.getenv("TARGET_DIR"),
+    dir,
+  )
+  return LinkReport(links=links, reclaimable_bytes=reclaimable)
+
+
+@app.get("/v1/actors/relocations", response_model=list[ActorRelocation])
+async def actor_relocations():
+  """Actor dirs files were planned into before the actor turned out to have another dir."""
+  return await asyncio.to_thread(read_actor_relocations)
 
 
 @app.post("/v1/replan-with-hint", response_model=PlanResponse)
@@ -1,5 +1,8 @@
+import json
 import os
+from contextlib import asynccontextmanager
 
+import pytest
 from fastapi.testclient import TestClient
 
 from .main import app
@@ -72,3 +75,333 @@ def test_execute_plan_failed(tmp_path):
   # Unset environment variables
   del os.environ["DOWNLOAD_COMPLETED_DIR"]
   del os.environ["TARGET_DIR"]
+
+
+def test_execute_plan_link_mode(tmp_path, monkeypatch):
+  download_dir = tmp_path / "download_completed_dir"
+  target_dir = tmp_path / "target_dir"
+  (download_dir / "subfolder").mkdir(parents=True)
+  (download_dir / "subfolder" / "a.mkv").write_text("a")
+  monkeypatch.setenv("DOWNLOAD_COMPLETED_DIR", str(download_dir))
+  monkeypatch.setenv("TARGET_DIR", str(target_dir))
+
+  response = client.post(
+    "/v1/execute",
+    json={
+      "dir": "subfolder",
+      "mode": "link",
+      "plan": [{"file": "a.mkv", "action": "move", "target": "movie/a.mkv"}],
+    },
+  )
+  assert response.status_code == 200
+  assert (target_dir / "movie" / "a.mkv").read_text() == "a"
+  # kept in place for seeding, not archived
+  assert (download_dir / "subfolder" / "a.mkv").exists()
+  assert not (download_dir / "archive").exists()
+
+  response = client.get("/v1/links", params={"dir": "subfolder"})
+  assert response.status_code == 200
+  report = response.json()
+  assert [link["file"] for link in report["links"]] == ["a.mkv"]
+  # the target shares the data of the download
+  assert report["reclaimable_bytes"] == 0
+
+
+def test_execute_plan_rolls_back_on_failure(tmp_path, monkeypatch):
+  download_dir = tmp_path / "download_completed_dir"
+  target_dir = tmp_path / "target_dir"
+  (download_dir / "subfolder").mkdir(parents=True)
+  for name in ["a.mkv", "b.mkv"]:
+    (download_dir / "subfolder" / name).write_text(name)
+  monkeypatch.setenv("DOWNLOAD_COMPLETED_DIR", str(download_dir))
+  monkeypatch.setenv("TARGET_DIR", str(target_dir))
+  monkeypatch.setenv("EXECUTE_PER_DEVICE_CONCURRENCY", "1")
+
+  rename = os.rename
+
+  def failing_rename(source, target):
+    if str(source).endswith("b.mkv") and "target_dir" in str(target):
+      raise PermissionError("denied")
+    rename(source, target)
+
+  monkeypatch.setattr(os, "rename", failing_rename)
+
+  response = client.post(
+    "/v1/execute",
+    json={
+      "dir": "subfolder",
+      "plan": [
+        {"file": "a.mkv", "action": "move", "target": "movie/a.mkv"},
+        {"file": "b.mkv", "action": "move", "target": "movie/b.mkv"},
+      ],
+    },
+  )
+  assert response.status_code == 400
+  assert [f["file"] for f in response.json()["failed_move"]] == ["b.mkv"]
+  # a.mkv was moved back, nothing was archived
+  assert sorted(os.listdir(download_dir / "subfolder")) == ["a.mkv", "b.mkv"]
+  assert not (target_dir / "movie" / "a.mkv").exists()
+
+  response = client.get("/v1/execute/journal", params={"dir": "subfolder"})
+  assert response.json()["status"] == "rolled_back"
+
+
+def test_execute_plan_resumes_after_crash(tmp_path, monkeypatch):
+  from .agents.models import PlanAction
+  from .execute.journal import journal_for
+
+  download_dir = tmp_path / "download_completed_dir"
+  target_dir = tmp_path / "target_dir"
+  (download_dir / "subfolder").mkdir(parents=True)
+  (target_dir / "movie").mkdir(parents=True)
+  (download_dir / "subfolder" / "b.mkv").write_text("b")
+  (target_dir / "movie" / "a.mkv").write_text("a")
+  monkeypatch.setenv("DOWNLOAD_COMPLETED_DIR", str(download_dir))
+  monkeypatch.setenv("TARGET_DIR", str(target_dir))
+
+  # a crashed execute that moved a.mkv
+  journal = journal_for("subfolder")
+  journal.begin("subfolder", "move")
+  a = PlanAction(file="a.mkv", action="move", target="movie/a.mkv")
+  journal.started(a)
+  journal.done(a, "rename")
+
+  response = client.post(
+    "/v1/execute",
+    json={
+      "dir": "subfolder",
+      "plan": [
+        {"file": "a.mkv", "action": "move", "target": "movie/a.mkv"},
+        {"file": "b.mkv", "action": "move", "target": "movie/b.mkv"},
+      ],
+    },
+  )
+  assert response.status_code == 200
+  assert [t["file"] for t in response.json()["timings"]] == ["b.mkv"]
+  assert (target_dir / "movie" / "b.mkv").read_text() == "b"
+  assert (download_dir / "archive" / "subfolder").exists()
+  assert client.get("/v1/execute/journal", params={"dir": "subfolder"}).status_code == 404
+
+
+def test_plan_is_cached(tmp_path, monkeypatch):
+  """Test that a plan is served from the cache, across restarts, until its request changes."""
+  from . import main
+  from .agents import plan_cache
+  from .agents.models import PlanAction, PlanResponse
+
+  calls = []
+
+  async def fake_create_plan(dir, req):
+    calls.append(dir)
+    return PlanResponse(plan=[PlanAction(file=req.files[0], action="move", target="x")]), None
+
+  monkeypatch.setattr(main, "ai_create_plan", fake_create_plan)
+  monkeypatch.setenv("PLAN_CACHE_FILE", str(tmp_path / "plans.db"))
+  plan_cache.close_plan_cache()
+
+  req = {"dir": "d", "files": ["a.mp4", "b.mp4"], "metadata": {"title": "t"}}
+  assert client.post("/v1/plan", json=req).json()["plan"][0]["file"] == "a.mp4"
+  # same content in a different order hits the cache.
+  client.post("/v1/plan", json={**req, "files": ["b.mp4", "a.mp4"]})
+  assert len(calls) == 1
+
+  # the sqlite tier survives a restart.
+  plan_cache.close_plan_cache()
+  client.post("/v1/plan", json=req)
+  assert len(calls) == 1
+
+  client.post("/v1/plan", json={**req, "bypass_cache": True})
+  assert len(calls) == 2
+  client.post("/v1/plan", json={**req, "invalidate_cache": True})
+  assert len(calls) == 3
+  client.post("/v1/plan", json={**req, "metadata": {"title": "other"}})
+  assert len(calls) == 4
+
+  plan_cache.close_plan_cache()
+
+
+@pytest.fixture
+def job_client(monkeypatch):
+  """Client keeping one event loop for the whole test, so jobs outlive their request."""
+
+  @asynccontextmanager
+  async def no_lifespan(app):
+    yield
+
+  monkeypatch.setattr(app.router, "lifespan_context", no_lifespan)
+  with TestClient(app) as job_client:
+    yield job_client
+
+
+def test_execute_plan_job(tmp_path, monkeypatch, job_client):
+  download_dir = tmp_path / "download_completed_dir"
+  target_dir = tmp_path / "target_dir"
+  (download_dir / "subfolder").mkdir(parents=True)
+  for name in ["a.mkv", "b.mkv"]:
+    (download_dir / "subfolder" / name).write_text(name)
+  monkeypatch.setenv("DOWNLOAD_COMPLETED_DIR", str(download_dir))
+  monkeypatch.setenv("TARGET_DIR", str(target_dir))
+
+  response = job_client.post(
+    "/v1/execute",
+    json={
+      "dir": "subfolder",
+      "job": True,
+      "plan": [
+        {"file": "a.mkv", "action": "move", "target": "movie/a.mkv"},
+        {"file": "b.mkv", "action": "move", "target": "movie/b.mkv"},
+      ],
+    },
+  )
+  assert response.status_code == 202
+  id = response.json()["id"]
+
+  with job_client.stream("GET", f"/v1/execute/jobs/{id}/events") as events:
+    assert events.headers["content-type"].startswith("text/event-stream")
+    lines = [line for line in events.iter_lines() if line]
+  assert lines[-2] == "event: done"
+  job = json.loads(lines[-1].removeprefix("data: "))
+  assert job["progress"]["files_done"] == 2
+  assert job["progress"]["bytes_done"] == 10
+  assert job["result"]["failed_move"] == []
+
+  assert job_client.get(f"/v1/execute/jobs/{id}").json()["status"] == "done"
+  assert job_client.get("/v1/execute/jobs/missing").status_code == 404
+  assert (target_dir / "movie" / "b.mkv").read_text() == "b.mkv"
+  assert (download_dir / "archive" / "subfolder").exists()
+
+
+def test_execute_plan_job_failed(tmp_path, monkeypatch, job_client):
+  download_dir = tmp_path / "download_completed_dir"
+  (download_dir / "subfolder").mkdir(parents=True)
+  monkeypatch.setenv("DOWNLOAD_COMPLETED_DIR", str(download_dir))
+  monkeypatch.setenv("TARGET_DIR", str(tmp_path / "target_dir"))
+
+  response = job_client.post(
+    "/v1/execute",
+    json={
+      "dir": "subfolder",
+      "job": True,
+      "plan": [{"file": "a.mkv", "action": "move", "target": "movie/a.mkv"}],
+    },
+  )
+  id = response.json()["id"]
+  with job_client.stream("GET", f"/v1/execute/jobs/{id}/events") as events:
+    lines = [line for line in events.iter_lines() if line]
+  assert lines[-2] == "event: failed"
+
+  job = job_client.get(f"/v1/execute/jobs/{id}").json()
+  assert job["status"] == "failed"
+  assert job["result"]["failed_move"][0]["reason"] == "file not found"
+
+
+def test_plan_stream(tmp_path, monkeypatch):
+  from . import main
+  from .agents import plan_cache
+  from .agents.events import emit_plan_event
+  from .agents.models import PlanAction, PlanResponse
+
+  async def fake_create_plan(dir, req):
+    emit_plan_event("category", category="movie")
+    return PlanResponse(plan=[PlanAction(file=req.files[0], action="move", target="x")]), None
+
+  monkeypatch.setattr(main, "ai_create_plan", fake_create_plan)
+  monkeypatch.setenv("PLAN_CACHE_FILE", str(tmp_path / "plans.db"))
+  plan_cache.close_plan_cache()
+
+  req = {"dir": "d", "files": ["a.mp4"]}
+  response = client.post("/v1/plan/stream", json=req)
+  assert response.headers["content-type"].startswith("application/x-ndjson")
+  events = [json.loads(line) for line in response.text.splitlines()]
+  assert [event["stage"] for event in events] == ["category", "plan"]
+  assert events[-1]["data"]["plan"][0]["file"] == "a.mp4"
+
+  # a cached plan is only the plan line.
+  events = [json.loads(line) for line in client.post("/v1/plan/stream", json=req).text.splitlines()]
+  assert [event["stage"] for event in events] == ["plan"]
+
+  plan_cache.close_plan_cache()
+
+
+def test_plan_job(tmp_path, monkeypatch):
+  import time
+
+  from . import main
+  from .agents import plan_cache
+  from .agents.models import PlanAction, PlanResponse
+  from .agents.plan_queue import start_plan_queue, stop_plan_queue
+
+  async def fake_create_plan(dir, req):
+    return PlanResponse(plan=[PlanAction(file=req.files[0], action="move", target="x")]), None
+
+  @asynccontextmanager
+  async def queue_lifespan(app):
+    await start_plan_queue(main._plan)
+    yield
+    await stop_plan_queue()
+
+  monkeypatch.setattr(main, "ai_create_plan", fake_create_plan)
+  monkeypatch.setattr(app.router, "lifespan_context", queue_lifespan)
+  monkeypatch.setenv("PLAN_CACHE_FILE", str(tmp_path / "plans.db"))
+  monkeypatch.setenv("PLAN_QUEUE_FILE", str(tmp_path / "queue.db"))
+  plan_cache.close_plan_cache()
+
+  with TestClient(app) as queue_client:
+    response = queue_client.post("/v1/plan/jobs", json={"dir": "d", "files": ["a.mp4"]})
+    assert response.status_code == 202
+    id = response.json()["id"]
+
+    for _ in range(500):
+      job = queue_client.get(f"/v1/plan/jobs/{id}").json()
+      if job["status"] == "done":
+        break
+      time.sleep(0.01)
+    assert job["result"]["plan"][0]["file"] == "a.mp4"
+    assert queue_client.get("/v1/plan/jobs", params={"dir": "d"}).json()["id"] == id
+    assert queue_client.get("/v1/plan/jobs/missing").status_code == 404
+
+  plan_cache.close_plan_cache()
+
+
+def test_actor_relocations(tmp_path, monkeypatch):
+  """Test that the relocations recorded by deferred actor discoveries are listed."""
+  monkeypatch.setenv("JAV_ACTOR_FILE", str(tmp_path / "actors.json"))
+  assert client.get("/v1/actors/relocations").json() == []
+
+  relocation = {"actor": "Hatano Yui", "provisional_dir": "Hatano Yui", "dir": "波多野結衣"}
+  (tmp_path / "actors.json.relocations.jsonl").write_text(json.dumps(relocation) + "\n")
+
+  assert client.get("/v1/actors/relocations").json() == [relocation]
+
+
+def test_execute_plan_job_reports_unapplied_moves(tmp_path, monkeypatch, job_client):
+  """Test that a job failing midway reports only the moves it did not apply."""
+  from .execute import jobs
+  from .execute.journal import journal_for
+
+  monkeypatch.setenv("DOWNLOAD_COMPLETED_DIR", str(tmp_path / "download_completed_dir"))
+  monkeypatch.setenv("TARGET_DIR", str(tmp_path / "target_dir"))
+
+  async def crashing_execute(request, progress):
+    journal = journal_for(request.dir)
+    journal.begin(request.dir, "move")
+    journal.done(request.plan[0], "rename")
+    raise OSError("disk full")
+
+  monkeypatch.setattr(jobs, "execute", crashing_execute)
+
+  plan = [
+    {"file": "a.mkv", "action": "move", "target": "movie/a.mkv"},
+    {"file": "b.mkv", "action": "move", "target": "movie/b.mkv"},
+    {"file": "a.nfo", "action": "skip"},
+  ]
+  response = job_client.post("/v1/execute", json={"dir": "subfolder", "job": True, "plan": plan})
+  id = response.json()["id"]
+  with job_client.stream("GET", f"/v1/execute/jobs/{id}/events") as events:
+    list(events.iter_lines())
+
+  job = job_client.get(f"/v1/execute/jobs/{id}").json()
+  assert job["status"] == "failed"
+  assert [(f["file"], f["reason"]) for f in job["result"]["failed_move"]] == [
+    ("b.mkv", "disk full")
+  ]